@@ -0,0 +1,105 @@
+import os
+
+# Collaborative filtering
+# Number of nearest neighbours kept per item in the similarity table
+CF_NEIGHBOURS = int(os.getenv("CF_NEIGHBOURS", "50"))
+# Item rows processed per sparse similarity block during training
+CF_SIMILARITY_BLOCK_SIZE = int(os.getenv("CF_SIMILARITY_BLOCK_SIZE", "1024"))
+# Half-life in days for exponential decay of purchase weights (0 disables decay)
+CF_DECAY_HALF_LIFE_DAYS = float(os.getenv("CF_DECAY_HALF_LIFE_DAYS", "0"))
+# Incremental updates re-read orders updated this many seconds before the watermark,
+# so orders committed late with an older timestamp are still folded in (once, by order id)
+CF_WATERMARK_LOOKBACK_SECONDS = float(os.getenv("CF_WATERMARK_LOOKBACK_SECONDS", "600"))
+
+# Implicit ALS matrix factorization
+ALS_FACTORS = int(os.getenv("ALS_FACTORS", "64"))
+ALS_ITERATIONS = int(os.getenv("ALS_ITERATIONS", "15"))
+ALS_REGULARIZATION = float(os.getenv("ALS_REGULARIZATION", "0.01"))
+ALS_ALPHA = float(os.getenv("ALS_ALPHA", "40"))
+# BLAS threads used while training (0 keeps the BLAS default)
+ALS_NUM_THREADS = int(os.getenv("ALS_NUM_THREADS", "0"))
+
+# Content-based model
+CB_ENCODER_MODEL = os.getenv("CB_ENCODER_MODEL", "all-MiniLM-L6-v2")
+# Set to false on pods that only serve precomputed embeddings (no query encoding, no training)
+CB_LOAD_ENCODER = os.getenv("CB_LOAD_ENCODER", "true").lower() == "true"
+# Load and warm up the encoder on startup (before reporting ready) instead of on the first search
+CB_WARM_UP_ENCODER = os.getenv("CB_WARM_UP_ENCODER", "true").lower() == "true"
+# LRU cache of query embeddings for /search (0 entries disables it; TTL 0 never expires)
+CB_QUERY_CACHE_SIZE = int(os.getenv("CB_QUERY_CACHE_SIZE", "10000"))
+CB_QUERY_CACHE_MAX_MB = float(os.getenv("CB_QUERY_CACHE_MAX_MB", "64"))
+CB_QUERY_CACHE_TTL_SECONDS = float(os.getenv("CB_QUERY_CACHE_TTL_SECONDS", "0"))
+# Micro-batching of concurrent /search requests: longest wait for a batch to fill
+# and its maximum size (1 disables batching)
+CB_SEARCH_BATCH_WAIT_MS = float(os.getenv("CB_SEARCH_BATCH_WAIT_MS", "2"))
+CB_SEARCH_BATCH_SIZE = int(os.getenv("CB_SEARCH_BATCH_SIZE", "32"))
+# Default /search mode: vector (embeddings), lexical (BM25) or hybrid (both, fused)
+CB_SEARCH_MODE = os.getenv("CB_SEARCH_MODE", "vector")
+# Hybrid search: candidates taken from each retriever and the reciprocal rank fusion constant
+CB_HYBRID_CANDIDATES = int(os.getenv("CB_HYBRID_CANDIDATES", "100"))
+CB_RRF_K = int(os.getenv("CB_RRF_K", "60"))
+# FAISS index for semantic search: flat (exact), ivf_flat, ivf_pq or hnsw
+CB_INDEX_TYPE = os.getenv("CB_INDEX_TYPE", "flat")
+# IVF cells (0 picks 4 * sqrt(products)) and cells scanned per query
+CB_IVF_NLIST = int(os.getenv("CB_IVF_NLIST", "0"))
+CB_IVF_NPROBE = int(os.getenv("CB_IVF_NPROBE", "16"))
+# IVF-PQ sub-quantizers (must divide the embedding dimension) and bits per code
+CB_PQ_M = int(os.getenv("CB_PQ_M", "16"))
+CB_PQ_NBITS = int(os.getenv("CB_PQ_NBITS", "8"))
+# HNSW graph degree, build-time and query-time candidate list sizes
+CB_HNSW_M = int(os.getenv("CB_HNSW_M", "32"))
+CB_HNSW_EF_CONSTRUCTION = int(os.getenv("CB_HNSW_EF_CONSTRUCTION", "80"))
+CB_HNSW_EF_SEARCH = int(os.getenv("CB_HNSW_EF_SEARCH", "64"))
+# Storage of product embeddings and of flat/ivf_flat/hnsw index vectors: float32, float16
+# (half the memory) or int8 (a quarter, per-dimension scalar quantization)
+CB_EMBEDDING_DTYPE = os.getenv("CB_EMBEDDING_DTYPE", "float32")
+# Streaming fit: products read from the database, encoded and written per chunk
+CB_FIT_CHUNK_SIZE = int(os.getenv("CB_FIT_CHUNK_SIZE", "10000"))
+# Encoder worker processes for product embeddings (0 or 1 encodes in the training thread)
+CB_ENCODE_PROCESSES = int(os.getenv("CB_ENCODE_PROCESSES", "0"))
+
+# Hybrid similar products: neighbours precomputed per product after training
+# (0 disables the table) and the weights of the collaborative and content scores
+HYBRID_NEIGHBOURS = int(os.getenv("HYBRID_NEIGHBOURS", "20"))
+HYBRID_CF_WEIGHT = float(os.getenv("HYBRID_CF_WEIGHT", "0.6"))
+HYBRID_CB_WEIGHT = float(os.getenv("HYBRID_CB_WEIGHT", "0.4"))
+
+# Model artifacts (one versioned sub-directory per model)
+MODEL_ARTIFACTS_DIR = os.getenv("MODEL_ARTIFACTS_DIR", "/app/models/artifacts")
+CF_ARTIFACTS_DIR = os.path.join(MODEL_ARTIFACTS_DIR, "collaborative")
+ALS_ARTIFACTS_DIR = os.path.join(MODEL_ARTIFACTS_DIR, "als")
+CB_ARTIFACTS_DIR = os.path.join(MODEL_ARTIFACTS_DIR, "content")
+HYBRID_ARTIFACTS_DIR = os.path.join(MODEL_ARTIFACTS_DIR, "hybrid")
+
+# Training data extraction
+# Rows fetched per round trip from the server-side cursor while reading training data
+EXTRACT_CHUNK_SIZE = int(os.getenv("EXTRACT_CHUNK_SIZE", "100000"))
+# Train from the latest snapshot under this directory (python -m app.utils.snapshot)
+# instead of querying the database; empty trains from the database
+TRAINING_SNAPSHOT_DIR = os.getenv("TRAINING_SNAPSHOT_DIR", "")
+
+# Background training
+# Hours between scheduled full retrains
+TRAINING_INTERVAL_HOURS = float(os.getenv("TRAINING_INTERVAL_HOURS", "24"))
+# Seconds before retrying a failed run, doubled after every further failure (at most the interval)
+TRAINING_RETRY_SECONDS = float(os.getenv("TRAINING_RETRY_SECONDS", "60"))
+
+# Multi-process serving
+# standalone: every process trains and serves; worker: serve only, following the
+# model sets published by a separate trainer (python -m app.training)
+SERVING_ROLE = os.getenv("SERVING_ROLE", "standalone")
+# Seconds between checks of the published model set in worker processes
+MODEL_SET_POLL_SECONDS = float(os.getenv("MODEL_SET_POLL_SECONDS", "5"))
+
+# Startup readiness
+# Synthetic queries per model and query type run before /ready reports ready (0 skips warm-up)
+WARM_UP_QUERIES = int(os.getenv("WARM_UP_QUERIES", "8"))
+
+# Request handling
+# Worker threads for CPU-bound request work, off the asyncio event loop
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Cache of /similar and /user responses for the live model set version (0 entries disables it)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "50000"))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "128"))
+# Most ids or queries accepted by one /batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
@@ -1,7 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.routers import recommendations
+from app.config import CB_WARM_UP_ENCODER, SERVING_ROLE
+from app.models.encoder import get_encoder
+from app.models.registry import registry
+from app.readiness import readiness, warm_up_models
+from app.training import load_saved_models, scheduler, watcher
+from app.utils.executor import shutdown_executor
 import logging
+import threading
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -25,11 +34,79 @@ app.add_middleware(
 # Include routers
 app.include_router(recommendations.router)
 
+# How often start-up surfaces the error of failing first training runs on /ready
+STARTUP_TRAINING_POLL_SECONDS = 5
+
+def warm_up_encoder():
+    """Load the transformer off the request path"""
+    started = time.perf_counter()
+    try:
+        get_encoder().warm_up()
+    except Exception as e:
+        logger.error(f"Encoder warm-up failed: {e}")
+    readiness.encoder_seconds = time.perf_counter() - started
+
+def start_up():
+    """
+    Load the models, warm them up and flip /ready. Runs off the event loop so
+    /health answers while the instance is still cold.
+    """
+    # The encoder is only needed for search and training; load it while the artifacts load
+    encoder_thread = None
+    if CB_WARM_UP_ENCODER and get_encoder().enabled:
+        encoder_thread = threading.Thread(target=warm_up_encoder, name="encoder-warm-up", daemon=True)
+        encoder_thread.start()
+    
+    try:
+        readiness.state = "loading"
+        started = time.perf_counter()
+        if SERVING_ROLE == "worker":
+            # Serve the model sets a separate trainer process publishes (memory-mapped, shared between workers)
+            if not watcher.check():
+                load_saved_models()
+            watcher.start()
+        else:
+            # Load saved artifacts (memory-mapped) so a restart does not retrain
+            load_saved_models()
+            # Train in the background; later runs are served from the previous models meanwhile
+            scheduler.start()
+            if registry.current.cf.last_trained is None:
+                # Nothing saved to serve yet: stay not ready until a run succeeds (failed runs are retried)
+                logger.info("No saved models, waiting for a successful training run before reporting ready")
+                while not scheduler.wait_trained(timeout=STARTUP_TRAINING_POLL_SECONDS):
+                    readiness.error = scheduler.last_error
+                readiness.error = None
+        readiness.load_seconds = time.perf_counter() - started
+        if encoder_thread is not None:
+            encoder_thread.join()
+    except Exception as e:
+        readiness.state = "failed"
+        readiness.error = str(e)
+        logger.exception(f"Startup failed: {e}")
+        return
+    
+    readiness.state = "warming_up"
+    started = time.perf_counter()
+    try:
+        readiness.warm_up_queries = warm_up_models(registry.current)
+    except Exception as e:
+        # The models are loaded; a failed warm-up query only means a slower first request
+        logger.error(f"Model warm-up failed: {e}")
+    readiness.warm_up_seconds = time.perf_counter() - started
+    readiness.mark_ready()
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize models on startup"""
+    """Load and warm up the models in the background; /ready reports when done"""
     logger.info("Starting Recommender Service...")
-    # Models will be loaded lazily on first request
+    threading.Thread(target=start_up, name="start-up", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background training (or model set polling) and the request worker pool"""
+    scheduler.stop(timeout=5)
+    watcher.stop(timeout=5)
+    shutdown_executor(wait=False)
 
 @app.get("/")
 def root():
@@ -39,6 +116,22 @@ def root():
         "version": "1.0.0"
     }
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 200 once the models are loaded and warmed up, 503 before"""
+    return JSONResponse(status_code=200 if readiness.is_ready else 503, content=readiness.status())
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "recommender"}
\ No newline at end of file
+    models = registry.current
+    return {
+        "status": "healthy",
+        "service": "recommender",
+        "ready": readiness.is_ready,
+        "encoder": models.cb.encoder.state,
+        "models": {
+            "collaborative": models.cf.neighbour_ids is not None,
+            "als": models.als.item_factors is not None,
+            "content": models.cb.index is not None
+        }
+    }
\ No newline at end of file
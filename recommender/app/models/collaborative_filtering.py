@@ -1,117 +1,434 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Tuple
+import scipy.sparse as sp
+from typing import List, Dict, NamedTuple, Tuple, Optional
 import logging
+import os
 from datetime import datetime, timedelta
 
+from app.config import CF_NEIGHBOURS, CF_SIMILARITY_BLOCK_SIZE, CF_DECAY_HALF_LIFE_DAYS, CF_WATERMARK_LOOKBACK_SECONDS
+from app.utils.artifacts import write_generation, find_generation, read_manifest, load_arrays
+from app.utils.data_access import INTERACTION_DTYPES, interactions_query, latest_timestamp, read_columns
+from app.utils.id_index import IdIndex
+from app.utils.snapshot import Snapshot
+from app.utils.topk import top_k_indices
+
 logger = logging.getLogger(__name__)
 
+def top_k_per_row(
+    block: sp.csr_matrix,
+    k: int,
+    row_items: Optional[np.ndarray] = None,
+    min_scores: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the K highest positive scores of every row of a sparse similarity block.
+    row_items gives the item (column) index of every row; that diagonal entry is dropped.
+    min_scores, a known lower bound of every row's K-th score, drops entries that
+    cannot make the top K before sorting.
+    Returns: (neighbour_ids int32 [rows, k], neighbour_scores float32 [rows, k]),
+    sorted by descending score and padded with -1 / 0.
+    """
+    n_rows = block.shape[0]
+    ids = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    
+    coo = block.tocoo()
+    rows, cols, vals = coo.row, coo.col, coo.data
+    mask = vals > 0
+    if row_items is not None:
+        mask &= cols != row_items[rows]
+    if min_scores is not None:
+        mask &= vals >= min_scores[rows]
+    rows, cols, vals = rows[mask], cols[mask], vals[mask]
+    if len(rows) == 0:
+        return ids, scores
+    
+    # Sort by row, then by descending score within the row (ties by column)
+    order = np.lexsort((cols, -vals, rows))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    
+    # Rank of every entry inside its row
+    row_starts = np.searchsorted(rows, np.arange(n_rows))
+    rank = np.arange(len(rows)) - row_starts[rows]
+    keep = rank < k
+    
+    ids[rows[keep], rank[keep]] = cols[keep]
+    scores[rows[keep], rank[keep]] = vals[keep]
+    return ids, scores
+
+def order_bitmap(order_ids: np.ndarray, bitmap: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Packed bitmap (bit i of byte i >> 3 for order id i) with the given order ids set,
+    extending a copy of an existing bitmap
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    previous = bitmap if bitmap is not None else np.empty(0, dtype=np.uint8)
+    size = max(len(previous), int(order_ids.max() >> 3) + 1 if len(order_ids) else 0)
+    grown = np.zeros(size, dtype=np.uint8)
+    grown[:len(previous)] = previous
+    np.bitwise_or.at(grown, order_ids >> 3, (1 << (order_ids & 7)).astype(np.uint8))
+    return grown
+
+def in_order_bitmap(bitmap: np.ndarray, order_ids: np.ndarray) -> np.ndarray:
+    """Mask of the order ids whose bit is set in a bitmap from order_bitmap"""
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    found = np.zeros(len(order_ids), dtype=bool)
+    inside = (order_ids >> 3) < len(bitmap)
+    ids = order_ids[inside]
+    found[inside] = (bitmap[ids >> 3] >> (ids & 7).astype(np.uint8)) & 1 == 1
+    return found
+
+def merge_ids(current: np.ndarray, incoming: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Add unseen ids to a sorted id array.
+    Returns: (merged sorted ids, old row -> new row mapping or None if rows did not move)
+    """
+    new_ids = np.setdiff1d(incoming, current)
+    if len(new_ids) == 0:
+        return current, None
+    if len(current) == 0 or new_ids[0] > current[-1]:
+        # Common case with serial primary keys: new ids are appended at the end
+        return np.concatenate([current, new_ids]), None
+    merged = np.union1d(current, new_ids)
+    return merged, np.searchsorted(merged, current)
+
+class InteractionDelta(NamedTuple):
+    """What a partial_fit changed, as sorted user and product ids"""
+    users: np.ndarray  # users with new interactions
+    products: np.ndarray  # products with new interactions
+    neighbour_products: np.ndarray  # products whose neighbour lists changed
+
 class CollaborativeFilteringModel:
     """
-    Item-based collaborative filtering using cosine similarity
+    Item-based collaborative filtering using cosine similarity.
+    Interactions are kept in a sparse CSR matrix and only the top-K
+    neighbours of every item are stored.
     """
     
-    def __init__(self):
-        self.user_item_matrix = None
-        self.item_similarity_matrix = None
-        self.product_ids = []
-        self.user_ids = []
+    def __init__(
+        self,
+        n_neighbours: int = CF_NEIGHBOURS,
+        block_size: int = CF_SIMILARITY_BLOCK_SIZE,
+        decay_half_life_days: float = CF_DECAY_HALF_LIFE_DAYS,
+        watermark_lookback_seconds: float = CF_WATERMARK_LOOKBACK_SECONDS
+    ):
+        self.n_neighbours = n_neighbours
+        self.block_size = block_size
+        self.decay_half_life_days = decay_half_life_days  # 0 disables time decay
+        self.watermark_lookback_seconds = watermark_lookback_seconds
+        self.user_item_matrix = None  # scipy.sparse.csr_matrix, users × products
+        self.item_norms = None  # float32 [n_products], L2 norm of every product column
+        self.neighbour_ids = None  # int32 [n_products, n_neighbours], column indices
+        self.neighbour_scores = None  # float32 [n_products, n_neighbours]
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.watermark = None  # updated_at of the newest completed order folded in
+        self.folded_orders = None  # order_bitmap of the orders folded in
         self.last_trained = None
+        self.artifact_version = None
+    
+    def fetch_interactions(
+        self,
+        db_session,
+        since: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+        skip_orders: Optional[np.ndarray] = None
+    ):
+        """
+        Load (user, product, weight) triplets of completed orders, optionally only
+        orders updated at or after `since` and not in the `skip_orders` bitmap,
+        from a database session or a Snapshot.
+        Weights are quantities, decayed to `now` when a half-life is configured.
+        Returns: (user_ids, product_ids, weights, order_ids, watermark)
+        """
+        if isinstance(db_session, Snapshot):
+            columns = db_session.interactions(since)
+        else:
+            # One row per (order, product); duplicates are summed when building the matrix.
+            # Streamed straight into typed columns; no list of row tuples for the whole history
+            params = {"since": since} if since is not None else {}
+            columns = read_columns(db_session, interactions_query(since is not None), INTERACTION_DTYPES, params)
+        if len(columns["weight"]) == 0:
+            return columns["user_id"], columns["product_id"], columns["weight"], columns["order_id"], since
+        
+        # The newest timestamp read, including orders skipped below
+        watermark = latest_timestamp(columns["updated_at"])
+        if since is not None:
+            watermark = max(watermark, since) if watermark is not None else since
+        if skip_orders is not None:
+            keep = ~in_order_bitmap(skip_orders, columns["order_id"])
+            columns = {name: column[keep] for name, column in columns.items()}
+        user_ids, product_ids = columns["user_id"], columns["product_id"]
+        weights, timestamps = columns["weight"], columns["updated_at"]
         
-    def prepare_data(self, db_session) -> Tuple[np.ndarray, List[int], List[int]]:
+        if self.decay_half_life_days > 0 and len(weights) > 0:
+            now = now or datetime.utcnow()
+            age_days = (np.datetime64(now, "us") - timestamps) / np.timedelta64(1, "D")
+            # Orders without any timestamp are decayed as the oldest known order (not at all if none is known)
+            unknown = np.isnan(age_days)
+            if unknown.any():
+                age_days[unknown] = np.nanmax(age_days) if not unknown.all() else 0
+            weights *= np.power(0.5, np.maximum(age_days, 0) / self.decay_half_life_days).astype(np.float32)
+        
+        return user_ids, product_ids, weights, columns["order_id"], watermark
+    
+    def prepare_data(self, db_session) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
         """
         Extract user-product interaction data from database
-        Returns: (user_item_matrix, product_ids, user_ids)
-        """
-        from sqlalchemy import text
-        
-        # Query to get user-product interactions (orders)
-        query = text("""
-            SELECT DISTINCT
-                o.user_id,
-                ci.product_id,
-                SUM(ci.quantity) as interaction_strength
-            FROM orders o
-            JOIN cart_items ci ON o.id = ci.order_id
-            WHERE o.status = 'completed'
-            GROUP BY o.user_id, ci.product_id
-            ORDER BY o.user_id, ci.product_id
-        """)
-        
-        results = db_session.execute(query).fetchall()
-        
-        if not results:
+        Returns: (user_item_matrix as CSR, sorted product_ids, sorted user_ids)
+        """
+        user_col, product_col, weights, order_ids, self.watermark = self.fetch_interactions(db_session)
+        self.folded_orders = order_bitmap(order_ids)
+        
+        if len(weights) == 0:
             logger.warning("No order data found for training")
-            return np.array([]), [], []
+            empty = np.empty(0, dtype=np.int64)
+            return sp.csr_matrix((0, 0), dtype=np.float32), empty, empty
         
-        # Extract unique users and products
-        user_ids = sorted(list(set(row[0] for row in results)))
-        product_ids = sorted(list(set(row[1] for row in results)))
+        # Unique (sorted) ids plus the row/column index of every interaction
+        user_ids, user_idx = np.unique(user_col, return_inverse=True)
+        product_ids, product_idx = np.unique(product_col, return_inverse=True)
         
-        # Create user-item matrix
-        user_item_matrix = np.zeros((len(user_ids), len(product_ids)))
+        user_item_matrix = sp.csr_matrix(
+            (weights, (user_idx, product_idx)),
+            shape=(len(user_ids), len(product_ids)),
+            dtype=np.float32
+        )
         
-        user_id_to_idx = {uid: idx for idx, uid in enumerate(user_ids)}
-        product_id_to_idx = {pid: idx for idx, pid in enumerate(product_ids)}
+        logger.info(
+            f"Prepared sparse matrix: {len(user_ids)} users × {len(product_ids)} products, "
+            f"{user_item_matrix.nnz} interactions"
+        )
+        return user_item_matrix, product_ids, user_ids
+    
+    @staticmethod
+    def column_norms(matrix: sp.spmatrix) -> np.ndarray:
+        """L2 norm of every column of a sparse matrix"""
+        return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel().astype(np.float32)
+    
+    def compute_neighbours(
+        self,
+        user_item_matrix: sp.csr_matrix,
+        item_norms: np.ndarray,
+        items: Optional[np.ndarray] = None,
+        min_scores: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build the top-K item-item cosine similarity table block by block,
+        so the full N×N similarity matrix is never materialised
+        (only the rows of the given item columns when items is set,
+        with optional lower bounds of their K-th scores as in top_k_per_row)
+        """
+        n_products = user_item_matrix.shape[1]
+        if items is None:
+            items = np.arange(n_products)
         
-        for user_id, product_id, strength in results:
-            user_idx = user_id_to_idx[user_id]
-            product_idx = product_id_to_idx[product_id]
-            user_item_matrix[user_idx, product_idx] = strength
+        # L2-normalise item columns so a dot product is a cosine similarity
+        inverse_norms = np.divide(1.0, item_norms, out=np.zeros_like(item_norms), where=item_norms > 0)
+        normalized = (user_item_matrix @ sp.diags(inverse_norms)).tocsr()
+        item_user = normalized.T.tocsr()
         
-        logger.info(f"Prepared matrix: {len(user_ids)} users × {len(product_ids)} products")
-        return user_item_matrix, product_ids, user_ids
+        neighbour_ids = np.empty((len(items), self.n_neighbours), dtype=np.int32)
+        neighbour_scores = np.empty((len(items), self.n_neighbours), dtype=np.float32)
+        
+        for start in range(0, len(items), self.block_size):
+            block_items = items[start:start + self.block_size]
+            block = item_user[block_items] @ normalized
+            neighbour_ids[start:start + len(block_items)], neighbour_scores[start:start + len(block_items)] = top_k_per_row(
+                block,
+                self.n_neighbours,
+                row_items=block_items,
+                min_scores=min_scores[start:start + len(block_items)] if min_scores is not None else None
+            )
+        
+        return neighbour_ids, neighbour_scores
     
     def fit(self, db_session):
-        """Train the collaborative filtering model"""
+        """Train the collaborative filtering model from a database session or a Snapshot"""
         logger.info("Training collaborative filtering model...")
         
         # Prepare data
         self.user_item_matrix, self.product_ids, self.user_ids = self.prepare_data(db_session)
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
         
         if len(self.product_ids) == 0:
             logger.warning("No products to train on")
             return
         
-        # Calculate item-item similarity matrix
-        # Transpose to get item-user matrix, then calculate cosine similarity
-        item_user_matrix = self.user_item_matrix.T
-        self.item_similarity_matrix = cosine_similarity(item_user_matrix)
-        
-        # Set diagonal to 0 (a product is not similar to itself)
-        np.fill_diagonal(self.item_similarity_matrix, 0)
+        # Calculate top-K item-item similarities
+        self.item_norms = self.column_norms(self.user_item_matrix)
+        self.neighbour_ids, self.neighbour_scores = self.compute_neighbours(self.user_item_matrix, self.item_norms)
         
         self.last_trained = datetime.utcnow()
         logger.info(f"Model trained successfully at {self.last_trained}")
     
+    def partial_fit(self, db_session) -> Optional[InteractionDelta]:
+        """
+        Fold orders completed since the last watermark into the model.
+        Orders are read from watermark_lookback_seconds before the watermark and
+        folded in once by order id, so orders sharing the watermark's timestamp or
+        committed late are not lost, and later writes to an order already folded in
+        (which bump its updated_at) do not add its purchases again. Changes to such
+        orders (items edited or the order no longer completed) wait for the next full fit.
+        Only neighbour rows of products touched by the new orders (and the rows
+        that list those products as neighbours) are recomputed; the result matches
+        a full fit on the same data.
+        Returns: the InteractionDelta folded in (empty if there were no new orders),
+        or None if the model had to be fitted from scratch
+        """
+        if self.neighbour_ids is None or self.watermark is None or self.folded_orders is None:
+            self.fit(db_session)
+            return None
+        
+        now = datetime.utcnow()
+        since = self.watermark - timedelta(seconds=self.watermark_lookback_seconds)
+        user_col, product_col, weights, order_ids, watermark = self.fetch_interactions(
+            db_session, since=since, now=now, skip_orders=self.folded_orders
+        )
+        
+        if len(weights) == 0:
+            logger.info(f"No orders completed since {self.watermark}, model unchanged")
+            empty = np.empty(0, dtype=np.int64)
+            return InteractionDelta(empty, empty, empty)
+        
+        logger.info(f"Updating collaborative filtering model with {len(weights)} new interactions...")
+        
+        # Grow the id spaces; rows/columns only move when an old id sorts before the end
+        user_ids, user_remap = merge_ids(self.user_ids, np.unique(user_col))
+        product_ids, product_remap = merge_ids(self.product_ids, np.unique(product_col))
+        shape = (len(user_ids), len(product_ids))
+        
+        matrix = self.user_item_matrix.tocoo()
+        rows = matrix.row if user_remap is None else user_remap[matrix.row]
+        cols = matrix.col if product_remap is None else product_remap[matrix.col]
+        data = matrix.data
+        
+        item_norms = np.zeros(shape[1], dtype=np.float32)
+        neighbour_ids = np.full((shape[1], self.n_neighbours), -1, dtype=np.int32)
+        neighbour_scores = np.zeros((shape[1], self.n_neighbours), dtype=np.float32)
+        if product_remap is None:
+            old_rows = np.arange(len(self.product_ids))
+            neighbour_ids[old_rows] = self.neighbour_ids
+        else:
+            old_rows = product_remap
+            neighbour_ids[old_rows] = np.where(self.neighbour_ids >= 0, product_remap[self.neighbour_ids], -1)
+        neighbour_scores[old_rows] = self.neighbour_scores
+        item_norms[old_rows] = self.item_norms
+        
+        # Uniform decay of existing weights; cosine similarities are scale invariant
+        if self.decay_half_life_days > 0 and self.last_trained is not None:
+            elapsed_days = (now - self.last_trained).total_seconds() / 86400
+            factor = np.float32(0.5 ** (elapsed_days / self.decay_half_life_days))
+            data = data * factor
+            item_norms *= factor
+        
+        delta_rows = np.searchsorted(user_ids, user_col)
+        delta_cols = np.searchsorted(product_ids, product_col)
+        user_item_matrix = sp.csr_matrix(
+            (np.concatenate([data, weights]), (np.concatenate([rows, delta_rows]), np.concatenate([cols, delta_cols]))),
+            shape=shape,
+            dtype=np.float32
+        )
+        
+        # Similarities change only for pairs involving an affected product
+        affected = np.unique(delta_cols)
+        affected_columns = user_item_matrix[:, affected]
+        item_norms[affected] = self.column_norms(affected_columns)
+        
+        inverse_norms = np.divide(1.0, item_norms, out=np.zeros_like(item_norms), where=item_norms > 0)
+        similarity = sp.diags(inverse_norms[affected]) @ (affected_columns.T @ user_item_matrix) @ sp.diags(inverse_norms)
+        similarity = similarity.tocsr()
+        
+        # Affected rows are recomputed from scratch
+        neighbour_ids[affected], neighbour_scores[affected] = top_k_per_row(
+            similarity, self.n_neighbours, row_items=affected
+        )
+        
+        # Other rows keep their unaffected neighbours and take fresh scores for affected ones
+        is_affected = np.zeros(shape[1], dtype=bool)
+        is_affected[affected] = True
+        reverse = similarity.T.tocsr()
+        touched = np.setdiff1d(np.unique(reverse.nonzero()[0]), affected)
+        stale = np.empty(0, dtype=touched.dtype)
+        previous_ids, previous_scores = neighbour_ids[touched], neighbour_scores[touched]
+        if len(touched) > 0:
+            kept_ids = neighbour_ids[touched]
+            keep = (kept_ids >= 0) & ~is_affected[np.maximum(kept_ids, 0)]
+            kept_rows = np.nonzero(keep)[0]
+            fresh = reverse[touched].tocoo()
+            candidates = sp.csr_matrix(
+                (
+                    np.concatenate([neighbour_scores[touched][keep], fresh.data]),
+                    (np.concatenate([kept_rows, fresh.row]), np.concatenate([kept_ids[keep], affected[fresh.col]]))
+                ),
+                shape=(len(touched), shape[1])
+            )
+            # Neighbours cut off by the previous top-K scored at most the old K-th score. A full
+            # row whose K-th score dropped below it may be missing one of them: recompute it
+            old_full = kept_ids[:, -1] >= 0
+            old_kth = neighbour_scores[touched, -1]
+            neighbour_ids[touched], neighbour_scores[touched] = top_k_per_row(
+                candidates, self.n_neighbours, row_items=touched
+            )
+            stale = touched[old_full & (neighbour_scores[touched, -1] < old_kth)]
+        if len(stale) > 0:
+            # The candidates hold current scores, so their K-th bounds the true K-th from below
+            # (with some slack for rounding differences between the two computations)
+            neighbour_ids[stale], neighbour_scores[stale] = self.compute_neighbours(
+                user_item_matrix, item_norms, stale, min_scores=neighbour_scores[stale, -1] * 0.999
+            )
+        
+        # Publish the new state together
+        self.user_item_matrix = user_item_matrix
+        self.item_norms = item_norms
+        self.neighbour_ids, self.neighbour_scores = neighbour_ids, neighbour_scores
+        self.product_ids, self.user_ids = product_ids, user_ids
+        self.product_index, self.user_index = IdIndex(product_ids), IdIndex(user_ids)
+        self.watermark = max(watermark, self.watermark)
+        self.folded_orders = order_bitmap(order_ids, self.folded_orders)
+        self.last_trained = now
+        logger.info(
+            f"Model updated at {now}: {len(affected)} affected products, "
+            f"{len(touched)} neighbour lists refreshed, {len(stale)} recomputed"
+        )
+        refreshed = touched[
+            (neighbour_ids[touched] != previous_ids).any(axis=1) | (neighbour_scores[touched] != previous_scores).any(axis=1)
+        ]
+        return InteractionDelta(
+            users=np.unique(user_col).astype(np.int64),
+            products=product_ids[affected],
+            neighbour_products=product_ids[np.union1d(affected, refreshed)]
+        )
+    
     def get_similar_products(self, product_id: int, top_k: int = 5) -> List[Dict]:
         """
         Get K most similar products to a given product
+        (at most n_neighbours are available per product)
         Returns: List of {product_id, similarity_score}
         """
-        if self.item_similarity_matrix is None:
+        if self.neighbour_ids is None:
             logger.warning("Model not trained yet")
             return []
         
-        try:
-            product_idx = self.product_ids.index(product_id)
-        except ValueError:
+        product_idx = self.product_index.get(product_id)
+        if product_idx is None:
             logger.warning(f"Product {product_id} not found in training data")
             return []
         
-        # Get similarity scores for this product
-        similarities = self.item_similarity_matrix[product_idx]
-        
-        # Get top K similar products (excluding itself)
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Neighbours are stored sorted by descending similarity
+        neighbour_ids = self.neighbour_ids[product_idx, :top_k]
+        similarities = self.neighbour_scores[product_idx, :top_k]
         
         recommendations = [
             {
-                "product_id": self.product_ids[idx],
-                "similarity_score": float(similarities[idx])
+                "product_id": int(self.product_ids[idx]),
+                "similarity_score": float(score)
             }
-            for idx in top_indices
-            if similarities[idx] > 0  # Only include positive similarities
+            for idx, score in zip(neighbour_ids, similarities)
+            if idx >= 0 and score > 0  # Only include positive similarities
         ]
         
         return recommendations
@@ -121,33 +438,38 @@ class CollaborativeFilteringModel:
         Get personalized recommendations for a user
         Based on products similar to what they've already purchased
         """
-        if self.user_item_matrix is None:
+        if self.user_item_matrix is None or self.neighbour_ids is None:
             logger.warning("Model not trained yet")
             return []
         
-        try:
-            user_idx = self.user_ids.index(user_id)
-        except ValueError:
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None:
             logger.warning(f"User {user_id} not found in training data")
             return []
         
-        # Get user's purchase history
-        user_purchases = self.user_item_matrix[user_idx]
+        # Get user's purchase history (sparse row)
+        start, end = self.user_item_matrix.indptr[user_idx], self.user_item_matrix.indptr[user_idx + 1]
+        purchased = self.user_item_matrix.indices[start:end]
+        strengths = self.user_item_matrix.data[start:end]
         
-        # Calculate scores for all products
-        # Score = sum of (similarity to purchased products * purchase strength)
-        scores = np.dot(self.item_similarity_matrix, user_purchases)
+        # Score = sum of (similarity to purchased products * purchase strength),
+        # accumulated over the stored neighbours of each purchased product
+        candidates = self.neighbour_ids[purchased]
+        weights = self.neighbour_scores[purchased] * strengths[:, None]
+        valid = candidates >= 0
+        candidates, inverse = np.unique(candidates[valid], return_inverse=True)
+        scores = np.bincount(inverse, weights=weights[valid], minlength=len(candidates))
         
         # Exclude already purchased products if requested
         if exclude_purchased:
-            scores = scores * (user_purchases == 0)
+            scores = scores * ~np.isin(candidates, purchased)
         
         # Get top K products
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        top_indices = top_k_indices(scores, top_k)
         
         recommendations = [
             {
-                "product_id": self.product_ids[idx],
+                "product_id": int(self.product_ids[candidates[idx]]),
                 "recommendation_score": float(scores[idx])
             }
             for idx in top_indices
@@ -156,12 +478,156 @@ class CollaborativeFilteringModel:
         
         return recommendations
     
+    def get_similar_products_batch(self, product_ids: List[int], top_k: int = 5) -> List[List[Dict]]:
+        """
+        get_similar_products for many products with one lookup into the neighbour table
+        Returns: one list of {product_id, similarity_score} per product, in input order
+        """
+        if self.neighbour_ids is None:
+            logger.warning("Model not trained yet")
+            return [[] for _ in product_ids]
+        
+        rows = self.product_index.lookup(product_ids)
+        known = np.nonzero(rows >= 0)[0]
+        if len(known) < len(rows):
+            logger.warning(f"{len(rows) - len(known)} of {len(rows)} products not found in training data")
+        
+        neighbour_ids = self.neighbour_ids[rows[known], :top_k]
+        similarities = self.neighbour_scores[rows[known], :top_k]
+        neighbour_products = self.product_ids[np.maximum(neighbour_ids, 0)]
+        
+        results = [[] for _ in product_ids]
+        for position, ids, products, scores in zip(known, neighbour_ids, neighbour_products, similarities):
+            results[position] = [
+                {"product_id": int(product), "similarity_score": float(score)}
+                for idx, product, score in zip(ids, products, scores)
+                if idx >= 0 and score > 0
+            ]
+        return results
+    
+    def get_user_recommendations_batch(
+        self,
+        user_ids: List[int],
+        top_k: int = 10,
+        exclude_purchased: bool = True
+    ) -> List[List[Dict]]:
+        """
+        get_user_recommendations for many users with one sparse product:
+        [users, bought] purchases @ [bought, products] neighbour similarities,
+        over only the products bought by these users
+        Returns: one list of {product_id, recommendation_score} per user, in input order
+        """
+        if self.user_item_matrix is None or self.neighbour_ids is None:
+            logger.warning("Model not trained yet")
+            return [[] for _ in user_ids]
+        
+        rows = self.user_index.lookup(user_ids)
+        known = np.nonzero(rows >= 0)[0]
+        if len(known) < len(rows):
+            logger.warning(f"{len(rows) - len(known)} of {len(rows)} users not found in training data")
+        
+        # Stored neighbour lists of the products bought in this batch as a sparse matrix;
+        # the purchase columns are renumbered to its rows
+        purchases = self.user_item_matrix[rows[known]]
+        bought, columns = np.unique(purchases.indices, return_inverse=True)
+        neighbour_ids = self.neighbour_ids[bought]
+        valid = neighbour_ids >= 0
+        similarity = sp.csr_matrix(
+            (self.neighbour_scores[bought][valid], (np.nonzero(valid)[0], neighbour_ids[valid])),
+            shape=(len(bought), len(self.product_ids))
+        )
+        bought_purchases = sp.csr_matrix(
+            (purchases.data, columns.ravel(), purchases.indptr), shape=(len(known), len(bought))
+        )
+        scores = (bought_purchases @ similarity).tocsr()
+        if exclude_purchased:
+            scores = (scores - scores.multiply(purchases > 0)).tocsr()
+        top_ids, top_scores = top_k_per_row(scores, top_k)
+        top_products = self.product_ids[np.maximum(top_ids, 0)]
+        
+        results = [[] for _ in user_ids]
+        for position, ids, products, user_scores in zip(known, top_ids, top_products, top_scores):
+            results[position] = [
+                {"product_id": int(product), "recommendation_score": float(score)}
+                for idx, product, score in zip(ids, products, user_scores)
+                if idx >= 0
+            ]
+        return results
+    
+    def save(self, path: str) -> Optional[str]:
+        """
+        Save model as a new artifact generation under path
+        (id maps, neighbour table and CSR arrays as raw .npy files)
+        """
+        if self.neighbour_ids is None:
+            logger.warning("Model not trained yet, nothing to save")
+            return None
+        
+        matrix = self.user_item_matrix
+        arrays = {
+            "product_ids": self.product_ids,
+            "user_ids": self.user_ids,
+            "neighbour_ids": self.neighbour_ids,
+            "neighbour_scores": self.neighbour_scores,
+            "item_norms": self.item_norms,
+            "folded_orders": self.folded_orders,
+            "interactions_data": matrix.data,
+            "interactions_indices": matrix.indices,
+            "interactions_indptr": matrix.indptr,
+        }
+        metadata = {
+            "shape": list(matrix.shape),
+            "n_neighbours": self.n_neighbours,
+            "decay_half_life_days": self.decay_half_life_days,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "last_trained": self.last_trained.isoformat() if self.last_trained else None,
+        }
+        
+        generation = write_generation(path, arrays, metadata)
+        self.artifact_version = os.path.basename(generation)
+        logger.info(f"Model saved to {generation}")
+        return generation
+    
+    def load(self, path: str, mmap_mode: Optional[str] = "r", version: Optional[str] = None) -> bool:
+        """
+        Load the latest (or the given version's) artifact generation from path.
+        Arrays are memory-mapped by default, so workers share the same pages.
+        """
+        generation = find_generation(path, version)
+        manifest = read_manifest(generation) if generation else None
+        if manifest is None:
+            logger.info(f"No collaborative filtering artifacts found in {path}")
+            return False
+        
+        arrays = load_arrays(generation, manifest, mmap_mode=mmap_mode)
+        metadata = manifest["metadata"]
+        
+        self.user_item_matrix = sp.csr_matrix(
+            (arrays["interactions_data"], arrays["interactions_indices"], arrays["interactions_indptr"]),
+            shape=tuple(metadata["shape"]),
+            copy=False
+        )
+        self.product_ids = arrays["product_ids"]
+        self.user_ids = arrays["user_ids"]
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.neighbour_ids = arrays["neighbour_ids"]
+        self.neighbour_scores = arrays["neighbour_scores"]
+        self.item_norms = arrays["item_norms"]
+        # Artifacts without the folded order ids get a full fit on the next incremental run
+        self.folded_orders = arrays.get("folded_orders")
+        self.n_neighbours = metadata["n_neighbours"]
+        self.decay_half_life_days = metadata["decay_half_life_days"]
+        self.watermark = datetime.fromisoformat(metadata["watermark"]) if metadata["watermark"] else None
+        self.last_trained = datetime.fromisoformat(metadata["last_trained"]) if metadata["last_trained"] else None
+        self.artifact_version = manifest["version"]
+        
+        logger.info(f"Model loaded from {generation}")
+        return True
+    
     def needs_retraining(self, max_age_hours: int = 24) -> bool:
         """Check if model needs retraining"""
         if self.last_trained is None:
             return True
         age = datetime.utcnow() - self.last_trained
         return age > timedelta(hours=max_age_hours)
-
-# Global model instance
-cf_model = CollaborativeFilteringModel()
\ No newline at end of file
@@ -1,179 +1,704 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, NamedTuple, Optional
 import logging
-import pickle
+import hashlib
+import json
 import os
+import tempfile
+import time
+
+from app.config import (
+    CB_EMBEDDING_DTYPE, CB_INDEX_TYPE, CB_IVF_NLIST, CB_IVF_NPROBE, CB_PQ_M, CB_PQ_NBITS,
+    CB_HNSW_M, CB_HNSW_EF_CONSTRUCTION, CB_HNSW_EF_SEARCH,
+    CB_FIT_CHUNK_SIZE, CB_ENCODE_PROCESSES, CB_ARTIFACTS_DIR, CB_HYBRID_CANDIDATES, CB_RRF_K
+)
+from app.models.encoder import LazyEncoder, get_encoder
+from app.utils import ann_index
+from app.utils.artifacts import write_generation, find_generation, read_manifest, load_arrays, verify_generation
+from app.utils.bm25 import BM25Builder, BM25Index
+from app.utils.data_access import PRODUCTS_QUERY, stream_partitions
+from app.utils.id_index import IdIndex
+from app.utils.quantization import EMBEDDING_DTYPES, ScalarQuantizer, compress, decompress
+from app.utils.snapshot import Snapshot
 
 logger = logging.getLogger(__name__)
 
+# An incremental fit rebuilds the index instead of updating it once this share of products changed,
+# so IVF cells are retrained as the catalog drifts
+INDEX_REBUILD_FRACTION = 0.2
+
+# FAISS index file and BM25 vocabulary inside an artifact generation
+INDEX_FILE = "faiss.index"
+TERMS_FILE = "bm25_terms.json"
+
+# /search modes: embeddings only, BM25 only, or both fused by reciprocal rank
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+class SearchFilter(NamedTuple):
+    """Product attribute filter applied inside the FAISS search (the default keeps in-stock products)"""
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = True
+
 class ContentBasedModel:
     """
-    Content-based filtering using sentence transformers and FAISS
+    Content-based filtering using sentence transformers and FAISS.
+    The transformer is loaded lazily and shared between instances; serving
+    similar products from stored embeddings never needs it.
+    The FAISS index type (flat, ivf_flat, ivf_pq, hnsw) is configurable, and
+    embeddings can be kept as float16 or int8 codes with a matching
+    scalar-quantizer index instead of two float32 copies. A BM25 inverted
+    index over the same texts serves lexical and hybrid search.
     """
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        self.encoder = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        encoder: Optional[LazyEncoder] = None,
+        index_type: str = CB_INDEX_TYPE,
+        nprobe: int = CB_IVF_NPROBE,
+        ef_search: int = CB_HNSW_EF_SEARCH,
+        embedding_dtype: str = CB_EMBEDDING_DTYPE
+    ):
+        if index_type not in ann_index.INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {ann_index.INDEX_TYPES}")
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype {embedding_dtype!r}, expected one of {EMBEDDING_DTYPES}")
+        self.encoder = encoder if encoder is not None else get_encoder(model_name)
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
         self.index = None
-        self.product_ids = []
-        self.embeddings = None
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.product_index = IdIndex(self.product_ids)
+        self.embeddings = None  # [n_products, dimension] in embedding_dtype; memory-mapped once saved or loaded
+        self.embedding_dtype = embedding_dtype
+        self.quantizer: Optional[ScalarQuantizer] = None  # per-dimension ranges of int8 embeddings
+        self.text_hashes = None  # uint64 hash of each product's text, aligned with product_ids
+        # Filterable attributes, aligned with product_ids
+        self.categories: List[str] = []  # category names, indexed by category code
+        self.category_codes = np.empty(0, dtype=np.int16)  # -1 for products without a category
+        self.prices = np.empty(0, dtype=np.float32)
+        self.in_stock = np.empty(0, dtype=bool)
+        self._in_stock_bitmap = None
+        self.lexical: Optional[BM25Index] = None  # BM25 index over the same product texts
+        self.fit_stats = None
         self.dimension = 384  # Dimension for all-MiniLM-L6-v2
+        self.encoder_model = None  # name of the encoder that produced the embeddings
+        self.artifact_version = None
+    
+    def iter_product_texts(self, db_session, chunk_size: int = CB_FIT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+        """
+        Stream product information from the database through a server-side cursor,
+        or from a Snapshot. All products are indexed; stock is kept as a filter attribute
+        Yields: lists of at most chunk_size (product_id, text, category, price, stock)
+        """
+        if isinstance(db_session, Snapshot):
+            partitions = db_session.product_partitions(chunk_size)
+        else:
+            partitions = stream_partitions(db_session, PRODUCTS_QUERY, chunk_size=chunk_size)
         
-    def prepare_product_texts(self, db_session) -> List[tuple]:
+        for rows in partitions:
+            # Combine name, description, and category into searchable text
+            product_texts = []
+            for product_id, name, description, category, price, stock in rows:
+                text_parts = [name]
+                if description:
+                    text_parts.append(description)
+                if category:
+                    text_parts.append(f"Category: {category}")
+                
+                combined_text = " ".join(text_parts)
+                product_texts.append((product_id, combined_text, category, price, stock))
+            yield product_texts
+    
+    @staticmethod
+    def hash_texts(texts: List[str]) -> np.ndarray:
+        """64-bit content hash of every product text, used as the embedding cache key"""
+        return np.array(
+            [int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") for text in texts],
+            dtype=np.uint64
+        )
+    
+    def build_index(self, embeddings: np.ndarray, product_ids: np.ndarray):
+        """FAISS index of the configured type over the embeddings, labelled with product ids"""
+        index = ann_index.build_index(
+            embeddings,
+            product_ids,
+            self.index_type,
+            nlist=CB_IVF_NLIST,
+            pq_m=CB_PQ_M,
+            pq_nbits=CB_PQ_NBITS,
+            hnsw_m=CB_HNSW_M,
+            ef_construction=CB_HNSW_EF_CONSTRUCTION,
+            storage=self.embedding_dtype,
+            chunk_size=CB_FIT_CHUNK_SIZE
+        )
+        return ann_index.configure_search(index, nprobe=self.nprobe, ef_search=self.ef_search)
+    
+    def vectors(self, rows) -> np.ndarray:
+        """float32 embeddings of the given rows (index array or slice)"""
+        return decompress(self.embeddings[rows], self.quantizer)
+    
+    def fit(
+        self,
+        db_session,
+        previous: Optional["ContentBasedModel"] = None,
+        chunk_size: int = CB_FIT_CHUNK_SIZE,
+        processes: int = CB_ENCODE_PROCESSES,
+        work_dir: str = CB_ARTIFACTS_DIR
+    ):
         """
-        Extract product information from database
-        Returns: List of (product_id, text)
+        Train the content-based model from a database session or a Snapshot.
+        Products are streamed from the source chunk_size rows at a time; each chunk
+        is encoded (across `processes` encoder processes when > 1) and appended to
+        an embedding scratch file under work_dir, and the index is filled from that
+        file chunk by chunk, so the heap holds one chunk of texts and vectors
+        whatever the catalog size. The BM25 index is rebuilt from the same chunks.
+        With a previously trained model, embeddings of products whose text hash is
+        unchanged are reused and only new or changed products are encoded; the
+        previous index is copied and updated by product id unless its type
+        changed, it cannot be updated (HNSW, memory-mapped IVF lists) or too
+        much of the catalog changed, in which case it is rebuilt from the embeddings.
+        If no product was re-encoded or removed, the previous index and embeddings are shared.
         """
-        from sqlalchemy import text
+        logger.info("Training content-based model...")
+        started = time.perf_counter()
         
-        query = text("""
-            SELECT id, name, description, category
-            FROM products
-            WHERE stock > 0
-            ORDER BY id
-        """)
+        cached = previous is not None and previous.index is not None and previous.text_hashes is not None
+        if cached and (previous.encoder_model != self.encoder.model_name or previous.dimension != self.encoder.dimension):
+            # Embeddings of another encoder are not comparable with this one's
+            logger.info(
+                f"Previous embeddings come from {previous.encoder_model} ({previous.dimension} dimensions), "
+                f"re-encoding every product with {self.encoder.model_name}"
+            )
+            cached = False
+        previous_index = previous.index if cached else None
+        ids_chunks, hash_chunks, code_chunks, price_chunks, stock_chunks, reuse_chunks = [], [], [], [], [], []
+        category_lookup = {}
+        lexical = BM25Builder()
+        os.makedirs(work_dir, exist_ok=True)
+        scratch = tempfile.TemporaryFile(dir=work_dir)  # float32 embeddings, unlinked on close
+        dimension = None
+        n_products = n_encoded = 0
         
-        results = db_session.execute(query).fetchall()
+        pool = self.encoder.start_pool(processes) if processes > 1 else None
+        try:
+            for product_data in self.iter_product_texts(db_session, chunk_size):
+                product_ids = np.array([row[0] for row in product_data], dtype=np.int64)
+                texts = [row[1] for row in product_data]
+                text_hashes = self.hash_texts(texts)
+                lexical.add(texts)
+                
+                # Look up cached embeddings by product id and text hash
+                if cached:
+                    previous_rows = previous.product_index.lookup(product_ids)
+                    reuse = previous_rows >= 0
+                    reuse[reuse] = previous.text_hashes[previous_rows[reuse]] == text_hashes[reuse]
+                else:
+                    previous_rows = np.full(len(product_ids), -1, dtype=np.int64)
+                    reuse = np.zeros(len(product_ids), dtype=bool)
+                
+                to_encode = np.nonzero(~reuse)[0]
+                encoded = None
+                if len(to_encode) > 0:
+                    chunk_texts = [texts[i] for i in to_encode]
+                    if pool is not None:
+                        encoded = self.encoder.encode_with_pool(chunk_texts, pool)
+                    else:
+                        encoded = self.encoder.encode(chunk_texts, show_progress_bar=False, convert_to_numpy=True)
+                    encoded = encoded.astype(np.float32, copy=False)
+                
+                if dimension is None:
+                    dimension = encoded.shape[1] if encoded is not None else previous.embeddings.shape[1]
+                embeddings = np.empty((len(product_ids), dimension), dtype=np.float32)
+                if encoded is not None:
+                    embeddings[to_encode] = encoded
+                if reuse.any():
+                    embeddings[reuse] = previous.vectors(previous_rows[reuse])
+                scratch.write(embeddings.tobytes())
+                
+                ids_chunks.append(product_ids)
+                hash_chunks.append(text_hashes)
+                reuse_chunks.append(reuse)
+                # Category codes in order of first appearance; renumbered by name below
+                code_chunks.append(np.array(
+                    [category_lookup.setdefault(row[2], len(category_lookup)) if row[2] else -1 for row in product_data],
+                    dtype=np.int16
+                ))
+                price_chunks.append(np.array([row[3] or 0 for row in product_data], dtype=np.float32))
+                stock_chunks.append(np.array([(row[4] or 0) > 0 for row in product_data], dtype=bool))
+                
+                n_products += len(product_ids)
+                n_encoded += len(to_encode)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"Content fit: {n_products} products read, {n_encoded} encoded "
+                    f"({n_products / elapsed:.0f} products/s)"
+                )
+        finally:
+            if pool is not None:
+                self.encoder.stop_pool(pool)
         
-        if not results:
-            logger.warning("No products found")
-            return []
+        if n_products == 0:
+            scratch.close()
+            logger.warning("No products to encode")
+            return
         
-        # Combine name, description, and category into searchable text
-        product_texts = []
-        for product_id, name, description, category in results:
-            text_parts = [name]
-            if description:
-                text_parts.append(description)
-            if category:
-                text_parts.append(f"Category: {category}")
-            
-            combined_text = " ".join(text_parts)
-            product_texts.append((product_id, combined_text))
-        
-        logger.info(f"Prepared {len(product_texts)} product texts")
-        return product_texts
-    
-    def fit(self, db_session):
-        """Train the content-based model"""
-        logger.info("Training content-based model...")
+        scratch.flush()
+        embeddings = np.memmap(scratch, dtype=np.float32, mode="r", shape=(n_products, dimension))
+        encode_seconds = time.perf_counter() - started
         
-        # Get product texts
-        product_data = self.prepare_product_texts(db_session)
+        product_ids = np.concatenate(ids_chunks)
+        text_hashes = np.concatenate(hash_chunks)
+        reuse = np.concatenate(reuse_chunks)
+        categories = sorted(category_lookup)
+        renumber = np.array([categories.index(category) for category in category_lookup] + [-1], dtype=np.int16)
+        category_codes = renumber[np.concatenate(code_chunks)]  # -1 maps to the trailing -1
+        prices = np.concatenate(price_chunks)
+        in_stock = np.concatenate(stock_chunks)
+        del ids_chunks, hash_chunks, reuse_chunks, code_chunks, price_chunks, stock_chunks
         
-        if not product_data:
-            logger.warning("No products to encode")
-            return
+        to_encode = np.nonzero(~reuse)[0]
+        removed = len(np.setdiff1d(previous.product_ids, product_ids)) if cached else 0
+        changed = len(to_encode) + removed
+        # Compared with the type a build would pick for this catalog (small ones fall back to simpler types)
+        index_type = ann_index.effective_index_type(self.index_type, len(product_ids), CB_PQ_NBITS)
+        same_config = (
+            cached
+            and ann_index.index_type_of(previous.index) == index_type
+            and previous.embedding_dtype == self.embedding_dtype
+            and ann_index.index_storage_of(previous.index) == ("pq" if index_type == "ivf_pq" else self.embedding_dtype)
+        )
+        update_index = (
+            same_config
+            and ann_index.supports_update(previous.index)
+            and changed <= INDEX_REBUILD_FRACTION * len(product_ids)
+        )
+        if same_config and changed == 0:
+            # Nothing re-encoded or removed: share the previous model's index and embeddings (never mutated once published)
+            logger.info("No product text changed, reusing the FAISS index")
+            index = previous.index
+        elif update_index:
+            # Copy the live index (it may be serving) and update membership by product id
+            logger.info("Updating FAISS index...")
+            index = faiss.clone_index(previous.index)
+            stale_ids = np.setdiff1d(previous.product_ids, product_ids[reuse])
+            if len(stale_ids) > 0:
+                index.remove_ids(stale_ids)
+            for start in range(0, len(to_encode), chunk_size):
+                rows = to_encode[start:start + chunk_size]
+                index.add_with_ids(np.ascontiguousarray(embeddings[rows]), product_ids[rows])
+            index = ann_index.configure_search(index, nprobe=self.nprobe, ef_search=self.ef_search)
+        else:
+            # Build FAISS index for fast similarity search
+            logger.info(f"Building {self.index_type} FAISS index...")
+            index = self.build_index(embeddings, product_ids)
         
-        self.product_ids = [pid for pid, _ in product_data]
-        texts = [text for _, text in product_data]
+        # Keep only the compressed copy; an updated index keeps the previous int8 ranges like its own quantizer
+        if index is previous_index:
+            stored, quantizer = previous.embeddings, previous.quantizer
+            del embeddings
+        elif self.embedding_dtype == "float32":
+            stored, quantizer = embeddings, None
+        else:
+            quantizer = previous.quantizer if update_index else None
+            if self.embedding_dtype == "int8" and quantizer is None:
+                quantizer = ScalarQuantizer.train(embeddings)
+            stored = np.memmap(
+                tempfile.TemporaryFile(dir=work_dir),
+                dtype=self.embedding_dtype,
+                mode="w+",
+                shape=embeddings.shape
+            )
+            for start in range(0, n_products, chunk_size):
+                stored[start:start + chunk_size], _ = compress(
+                    embeddings[start:start + chunk_size], self.embedding_dtype, quantizer
+                )
+            del embeddings
         
-        # Generate embeddings
-        logger.info("Generating embeddings...")
-        self.embeddings = self.encoder.encode(
-            texts,
-            show_progress_bar=True,
-            convert_to_numpy=True
+        elapsed = time.perf_counter() - started
+        self.fit_stats = {
+            "products": n_products,
+            "reused": int(reuse.sum()),
+            "encoded": int(len(to_encode)),
+            "removed": removed,
+            "cache_hit_rate": float(reuse.mean()),
+            "encode_seconds": encode_seconds,
+            "seconds": elapsed,
+            "products_per_second": n_products / elapsed,
+        }
+        logger.info(
+            f"Embedding cache: {self.fit_stats['reused']} reused, {self.fit_stats['encoded']} encoded, "
+            f"{removed} removed (hit rate {self.fit_stats['cache_hit_rate']:.1%})"
+        )
+        
+        self.product_ids = product_ids
+        self.product_index = IdIndex(product_ids)
+        self.text_hashes = text_hashes
+        self.categories = categories
+        self.category_codes = category_codes
+        self.prices = prices
+        self.in_stock = in_stock
+        self.embeddings = stored
+        self.quantizer = quantizer
+        self.dimension = dimension
+        self.encoder_model = self.encoder.model_name
+        self.index = index
+        self.lexical = lexical.build()
+        
+        logger.info(f"Model trained with {n_products} products in {elapsed:.1f}s ({n_products / elapsed:.0f} products/s)")
+    
+    def same_neighbours(self, other: "ContentBasedModel") -> bool:
+        """
+        True if other shares this model's index over the same products and stock,
+        so in-stock similar-product lists (those of the hybrid table) come out the same
+        """
+        return (
+            self.index is not None
+            and self.index is other.index
+            and np.array_equal(self.product_ids, other.product_ids)
+            and np.array_equal(self.in_stock, other.in_stock)
         )
+    
+    def same_content(self, other: "ContentBasedModel") -> bool:
+        """True if other would serve exactly what this model serves (same index, texts and filter attributes)"""
+        return (
+            self.same_neighbours(other)
+            and np.array_equal(self.text_hashes, other.text_hashes)
+            and self.categories == other.categories
+            and np.array_equal(self.category_codes, other.category_codes)
+            and np.array_equal(self.prices, other.prices)
+        )
+    
+    def filter_mask(self, search_filter: SearchFilter) -> Optional[np.ndarray]:
+        """Row mask of the products passing the filter, or None when nothing is filtered out"""
+        if search_filter == SearchFilter(in_stock=False):
+            return None
+        if search_filter == SearchFilter():
+            return self.in_stock
         
-        # Build FAISS index for fast similarity search
-        logger.info("Building FAISS index...")
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(self.embeddings.astype('float32'))
+        mask = np.ones(len(self.product_ids), dtype=bool)
+        if search_filter.in_stock:
+            mask &= self.in_stock
+        if search_filter.category is not None:
+            code = self.categories.index(search_filter.category) if search_filter.category in self.categories else -2
+            mask &= self.category_codes == code
+        if search_filter.min_price is not None:
+            mask &= self.prices >= search_filter.min_price
+        if search_filter.max_price is not None:
+            mask &= self.prices <= search_filter.max_price
+        return mask
+    
+    def filter_bitmap(self, search_filter: SearchFilter, exclude_id: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        IDSelectorBitmap bitmap of the product ids passing the filter, or None when nothing is filtered out
+        exclude_id additionally drops one product, e.g. the query product itself
+        """
+        if search_filter == SearchFilter():
+            # The default in-stock filter is shared by most requests; the model is immutable once published
+            if self._in_stock_bitmap is None:
+                self._in_stock_bitmap = ann_index.id_bitmap(self.product_ids[self.in_stock])
+            bitmap = self._in_stock_bitmap
+        else:
+            mask = self.filter_mask(search_filter)
+            if mask is None and exclude_id is None:
+                return None
+            bitmap = ann_index.id_bitmap(self.product_ids if mask is None else self.product_ids[mask])
         
-        logger.info(f"Model trained with {len(self.product_ids)} products")
+        if exclude_id is not None and (exclude_id >> 3) < len(bitmap):
+            bitmap = bitmap.copy()
+            bitmap[exclude_id >> 3] &= np.uint8(~(1 << (exclude_id & 7)) & 0xFF)
+        return bitmap
     
-    def get_similar_products(self, product_id: int, top_k: int = 5) -> List[Dict]:
+    def get_similar_products(
+        self,
+        product_id: int,
+        top_k: int = 5,
+        search_filter: SearchFilter = SearchFilter()
+    ) -> List[Dict]:
         """
-        Find similar products using FAISS
+        Find similar products using FAISS, restricted to products passing search_filter
         """
-        if self.index is None or not self.product_ids:
+        if self.index is None or len(self.product_ids) == 0:
             logger.warning("Model not trained yet")
             return []
         
-        try:
-            product_idx = self.product_ids.index(product_id)
-        except ValueError:
+        product_idx = self.product_index.get(product_id)
+        if product_idx is None:
             logger.warning(f"Product {product_id} not in index")
             return []
         
         # Get embedding for this product
-        query_embedding = self.embeddings[product_idx:product_idx+1].astype('float32')
+        query_embedding = self.vectors(slice(product_idx, product_idx + 1))
         
-        # Search FAISS index (k+1 because first result is the query itself)
-        distances, indices = self.index.search(query_embedding, top_k + 1)
+        # The query product is excluded by the filter, so one search returns the full top_k
+        bitmap = self.filter_bitmap(search_filter, exclude_id=product_id)
+        if not bitmap.any():
+            return []
+        distances, labels = ann_index.search(self.index, query_embedding, top_k, bitmap)
         
-        # Skip first result (the query product itself)
-        recommendations = []
-        for idx, distance in zip(indices[0][1:], distances[0][1:]):
-            if idx < len(self.product_ids):  # Safety check
-                recommendations.append({
-                    "product_id": self.product_ids[idx],
-                    "similarity_score": float(1 / (1 + distance))  # Convert distance to similarity
-                })
+        # Index labels are product ids; skip FAISS -1 padding
+        return [
+            {
+                "product_id": int(label),
+                "similarity_score": float(1 / (1 + distance))  # Convert distance to similarity
+            }
+            for label, distance in zip(labels[0], distances[0])
+            if label >= 0
+        ]
+    
+    def get_similar_products_batch(
+        self,
+        product_ids: List[int],
+        top_k: int = 5,
+        search_filter: SearchFilter = SearchFilter()
+    ) -> List[List[Dict]]:
+        """
+        get_similar_products for many products with one FAISS search over the stacked embeddings
+        Returns: one list of {product_id, similarity_score} per product, in input order
+        """
+        if self.index is None or len(self.product_ids) == 0:
+            logger.warning("Model not trained yet")
+            return [[] for _ in product_ids]
+        
+        rows = self.product_index.lookup(product_ids)
+        known = np.nonzero(rows >= 0)[0]
+        if len(known) < len(rows):
+            logger.warning(f"{len(rows) - len(known)} of {len(rows)} products not in index")
+        
+        ids, similarities = self.neighbour_arrays(rows[known], top_k, search_filter)
+        results = [[] for _ in product_ids]
+        for position, row_ids, row_similarities in zip(known, ids, similarities):
+            results[position] = [
+                {
+                    "product_id": int(product_id),
+                    "similarity_score": float(similarity)
+                }
+                for product_id, similarity in zip(row_ids, row_similarities)
+                if product_id >= 0
+            ]
+        return results
+    
+    def neighbour_arrays(
+        self,
+        rows: np.ndarray,
+        k: int,
+        search_filter: SearchFilter = SearchFilter()
+    ):
+        """
+        Similar products of the products at rows with one FAISS search, as fixed-width arrays
+        Returns: (product ids int64 [len(rows), k] padded with -1, similarities float32 padded with 0)
+        """
+        ids = np.full((len(rows), k), -1, dtype=np.int64)
+        similarities = np.zeros((len(rows), k), dtype=np.float32)
+        bitmap = self.filter_bitmap(search_filter)
+        if len(rows) == 0 or k <= 0 or (bitmap is not None and not bitmap.any()):
+            return ids, similarities
         
-        return recommendations
+        # One shared filter for all queries: ask for one extra result and drop each query product
+        distances, labels = ann_index.search(self.index, self.vectors(rows), k + 1, bitmap)
+        drop = (labels < 0) | (labels == self.product_ids[rows][:, None])
+        order = np.argsort(drop, axis=1, kind="stable")[:, :k]
+        labels = np.take_along_axis(labels, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        drop = np.take_along_axis(drop, order, axis=1)
+        ids[:] = np.where(drop, -1, labels)
+        similarities[:] = np.where(drop, 0, 1 / (1 + distances))
+        return ids, similarities
+    
+    def search_products(
+        self,
+        query: str,
+        top_k: int = 10,
+        search_filter: SearchFilter = SearchFilter(),
+        mode: str = "vector"
+    ) -> List[Dict]:
+        """
+        Product search for a text query: semantic (vector), BM25 (lexical) or both fused (hybrid)
+        """
+        return self.search_products_batch([query], top_k, search_filter, mode)[0]
     
-    def search_products(self, query: str, top_k: int = 10) -> List[Dict]:
+    def search_products_batch(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        search_filter: SearchFilter = SearchFilter(),
+        mode: str = "vector"
+    ) -> List[List[Dict]]:
         """
-        Semantic search for products matching a text query
+        Product search for several queries, restricted to products passing search_filter.
+        vector: one encoder batch and one FAISS search for all queries
+        lexical: BM25 over the inverted index (no encoder needed)
+        hybrid: the top CB_HYBRID_CANDIDATES of both, fused by reciprocal rank
+        Returns: one result list per query
         """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
         if self.index is None:
             logger.warning("Model not trained yet")
-            return []
+            return [[] for _ in queries]
+        
+        mask = self.filter_mask(search_filter)
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
         
-        # Encode query
-        query_embedding = self.encoder.encode([query], convert_to_numpy=True).astype('float32')
+        if mode == "lexical":
+            return [
+                [
+                    {"product_id": int(self.product_ids[row]), "relevance_score": float(score)}
+                    for row, score in zip(*self.lexical.search(query, top_k, mask))
+                ]
+                for query in queries
+            ]
+        
+        # Encode queries (repeat queries skip the transformer)
+        query_embeddings = self.encoder.encode_queries(queries)
         
         # Search
-        distances, indices = self.index.search(query_embedding, top_k)
+        depth = max(top_k, CB_HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+        distances, labels = ann_index.search(self.index, query_embeddings, depth, self.filter_bitmap(search_filter))
+        
+        if mode == "hybrid":
+            return [
+                self._fuse(row_labels[row_labels >= 0], self.lexical.search(query, depth, mask)[0], top_k)
+                for query, row_labels in zip(queries, labels)
+            ]
         
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.product_ids):
-                results.append({
-                    "product_id": self.product_ids[idx],
+        return [
+            [
+                {
+                    "product_id": int(label),
                     "relevance_score": float(1 / (1 + distance))
-                })
+                }
+                for label, distance in zip(row_labels, row_distances)
+                if label >= 0
+            ]
+            for row_labels, row_distances in zip(labels, distances)
+        ]
+    
+    def _fuse(self, vector_ids: np.ndarray, lexical_rows: np.ndarray, top_k: int) -> List[Dict]:
+        """Reciprocal rank fusion of vector results (product ids) and lexical results (rows)"""
+        scores = {}
+        for ranked_ids in (vector_ids, self.product_ids[lexical_rows]):
+            for rank, product_id in enumerate(ranked_ids.tolist()):
+                scores[product_id] = scores.get(product_id, 0.0) + 1 / (CB_RRF_K + rank + 1)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{"product_id": product_id, "relevance_score": score} for product_id, score in ranked]
+    
+    def save(self, path: str) -> Optional[str]:
+        """
+        Save model as a new artifact generation under path: product ids, text hashes,
+        filter attributes, embeddings (in embedding_dtype, with int8 ranges) and BM25
+        postings as raw .npy files plus the FAISS index and BM25 vocabulary
+        """
+        if self.index is None:
+            logger.warning("Model not trained yet, nothing to save")
+            return None
         
-        return results
+        arrays = {
+            "product_ids": self.product_ids,
+            "embeddings": self.embeddings,
+            "text_hashes": self.text_hashes,
+            "category_codes": self.category_codes,
+            "prices": self.prices,
+            "in_stock": self.in_stock,
+        }
+        arrays.update(self.lexical.arrays())
+        if self.quantizer is not None:
+            arrays["embedding_offset"] = self.quantizer.offset
+            arrays["embedding_scale"] = self.quantizer.scale
+        metadata = {
+            "dimension": self.dimension,
+            "count": len(self.product_ids),
+            "index_type": ann_index.index_type_of(self.index),
+            "embedding_dtype": self.embedding_dtype,
+            "categories": self.categories,
+            "encoder_model": self.encoder_model,
+        }
+        
+        def write_terms(terms_path: str):
+            with open(terms_path, "w") as f:
+                json.dump(self.lexical.terms, f)
+        
+        generation = write_generation(
+            path,
+            arrays,
+            metadata,
+            files={
+                INDEX_FILE: lambda index_path: faiss.write_index(self.index, index_path),
+                TERMS_FILE: write_terms,
+            }
+        )
+        self.artifact_version = os.path.basename(generation)
+        # Serve embeddings from the saved file instead of the fit's scratch file
+        self.embeddings = np.load(os.path.join(generation, "embeddings.npy"), mmap_mode="r")
+        logger.info(f"Model saved to {generation}")
+        return generation
     
-    def save(self, path: str):
-        """Save model to disk"""
-        os.makedirs(path, exist_ok=True)
-        
-        # Save FAISS index
-        if self.index:
-            faiss.write_index(self.index, os.path.join(path, "faiss.index"))
-        
-        # Save metadata
-        with open(os.path.join(path, "metadata.pkl"), 'wb') as f:
-            pickle.dump({
-                'product_ids': self.product_ids,
-                'embeddings': self.embeddings,
-                'dimension': self.dimension
-            }, f)
-        
-        logger.info(f"Model saved to {path}")
-    
-    def load(self, path: str):
-        """Load model from disk"""
-        # Load FAISS index
-        index_path = os.path.join(path, "faiss.index")
-        if os.path.exists(index_path):
-            self.index = faiss.read_index(index_path)
-        
-        # Load metadata
-        metadata_path = os.path.join(path, "metadata.pkl")
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'rb') as f:
-                data = pickle.load(f)
-                self.product_ids = data['product_ids']
-                self.embeddings = data['embeddings']
-                self.dimension = data['dimension']
-        
-        logger.info(f"Model loaded from {path}")
-
-# Global model instance
-cb_model = ContentBasedModel()
\ No newline at end of file
+    def load(
+        self,
+        path: str,
+        mmap_mode: Optional[str] = "r",
+        verify: bool = False,
+        version: Optional[str] = None
+    ) -> bool:
+        """
+        Load the latest (or the given version's) artifact generation from path.
+        Arrays are memory-mapped by default, so workers share the same pages; so is the
+        FAISS index as far as FAISS supports it (see ann_index.read_index).
+        Artifacts encoded by another encoder than this model's are not loaded.
+        """
+        generation = find_generation(path, version)
+        manifest = read_manifest(generation) if generation else None
+        if manifest is None:
+            logger.info(f"No content-based artifacts found in {path}")
+            return False
+        if verify and not verify_generation(generation, manifest):
+            return False
+        
+        if "in_stock" not in manifest["arrays"] or "bm25_rows" not in manifest["arrays"]:
+            logger.info(f"Content-based artifacts in {generation} predate filter attributes or BM25, retraining")
+            return False
+        
+        # Query embeddings must come from the encoder that embedded the products
+        metadata = manifest["metadata"]
+        encoder_model = metadata.get("encoder_model")
+        if encoder_model != self.encoder.model_name or (
+            self.encoder.is_loaded and metadata["dimension"] != self.encoder.dimension
+        ):
+            logger.warning(
+                f"Content-based artifacts in {generation} were encoded with {encoder_model} "
+                f"({metadata['dimension']} dimensions), not {self.encoder.model_name}, retraining"
+            )
+            return False
+        
+        arrays = load_arrays(generation, manifest, mmap_mode=mmap_mode)
+        
+        self.index = ann_index.read_index(os.path.join(generation, INDEX_FILE), mmap=bool(mmap_mode))
+        ann_index.configure_search(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        self.index_type = ann_index.index_type_of(self.index)
+        self.product_ids = arrays["product_ids"]
+        self.product_index = IdIndex(self.product_ids)
+        self.embeddings = arrays["embeddings"]
+        self.text_hashes = arrays["text_hashes"]
+        self.category_codes = arrays["category_codes"]
+        self.prices = arrays["prices"]
+        self.in_stock = arrays["in_stock"]
+        self.categories = metadata["categories"]
+        self._in_stock_bitmap = None
+        with open(os.path.join(generation, TERMS_FILE)) as f:
+            self.lexical = BM25Index.from_arrays(json.load(f), arrays, len(self.product_ids))
+        self.dimension = metadata["dimension"]
+        self.encoder_model = encoder_model
+        self.embedding_dtype = metadata["embedding_dtype"]
+        self.quantizer = (
+            ScalarQuantizer(arrays["embedding_offset"], arrays["embedding_scale"])
+            if "embedding_offset" in arrays else None
+        )
+        self.artifact_version = manifest["version"]
+        
+        logger.info(f"Model loaded from {generation}")
+        return True
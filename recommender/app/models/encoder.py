@@ -0,0 +1,144 @@
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from app.config import (
+    CB_ENCODER_MODEL, CB_LOAD_ENCODER,
+    CB_QUERY_CACHE_SIZE, CB_QUERY_CACHE_MAX_MB, CB_QUERY_CACHE_TTL_SECONDS
+)
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+class EncoderDisabledError(RuntimeError):
+    """Raised when text needs encoding on a pod configured to serve precomputed embeddings only"""
+
+def normalize_query(query: str) -> str:
+    """Cache key of a search query: Unicode-normalized with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+class LazyEncoder:
+    """
+    SentenceTransformer wrapper that imports and loads the transformer on first use,
+    so importing the models (or serving only from saved embeddings) stays cheap.
+    Query embeddings are kept in an LRU cache tied to the loaded transformer.
+    """
+    
+    def __init__(self, model_name: str = CB_ENCODER_MODEL, enabled: bool = CB_LOAD_ENCODER):
+        self.model_name = model_name
+        self.enabled = enabled
+        self.state = "not_loaded" if enabled else "disabled"  # not_loaded, loading, loaded, failed, disabled
+        self.load_seconds = None
+        self.warmed_up = False
+        self._model = None
+        self._lock = threading.Lock()
+        self.query_cache = LRUCache(
+            CB_QUERY_CACHE_SIZE,
+            max_bytes=int(CB_QUERY_CACHE_MAX_MB * 2**20),
+            ttl_seconds=CB_QUERY_CACHE_TTL_SECONDS
+        )
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+    
+    def load(self):
+        """Load the transformer if needed and return it (thread-safe)"""
+        if self._model is not None:
+            return self._model
+        if not self.enabled:
+            raise EncoderDisabledError(f"Encoder {self.model_name} is disabled on this instance")
+        
+        with self._lock:
+            if self._model is None:
+                self.state = "loading"
+                logger.info(f"Loading encoder {self.model_name}...")
+                started = time.perf_counter()
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                    # Embeddings cached for any previously loaded transformer are not comparable
+                    self.query_cache.clear()
+                except Exception:
+                    self.state = "failed"
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.state = "loaded"
+                logger.info(f"Encoder {self.model_name} loaded in {self.load_seconds:.1f}s")
+        return self._model
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension of the transformer (loads it)"""
+        return self.load().get_sentence_embedding_dimension()
+    
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        return self.load().encode(texts, **kwargs)
+    
+    def start_pool(self, processes: int):
+        """Start encoder worker processes on the CPU for encode_with_pool; stop them with stop_pool"""
+        model = self.load()
+        logger.info(f"Starting {processes} encoder processes...")
+        return model.start_multi_process_pool(target_devices=["cpu"] * processes)
+    
+    @staticmethod
+    def stop_pool(pool):
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer.stop_multi_process_pool(pool)
+    
+    def encode_with_pool(self, texts: List[str], pool, batch_size: int = 32) -> np.ndarray:
+        """Encode texts split across the worker processes of pool"""
+        return self.load().encode_multi_process(texts, pool, batch_size=batch_size)
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        float32 embeddings of search queries as a [n, dimension] array.
+        Cached queries skip the transformer; the rest are encoded in one batch.
+        """
+        keys = [normalize_query(query) for query in queries]
+        embeddings = {key: self.query_cache.get(key) for key in set(keys)}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing:
+            encoded = self.encode(missing, convert_to_numpy=True).astype(np.float32)
+            encoded.setflags(write=False)
+            for key, embedding in zip(missing, encoded):
+                embeddings[key] = embedding
+                self.query_cache.put(key, embedding)
+        return np.stack([embeddings[key] for key in keys])
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """float32 embedding of a search query as a [1, dimension] array, served from the cache when possible"""
+        return self.encode_queries([query])
+    
+    def warm_up(self):
+        """Load the transformer and run one encode so the first request pays no start-up cost"""
+        if not self.enabled:
+            return
+        self.encode(["warm up"], convert_to_numpy=True)
+        self.warmed_up = True
+        logger.info(f"Encoder {self.model_name} warmed up")
+    
+    def status(self) -> Dict:
+        return {
+            "model_name": self.model_name,
+            "state": self.state,
+            "warmed_up": self.warmed_up,
+            "load_seconds": self.load_seconds,
+            "query_cache": self.query_cache.stats(),
+        }
+
+# One shared encoder per model name
+_encoders: Dict[str, LazyEncoder] = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(model_name: Optional[str] = None) -> LazyEncoder:
+    """Shared lazy encoder for a model name (defaults to CB_ENCODER_MODEL)"""
+    model_name = model_name or CB_ENCODER_MODEL
+    with _encoders_lock:
+        if model_name not in _encoders:
+            _encoders[model_name] = LazyEncoder(model_name)
+        return _encoders[model_name]
@@ -0,0 +1,214 @@
+import numpy as np
+import scipy.sparse as sp
+from typing import List, Dict, Optional
+import logging
+import os
+from datetime import datetime
+
+from app.config import HYBRID_NEIGHBOURS, HYBRID_CF_WEIGHT, HYBRID_CB_WEIGHT
+from app.models.collaborative_filtering import CollaborativeFilteringModel, top_k_per_row
+from app.models.content_based import ContentBasedModel
+from app.utils.artifacts import write_generation, find_generation, read_manifest, load_arrays
+from app.utils.id_index import IdIndex
+
+logger = logging.getLogger(__name__)
+
+# Query products whose candidates are merged in one sparse block while building the table
+BUILD_BLOCK_SIZE = 10000
+
+class HybridNeighbours:
+    """
+    Precomputed hybrid similar-product lists: for every product known to the
+    collaborative or the content model, the weighted sum of both similarity
+    scores over their candidates, keeping the `width` best neighbours as
+    fixed-width id and score arrays. Built once after training, so a hybrid
+    request is a single row lookup.
+    """
+    
+    def __init__(
+        self,
+        width: int = HYBRID_NEIGHBOURS,
+        cf_weight: float = HYBRID_CF_WEIGHT,
+        cb_weight: float = HYBRID_CB_WEIGHT
+    ):
+        self.width = width  # neighbours kept per product; 0 disables the table
+        self.cf_weight = cf_weight
+        self.cb_weight = cb_weight
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.product_index = IdIndex(self.product_ids)
+        self.neighbour_ids = None  # int64 [n_products, width] product ids, padded with -1
+        self.neighbour_scores = None  # float32 [n_products, width] weighted scores, padded with 0
+        self.last_trained = None
+        self.artifact_version = None
+    
+    def build_rows(
+        self,
+        cf: CollaborativeFilteringModel,
+        cb: ContentBasedModel,
+        product_ids: np.ndarray,
+        block_ids: np.ndarray
+    ):
+        """
+        Merged neighbour rows of the products in block_ids, out of the sorted product_ids.
+        Each side contributes 2 * width candidates, like the per-request merge with top_k = width.
+        Returns: (product ids int64 [len(block_ids), width] padded with -1, scores float32 padded with 0)
+        """
+        candidates = 2 * self.width
+        rows, columns, scores = [], [], []
+        
+        if cf.neighbour_ids is not None:
+            cf_rows = cf.product_index.lookup(block_ids)
+            known = np.nonzero(cf_rows >= 0)[0]
+            ids = cf.neighbour_ids[cf_rows[known], :candidates]
+            valid = (ids >= 0) & (cf.neighbour_scores[cf_rows[known], :candidates] > 0)
+            rows.append(np.repeat(known, valid.sum(axis=1)))
+            columns.append(cf.product_ids[ids[valid]])
+            scores.append(self.cf_weight * cf.neighbour_scores[cf_rows[known], :candidates][valid])
+        
+        if cb.index is not None:
+            cb_rows = cb.product_index.lookup(block_ids)
+            known = np.nonzero(cb_rows >= 0)[0]
+            ids, similarities = cb.neighbour_arrays(cb_rows[known], candidates)
+            valid = ids >= 0
+            rows.append(np.repeat(known, valid.sum(axis=1)))
+            columns.append(ids[valid])
+            scores.append(self.cb_weight * similarities[valid])
+        
+        # Duplicate (product, candidate) pairs are summed by the sparse constructor
+        block = sp.csr_matrix(
+            (
+                np.concatenate(scores).astype(np.float32),
+                (np.concatenate(rows), np.searchsorted(product_ids, np.concatenate(columns)))
+            ),
+            shape=(len(block_ids), len(product_ids))
+        )
+        ids, block_scores = top_k_per_row(block, self.width)
+        return np.where(ids >= 0, product_ids[np.maximum(ids, 0)], -1), block_scores
+    
+    def fit(self, cf: CollaborativeFilteringModel, cb: ContentBasedModel):
+        """Merge the neighbours of both models for every product, block by block"""
+        self.update(cf, cb)
+    
+    def update(
+        self,
+        cf: CollaborativeFilteringModel,
+        cb: ContentBasedModel,
+        previous: Optional["HybridNeighbours"] = None,
+        changed_product_ids: Optional[np.ndarray] = None
+    ):
+        """
+        Build the table, rebuilding only the rows of changed_product_ids (and of products
+        new to the table) when given the previous table. Other rows are copied from it, which
+        is exact as long as their collaborative neighbour lists did not change (see
+        CollaborativeFilteringModel.partial_fit) and the content model gives the same
+        neighbours as when previous was built (ContentBasedModel.same_neighbours).
+        """
+        cf_trained = cf.neighbour_ids is not None
+        cb_trained = cb.index is not None
+        if self.width <= 0 or not (cf_trained or cb_trained):
+            logger.info("Hybrid neighbour table disabled or no trained models, skipping")
+            return
+        
+        product_ids = np.union1d(
+            cf.product_ids if cf_trained else np.empty(0, dtype=np.int64),
+            cb.product_ids if cb_trained else np.empty(0, dtype=np.int64)
+        ).astype(np.int64)
+        n_products = len(product_ids)
+        neighbour_ids = np.full((n_products, self.width), -1, dtype=np.int64)
+        neighbour_scores = np.zeros((n_products, self.width), dtype=np.float32)
+        
+        reusable = (
+            previous is not None
+            and previous.neighbour_ids is not None
+            and changed_product_ids is not None
+            and (previous.width, previous.cf_weight, previous.cb_weight) == (self.width, self.cf_weight, self.cb_weight)
+        )
+        if reusable:
+            previous_rows = previous.product_index.lookup(product_ids)
+            known = previous_rows >= 0
+            neighbour_ids[known] = previous.neighbour_ids[previous_rows[known]]
+            neighbour_scores[known] = previous.neighbour_scores[previous_rows[known]]
+            rebuild = np.nonzero(~known | np.isin(product_ids, changed_product_ids))[0]
+            logger.info(f"Updating hybrid neighbour table ({len(rebuild)} of {n_products} rows)...")
+        else:
+            rebuild = np.arange(n_products)
+            logger.info(f"Building hybrid neighbour table ({self.width} neighbours per product)...")
+        
+        for start in range(0, len(rebuild), BUILD_BLOCK_SIZE):
+            block = rebuild[start:start + BUILD_BLOCK_SIZE]
+            neighbour_ids[block], neighbour_scores[block] = self.build_rows(cf, cb, product_ids, product_ids[block])
+        
+        self.product_ids = product_ids
+        self.product_index = IdIndex(product_ids)
+        self.neighbour_ids = neighbour_ids
+        self.neighbour_scores = neighbour_scores
+        self.last_trained = datetime.utcnow()
+        logger.info(f"Hybrid neighbour table built for {n_products} products")
+    
+    def get_similar_products(self, product_id: int, top_k: int = 5) -> Optional[List[Dict]]:
+        """
+        Hybrid neighbours of a product from the table
+        Returns: List of {product_id, score}, or None when the table cannot answer
+        (not built, product missing, or top_k wider than the table)
+        """
+        if self.neighbour_ids is None or top_k > self.width:
+            return None
+        row = self.product_index.get(product_id)
+        if row is None:
+            return None
+        return [
+            {"product_id": int(neighbour), "score": float(score)}
+            for neighbour, score in zip(self.neighbour_ids[row, :top_k], self.neighbour_scores[row, :top_k])
+            if neighbour >= 0
+        ]
+    
+    def save(self, path: str) -> Optional[str]:
+        """Save the table as a new artifact generation under path"""
+        if self.neighbour_ids is None:
+            logger.warning("Hybrid neighbour table not built, nothing to save")
+            return None
+        
+        arrays = {
+            "product_ids": self.product_ids,
+            "neighbour_ids": self.neighbour_ids,
+            "neighbour_scores": self.neighbour_scores,
+        }
+        metadata = {
+            "width": self.width,
+            "cf_weight": self.cf_weight,
+            "cb_weight": self.cb_weight,
+            "last_trained": self.last_trained.isoformat() if self.last_trained else None,
+        }
+        
+        generation = write_generation(path, arrays, metadata)
+        self.artifact_version = os.path.basename(generation)
+        logger.info(f"Hybrid neighbour table saved to {generation}")
+        return generation
+    
+    def load(self, path: str, mmap_mode: Optional[str] = "r", version: Optional[str] = None) -> bool:
+        """
+        Load the latest (or the given version's) artifact generation from path, memory-mapped by default.
+        A table built with other weights than configured is ignored until the next training run.
+        """
+        generation = find_generation(path, version)
+        manifest = read_manifest(generation) if generation else None
+        if manifest is None:
+            logger.info(f"No hybrid neighbour artifacts found in {path}")
+            return False
+        
+        metadata = manifest["metadata"]
+        if (metadata["cf_weight"], metadata["cb_weight"]) != (self.cf_weight, self.cb_weight):
+            logger.info(f"Hybrid neighbour table in {generation} uses other weights, ignoring it")
+            return False
+        
+        arrays = load_arrays(generation, manifest, mmap_mode=mmap_mode)
+        self.product_ids = arrays["product_ids"]
+        self.product_index = IdIndex(self.product_ids)
+        self.neighbour_ids = arrays["neighbour_ids"]
+        self.neighbour_scores = arrays["neighbour_scores"]
+        self.width = metadata["width"]
+        self.last_trained = datetime.fromisoformat(metadata["last_trained"]) if metadata["last_trained"] else None
+        self.artifact_version = manifest["version"]
+        
+        logger.info(f"Hybrid neighbour table loaded from {generation}")
+        return True
@@ -0,0 +1,386 @@
+import numpy as np
+import scipy.sparse as sp
+from threadpoolctl import threadpool_limits
+from typing import List, Dict, Optional
+import logging
+import os
+from datetime import datetime, timedelta
+
+from app.config import ALS_FACTORS, ALS_ITERATIONS, ALS_REGULARIZATION, ALS_ALPHA, ALS_NUM_THREADS
+from app.utils.artifacts import write_generation, find_generation, read_manifest, load_arrays
+from app.utils.id_index import IdIndex
+from app.utils.topk import top_k_indices, top_k_indices_rows
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on float32 elements of the per-interaction outer products built in one solve chunk
+SOLVE_CHUNK_ELEMENTS = 1 << 24
+
+# Upper bound on float32 elements of one [queries, products] score block in batch lookups
+SCORE_BLOCK_ELEMENTS = 1 << 24
+
+class ImplicitALSModel:
+    """
+    Implicit-feedback matrix factorization (weighted ALS, Hu/Koren/Volinsky).
+    Purchases become confidences 1 + alpha * quantity; users and products are
+    embedded as float32 factor vectors, so memory is O((users + products) * factors).
+    """
+    
+    def __init__(
+        self,
+        factors: int = ALS_FACTORS,
+        iterations: int = ALS_ITERATIONS,
+        regularization: float = ALS_REGULARIZATION,
+        alpha: float = ALS_ALPHA,
+        num_threads: int = ALS_NUM_THREADS,
+        random_state: Optional[int] = 42
+    ):
+        self.factors = factors
+        self.iterations = iterations
+        self.regularization = regularization
+        self.alpha = alpha
+        self.num_threads = num_threads  # 0 keeps the BLAS default
+        self.random_state = random_state
+        self.user_item_matrix = None  # CSR, used to exclude purchased products
+        self.user_factors = None  # float32 [n_users, factors]
+        self.item_factors = None  # float32 [n_products, factors]
+        self.normalized_item_factors = None  # unit-length item factors for similarity
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.last_trained = None
+        self.artifact_version = None
+    
+    def solve(self, confidence: sp.csr_matrix, fixed: np.ndarray) -> np.ndarray:
+        """
+        One ALS half-step: solve the factors of every row of `confidence`
+        (values are alpha * r) with the other side's factors held fixed.
+        Rows are processed in chunks as batched linear systems.
+        """
+        n_rows = confidence.shape[0]
+        n_factors = fixed.shape[1]
+        
+        gram = fixed.T @ fixed + self.regularization * np.eye(n_factors, dtype=np.float32)
+        solved = np.zeros((n_rows, n_factors), dtype=np.float32)
+        
+        # Right-hand side: sum over observed items of (1 + alpha * r) * y
+        preference = confidence.copy()
+        preference.data = preference.data + 1.0
+        rhs = np.asarray(preference @ fixed, dtype=np.float32)
+        
+        indptr = confidence.indptr
+        chunk_nnz = max(1, SOLVE_CHUNK_ELEMENTS // (n_factors * n_factors))
+        start = 0
+        while start < n_rows:
+            # Grow the chunk until its interactions hit the memory budget (at least one row)
+            end = int(np.searchsorted(indptr, indptr[start] + chunk_nnz, side="right")) - 1
+            end = min(max(end, start + 1), n_rows)
+            
+            lo, hi = indptr[start], indptr[end]
+            active = np.nonzero(np.diff(indptr[start:end + 1]))[0]
+            if len(active) > 0:
+                vectors = fixed[confidence.indices[lo:hi]]
+                outer = np.einsum("nf,ng->nfg", vectors, vectors).reshape(hi - lo, n_factors * n_factors)
+                # Per-row sum of alpha * r * y y^T as one sparse × dense product
+                segments = sp.csr_matrix(
+                    (confidence.data[lo:hi], np.arange(hi - lo), indptr[start:end + 1] - lo),
+                    shape=(end - start, hi - lo)
+                )
+                systems = (segments[active] @ outer).reshape(len(active), n_factors, n_factors) + gram
+                solved[start + active] = np.linalg.solve(systems, rhs[start + active][..., None])[..., 0]
+            
+            start = end
+        
+        return solved
+    
+    def fit_matrix(self, user_item_matrix: sp.csr_matrix, product_ids: np.ndarray, user_ids: np.ndarray):
+        """Train on an existing users × products interaction matrix"""
+        logger.info("Training matrix factorization model...")
+        
+        if user_item_matrix.shape[1] == 0:
+            logger.warning("No products to train on")
+            return
+        
+        user_items = user_item_matrix.tocsr().astype(np.float32)
+        confidence = user_items.copy()
+        confidence.data *= self.alpha
+        confidence_t = confidence.T.tocsr()
+        
+        rng = np.random.default_rng(self.random_state)
+        item_factors = (rng.standard_normal((user_items.shape[1], self.factors)) * 0.01).astype(np.float32)
+        user_factors = np.zeros((user_items.shape[0], self.factors), dtype=np.float32)
+        
+        with threadpool_limits(limits=self.num_threads or None, user_api="blas"):
+            for iteration in range(self.iterations):
+                user_factors = self.solve(confidence, item_factors)
+                item_factors = self.solve(confidence_t, user_factors)
+                logger.debug(f"ALS iteration {iteration + 1}/{self.iterations} done")
+        
+        norms = np.linalg.norm(item_factors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        
+        self.user_item_matrix = user_items
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.normalized_item_factors = item_factors / norms
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.last_trained = datetime.utcnow()
+        logger.info(
+            f"Matrix factorization trained at {self.last_trained}: "
+            f"{len(self.user_ids)} users, {len(self.product_ids)} products, {self.factors} factors"
+        )
+    
+    def partial_fit_matrix(
+        self,
+        user_item_matrix: sp.csr_matrix,
+        product_ids: np.ndarray,
+        user_ids: np.ndarray,
+        changed_users: np.ndarray,
+        changed_products: np.ndarray
+    ):
+        """
+        Fold new interactions into a trained model: the factors of changed users, then of
+        changed products, then of those users again are re-solved against the other side's
+        current factors (new ids start from zero). Cost follows the interactions of the
+        changed rows; other factors stay as they are until the next full fit_matrix.
+        """
+        if self.item_factors is None:
+            self.fit_matrix(user_item_matrix, product_ids, user_ids)
+            return
+        
+        logger.info(
+            f"Updating matrix factorization model for {len(changed_users)} users, {len(changed_products)} products..."
+        )
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        user_items = user_item_matrix.tocsr().astype(np.float32)
+        confidence = user_items.copy()
+        confidence.data *= self.alpha
+        
+        # Carry the current factors over to the (grown, possibly reordered) id spaces
+        user_factors = np.zeros((len(user_ids), self.factors), dtype=np.float32)
+        old_rows = self.user_index.lookup(user_ids)
+        user_factors[old_rows >= 0] = self.user_factors[old_rows[old_rows >= 0]]
+        item_factors = np.zeros((len(product_ids), self.factors), dtype=np.float32)
+        old_rows = self.product_index.lookup(product_ids)
+        item_factors[old_rows >= 0] = self.item_factors[old_rows[old_rows >= 0]]
+        
+        user_rows = np.searchsorted(user_ids, changed_users)
+        item_rows = np.searchsorted(product_ids, changed_products)
+        confidence_t = confidence[:, item_rows].T.tocsr()
+        with threadpool_limits(limits=self.num_threads or None, user_api="blas"):
+            user_factors[user_rows] = self.solve(confidence[user_rows], item_factors)
+            item_factors[item_rows] = self.solve(confidence_t, user_factors)
+            user_factors[user_rows] = self.solve(confidence[user_rows], item_factors)
+        
+        norms = np.linalg.norm(item_factors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        
+        self.user_item_matrix = user_items
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.normalized_item_factors = item_factors / norms
+        self.product_ids = product_ids
+        self.user_ids = user_ids
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.last_trained = datetime.utcnow()
+        logger.info(f"Matrix factorization updated at {self.last_trained}")
+    
+    def fit(self, db_session):
+        """Train the matrix factorization model from completed orders (database session or Snapshot)"""
+        from app.models.collaborative_filtering import CollaborativeFilteringModel
+        
+        user_item_matrix, product_ids, user_ids = CollaborativeFilteringModel().prepare_data(db_session)
+        self.fit_matrix(user_item_matrix, product_ids, user_ids)
+    
+    def get_similar_products(self, product_id: int, top_k: int = 5) -> List[Dict]:
+        """
+        Get K most similar products by cosine similarity of item factors
+        Returns: List of {product_id, similarity_score}
+        """
+        if self.item_factors is None:
+            logger.warning("Model not trained yet")
+            return []
+        
+        product_idx = self.product_index.get(product_id)
+        if product_idx is None:
+            logger.warning(f"Product {product_id} not found in training data")
+            return []
+        
+        similarities = self.normalized_item_factors @ self.normalized_item_factors[product_idx]
+        similarities[product_idx] = -np.inf
+        top_indices = top_k_indices(similarities, top_k)
+        
+        return [
+            {
+                "product_id": int(self.product_ids[idx]),
+                "similarity_score": float(similarities[idx])
+            }
+            for idx in top_indices
+            if similarities[idx] > 0
+        ]
+    
+    def get_user_recommendations(self, user_id: int, top_k: int = 10, exclude_purchased: bool = True) -> List[Dict]:
+        """
+        Get personalized recommendations for a user
+        Score = dot product of user and product factors
+        """
+        if self.user_factors is None:
+            logger.warning("Model not trained yet")
+            return []
+        
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None:
+            logger.warning(f"User {user_id} not found in training data")
+            return []
+        
+        scores = self.item_factors @ self.user_factors[user_idx]
+        
+        if exclude_purchased:
+            start, end = self.user_item_matrix.indptr[user_idx], self.user_item_matrix.indptr[user_idx + 1]
+            scores[self.user_item_matrix.indices[start:end]] = -np.inf
+        
+        top_indices = top_k_indices(scores, top_k)
+        
+        return [
+            {
+                "product_id": int(self.product_ids[idx]),
+                "recommendation_score": float(scores[idx])
+            }
+            for idx in top_indices
+            if scores[idx] > 0
+        ]
+    
+    def _score_batch(self, ids: List[int], id_index: IdIndex, kind: str, score_block, top_k: int, key: str) -> List[List[Dict]]:
+        """
+        Shared driver of the batch lookups: score_block(rows) returns the [len(rows), products]
+        scores of known ids, computed one bounded block of rows (one matrix multiply) at a time
+        """
+        rows = id_index.lookup(ids)
+        known = np.nonzero(rows >= 0)[0]
+        if len(known) < len(rows):
+            logger.warning(f"{len(rows) - len(known)} of {len(rows)} {kind} not found in training data")
+        
+        results = [[] for _ in ids]
+        block_rows = max(1, SCORE_BLOCK_ELEMENTS // max(len(self.product_ids), 1))
+        for start in range(0, len(known), block_rows):
+            positions = known[start:start + block_rows]
+            scores = score_block(rows[positions])
+            top = top_k_indices_rows(scores, top_k)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            for position, indices, row_scores in zip(positions, top, top_scores):
+                results[position] = [
+                    {"product_id": int(self.product_ids[idx]), key: float(score)}
+                    for idx, score in zip(indices, row_scores)
+                    if score > 0
+                ]
+        return results
+    
+    def get_similar_products_batch(self, product_ids: List[int], top_k: int = 5) -> List[List[Dict]]:
+        """
+        get_similar_products for many products, scored by blocked matrix multiplies
+        Returns: one list of {product_id, similarity_score} per product, in input order
+        """
+        if self.item_factors is None:
+            logger.warning("Model not trained yet")
+            return [[] for _ in product_ids]
+        
+        def score_block(rows):
+            similarities = self.normalized_item_factors[rows] @ self.normalized_item_factors.T
+            similarities[np.arange(len(rows)), rows] = -np.inf
+            return similarities
+        
+        return self._score_batch(product_ids, self.product_index, "products", score_block, top_k, "similarity_score")
+    
+    def get_user_recommendations_batch(
+        self,
+        user_ids: List[int],
+        top_k: int = 10,
+        exclude_purchased: bool = True
+    ) -> List[List[Dict]]:
+        """
+        get_user_recommendations for many users, scored by blocked matrix multiplies
+        Returns: one list of {product_id, recommendation_score} per user, in input order
+        """
+        if self.user_factors is None:
+            logger.warning("Model not trained yet")
+            return [[] for _ in user_ids]
+        
+        def score_block(rows):
+            scores = self.user_factors[rows] @ self.item_factors.T
+            if exclude_purchased:
+                purchases = self.user_item_matrix[rows]
+                scores[np.repeat(np.arange(len(rows)), np.diff(purchases.indptr)), purchases.indices] = -np.inf
+            return scores
+        
+        return self._score_batch(user_ids, self.user_index, "users", score_block, top_k, "recommendation_score")
+    
+    def save(self, path: str) -> Optional[str]:
+        """Save factors and interactions as a new artifact generation under path"""
+        if self.item_factors is None:
+            logger.warning("Model not trained yet, nothing to save")
+            return None
+        
+        matrix = self.user_item_matrix
+        arrays = {
+            "product_ids": self.product_ids,
+            "user_ids": self.user_ids,
+            "user_factors": self.user_factors,
+            "item_factors": self.item_factors,
+            "normalized_item_factors": self.normalized_item_factors,
+            "interactions_data": matrix.data,
+            "interactions_indices": matrix.indices,
+            "interactions_indptr": matrix.indptr,
+        }
+        metadata = {
+            "shape": list(matrix.shape),
+            "factors": self.factors,
+            "last_trained": self.last_trained.isoformat() if self.last_trained else None,
+        }
+        
+        generation = write_generation(path, arrays, metadata)
+        self.artifact_version = os.path.basename(generation)
+        logger.info(f"Model saved to {generation}")
+        return generation
+    
+    def load(self, path: str, mmap_mode: Optional[str] = "r", version: Optional[str] = None) -> bool:
+        """Load the latest (or the given version's) artifact generation from path, memory-mapped by default"""
+        generation = find_generation(path, version)
+        manifest = read_manifest(generation) if generation else None
+        if manifest is None:
+            logger.info(f"No matrix factorization artifacts found in {path}")
+            return False
+        
+        arrays = load_arrays(generation, manifest, mmap_mode=mmap_mode)
+        metadata = manifest["metadata"]
+        
+        self.user_item_matrix = sp.csr_matrix(
+            (arrays["interactions_data"], arrays["interactions_indices"], arrays["interactions_indptr"]),
+            shape=tuple(metadata["shape"]),
+            copy=False
+        )
+        self.user_factors = arrays["user_factors"]
+        self.item_factors = arrays["item_factors"]
+        self.normalized_item_factors = arrays["normalized_item_factors"]
+        self.product_ids = arrays["product_ids"]
+        self.user_ids = arrays["user_ids"]
+        self.product_index = IdIndex(self.product_ids)
+        self.user_index = IdIndex(self.user_ids)
+        self.factors = metadata["factors"]
+        self.last_trained = datetime.fromisoformat(metadata["last_trained"]) if metadata["last_trained"] else None
+        self.artifact_version = manifest["version"]
+        
+        logger.info(f"Model loaded from {generation}")
+        return True
+    
+    def needs_retraining(self, max_age_hours: int = 24) -> bool:
+        """Check if model needs retraining"""
+        if self.last_trained is None:
+            return True
+        age = datetime.utcnow() - self.last_trained
+        return age > timedelta(hours=max_age_hours)
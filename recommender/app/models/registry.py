@@ -0,0 +1,74 @@
+import threading
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+import logging
+
+from app.models.collaborative_filtering import CollaborativeFilteringModel
+from app.models.content_based import ContentBasedModel
+from app.models.hybrid import HybridNeighbours
+from app.models.matrix_factorization import ImplicitALSModel
+
+logger = logging.getLogger(__name__)
+
+class ModelSet(NamedTuple):
+    """Immutable snapshot of the models served together"""
+    cf: CollaborativeFilteringModel
+    als: ImplicitALSModel
+    cb: ContentBasedModel
+    hybrid: HybridNeighbours
+    version: int
+    published_at: Optional[datetime]
+
+class ModelRegistry:
+    """
+    Holds the live model set. Training builds new model instances off to the side
+    and publishes them with a single reference swap; request handlers read
+    `registry.current` once and use that snapshot for the whole request,
+    so they never observe a half-updated model.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = ModelSet(
+            cf=CollaborativeFilteringModel(),
+            als=ImplicitALSModel(),
+            cb=ContentBasedModel(),
+            hybrid=HybridNeighbours(),
+            version=0,
+            published_at=None
+        )
+        self._listeners: List[Callable[[ModelSet], None]] = []
+    
+    @property
+    def current(self) -> ModelSet:
+        return self._current
+    
+    def subscribe(self, listener: Callable[[ModelSet], None]):
+        """Call listener with every newly published model set (e.g. to drop cached responses)"""
+        self._listeners.append(listener)
+    
+    def publish(
+        self,
+        cf: Optional[CollaborativeFilteringModel] = None,
+        als: Optional[ImplicitALSModel] = None,
+        cb: Optional[ContentBasedModel] = None,
+        hybrid: Optional[HybridNeighbours] = None
+    ) -> ModelSet:
+        """Swap in new models; models not given are carried over from the current set"""
+        with self._lock:
+            previous = self._current
+            self._current = ModelSet(
+                cf=cf if cf is not None else previous.cf,
+                als=als if als is not None else previous.als,
+                cb=cb if cb is not None else previous.cb,
+                hybrid=hybrid if hybrid is not None else previous.hybrid,
+                version=previous.version + 1,
+                published_at=datetime.utcnow()
+            )
+        logger.info(f"Published model set version {self._current.version}")
+        for listener in self._listeners:
+            listener(self._current)
+        return self._current
+
+# Global registry
+registry = ModelRegistry()
@@ -0,0 +1,120 @@
+"""
+Start-up readiness gate. A new instance loads its saved models, runs synthetic
+queries through them (touching FAISS, BLAS, the memory-mapped arrays, the
+request worker threads and the encoder) and only then reports ready on /ready,
+so it takes no traffic while cold. /health stays a plain liveness check.
+"""
+import functools
+import threading
+import time
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from app.config import WARM_UP_QUERIES
+from app.models.registry import ModelSet
+from app.utils.executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_SEARCH_QUERY = "warm up"
+
+def sample_ids(ids: np.ndarray, n: int) -> List[int]:
+    """Up to n ids spread evenly over an id array"""
+    if n <= 0 or len(ids) == 0:
+        return []
+    rows = np.unique(np.linspace(0, len(ids) - 1, num=min(n, len(ids))).astype(np.int64))
+    return [int(i) for i in ids[rows]]
+
+def warm_up_models(models: ModelSet, n_queries: int = WARM_UP_QUERIES) -> int:
+    """
+    Run synthetic single and batch queries through every trained model of a model set
+    on the request worker pool. Results are discarded and the response cache is not touched.
+    Returns: number of queries run
+    """
+    if n_queries <= 0:
+        return 0
+    cf, als, cb, hybrid = models.cf, models.als, models.cb, models.hybrid
+    queries = []
+    if cf.neighbour_ids is not None:
+        products, users = sample_ids(cf.product_ids, n_queries), sample_ids(cf.user_ids, n_queries)
+        queries += [functools.partial(cf.get_similar_products, pid) for pid in products]
+        queries += [functools.partial(cf.get_user_recommendations, uid) for uid in users]
+        queries += [
+            functools.partial(cf.get_similar_products_batch, products),
+            functools.partial(cf.get_user_recommendations_batch, users)
+        ]
+    if als.item_factors is not None:
+        products, users = sample_ids(als.product_ids, n_queries), sample_ids(als.user_ids, n_queries)
+        queries += [functools.partial(als.get_similar_products, pid) for pid in products]
+        queries += [functools.partial(als.get_user_recommendations, uid) for uid in users]
+        queries += [
+            functools.partial(als.get_similar_products_batch, products),
+            functools.partial(als.get_user_recommendations_batch, users)
+        ]
+    if cb.index is not None:
+        products = sample_ids(cb.product_ids, n_queries)
+        queries += [functools.partial(cb.get_similar_products, pid) for pid in products]
+        queries.append(functools.partial(cb.get_similar_products_batch, products))
+        if cb.lexical is not None:
+            queries.append(functools.partial(cb.search_products, WARM_UP_SEARCH_QUERY, mode="lexical"))
+        # Vector search only once the encoder is loaded, so warm-up never loads it on its own
+        if cb.encoder.is_loaded:
+            queries.append(functools.partial(cb.search_products, WARM_UP_SEARCH_QUERY, mode="vector"))
+    if hybrid.neighbour_ids is not None:
+        queries += [functools.partial(hybrid.get_similar_products, pid) for pid in sample_ids(hybrid.product_ids, n_queries)]
+    
+    # list() waits for every query and re-raises the first error
+    list(get_executor().map(lambda query: query(), queries))
+    return len(queries)
+
+class Readiness:
+    """Start-up state of this instance: starting, loading, warming_up, ready or failed"""
+    
+    def __init__(self):
+        self.state = "starting"
+        self.error = None
+        self.load_seconds = None  # loading saved models, or the first training run when there are none
+        self.encoder_seconds = None
+        self.warm_up_seconds = None
+        self.warm_up_queries = 0
+        self.cold_start_seconds = None  # from process start-up to ready
+        self._started = time.perf_counter()
+        self._ready = threading.Event()
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until ready; returns False on timeout"""
+        return self._ready.wait(timeout)
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+    
+    def mark_ready(self):
+        self.cold_start_seconds = self.elapsed()
+        self.state = "ready"
+        self._ready.set()
+        logger.info(
+            f"Ready after {self.cold_start_seconds:.2f}s "
+            f"(models {self.load_seconds or 0:.2f}s, encoder {self.encoder_seconds or 0:.2f}s, "
+            f"warm-up {self.warm_up_seconds or 0:.2f}s with {self.warm_up_queries} queries)"
+        )
+    
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "ready": self.is_ready,
+            "cold_start_seconds": self.cold_start_seconds,
+            "load_seconds": self.load_seconds,
+            "encoder_seconds": self.encoder_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "warm_up_queries": self.warm_up_queries,
+            "error": self.error,
+        }
+
+# Global readiness of this process (created on import, i.e. at process start-up)
+readiness = Readiness()
@@ -1,103 +1,297 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
 import logging
 
-from app.database import get_db
-from app.models.collaborative_filtering import cf_model
-from app.models.content_based import cb_model
+from app.config import (
+    CB_SEARCH_BATCH_SIZE, CB_SEARCH_BATCH_WAIT_MS, CB_SEARCH_MODE,
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_MB, BATCH_MAX_ITEMS,
+    HYBRID_CF_WEIGHT, HYBRID_CB_WEIGHT, SERVING_ROLE
+)
+from app.models.content_based import SEARCH_MODES, SearchFilter
+from app.models.encoder import EncoderDisabledError
+from app.models.registry import ModelSet, registry
+from app.readiness import readiness
+from app.training import scheduler, watcher
+from app.utils import ann_index
+from app.utils.batching import MicroBatcher
+from app.utils.cache import VersionedCache
+from app.utils.executor import run_in_executor
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
-# Model training lock
-is_training = False
-
-async def train_models_background(db: Session):
-    """Background task to train models"""
-    global is_training
-    
-    if is_training:
-        logger.info("Training already in progress")
-        return
-    
-    try:
-        is_training = True
-        logger.info("Starting background model training...")
-        
-        # Train collaborative filtering
-        cf_model.fit(db)
-        
-        # Train content-based
-        cb_model.fit(db)
-        
-        # Save content-based model
-        cb_model.save("/app/models/artifacts")
-        
-        logger.info("Background training completed")
-    except Exception as e:
-        logger.error(f"Error training models: {e}")
-    finally:
-        is_training = False
+SIMILAR_METHODS = ("collaborative", "als", "content", "hybrid")
+USER_METHODS = ("collaborative", "als")
 
 @router.post("/train")
-async def trigger_training(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+async def trigger_training(incremental: bool = False):
     """
-    Manually trigger model training
-    (In production, this would be a scheduled job)
+    Manually trigger model training on the background scheduler
+    (models are also retrained periodically)
+    With incremental=true only orders completed since the last run are folded in
     """
-    if is_training:
+    if SERVING_ROLE == "worker":
+        raise HTTPException(status_code=409, detail="Training runs in the trainer process, not on serving workers")
+    if not scheduler.trigger(incremental):
         return {"status": "training_in_progress"}
     
-    background_tasks.add_task(train_models_background, db)
     return {"status": "training_started"}
 
+def merge_hybrid(cf_recs: List[dict], cb_recs: List[dict], top_k: int) -> List[dict]:
+    """
+    Weighted merge of collaborative and content-based neighbours, for products
+    missing from the precomputed hybrid table (or a top_k wider than it)
+    """
+    combined = {}
+    for rec in cf_recs:
+        pid = rec["product_id"]
+        combined[pid] = combined.get(pid, 0) + rec.get("similarity_score", 0) * HYBRID_CF_WEIGHT
+    
+    for rec in cb_recs:
+        pid = rec["product_id"]
+        combined[pid] = combined.get(pid, 0) + rec.get("similarity_score", 0) * HYBRID_CB_WEIGHT
+    
+    # Sort by combined score
+    return [
+        {"product_id": pid, "score": score}
+        for pid, score in sorted(combined.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    ]
+
+def compute_similar_products(
+    models: ModelSet,
+    product_id: int,
+    top_k: int,
+    method: str,
+    search_filter: SearchFilter = SearchFilter()
+) -> List[dict]:
+    """Blocking part of /similar, run on the worker pool"""
+    if method == "collaborative":
+        return models.cf.get_similar_products(product_id, top_k)
+    if method == "als":
+        return models.als.get_similar_products(product_id, top_k)
+    if method == "content":
+        return models.cb.get_similar_products(product_id, top_k, search_filter)
+    
+    # Hybrid: one row of the precomputed table, or combine both methods
+    recommendations = models.hybrid.get_similar_products(product_id, top_k)
+    if recommendations is not None:
+        return recommendations
+    cf_recs = models.cf.get_similar_products(product_id, top_k * 2)
+    cb_recs = models.cb.get_similar_products(product_id, top_k * 2)
+    return merge_hybrid(cf_recs, cb_recs, top_k)
+
+def compute_user_recommendations(models: ModelSet, user_id: int, top_k: int, method: str) -> List[dict]:
+    """Blocking part of /user, run on the worker pool"""
+    if method == "als":
+        return models.als.get_user_recommendations(user_id, top_k)
+    return models.cf.get_user_recommendations(user_id, top_k)
+
+def compute_similar_products_batch(
+    models: ModelSet,
+    product_ids: List[int],
+    top_k: int,
+    method: str,
+    search_filter: SearchFilter = SearchFilter()
+) -> List[List[dict]]:
+    """Blocking part of /similar/batch: one vectorised lookup or search per model"""
+    if method == "collaborative":
+        return models.cf.get_similar_products_batch(product_ids, top_k)
+    if method == "als":
+        return models.als.get_similar_products_batch(product_ids, top_k)
+    if method == "content":
+        return models.cb.get_similar_products_batch(product_ids, top_k, search_filter)
+    
+    results = [models.hybrid.get_similar_products(product_id, top_k) for product_id in product_ids]
+    missing = [position for position, recommendations in enumerate(results) if recommendations is None]
+    if missing:
+        missing_ids = [product_ids[position] for position in missing]
+        cf_recs = models.cf.get_similar_products_batch(missing_ids, top_k * 2)
+        cb_recs = models.cb.get_similar_products_batch(missing_ids, top_k * 2)
+        for position, cf, cb in zip(missing, cf_recs, cb_recs):
+            results[position] = merge_hybrid(cf, cb, top_k)
+    return results
+
+def compute_user_recommendations_batch(
+    models: ModelSet,
+    user_ids: List[int],
+    top_k: int,
+    method: str
+) -> List[List[dict]]:
+    """Blocking part of /user/batch: one matrix product for all users"""
+    if method == "als":
+        return models.als.get_user_recommendations_batch(user_ids, top_k)
+    return models.cf.get_user_recommendations_batch(user_ids, top_k)
+
+def search_batch(items: List[tuple]) -> List[Union[List[dict], Exception]]:
+    """
+    Blocking part of /search for a micro-batch of (content model, query, top_k, filter, mode):
+    one encode and one FAISS search per model snapshot, filter and mode in the batch.
+    A group that fails (e.g. vector search without an encoder) resolves its own
+    items with the exception; the other groups' requests still get their results.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for position, (cb_model, query, top_k, search_filter, mode) in enumerate(items):
+        key = (id(cb_model), search_filter, mode)
+        groups.setdefault(key, (cb_model, search_filter, mode, []))[3].append(position)
+    
+    for cb_model, search_filter, mode, positions in groups.values():
+        top_k = max(items[position][2] for position in positions)
+        try:
+            batch_results = cb_model.search_products_batch(
+                [items[position][1] for position in positions], top_k, search_filter, mode
+            )
+        except Exception as e:
+            if not isinstance(e, EncoderDisabledError):
+                logger.exception(f"Search failed for a batch of {len(positions)} {mode} queries: {e}")
+            for position in positions:
+                results[position] = e
+            continue
+        for position, query_results in zip(positions, batch_results):
+            results[position] = query_results[:items[position][2]]
+    
+    return results
+
+search_batcher = MicroBatcher(search_batch, max_batch_size=CB_SEARCH_BATCH_SIZE, max_wait_ms=CB_SEARCH_BATCH_WAIT_MS)
+
+# /similar and /user responses of the live model set, dropped when a new set is published
+response_cache = VersionedCache(RESPONSE_CACHE_SIZE, max_bytes=int(RESPONSE_CACHE_MAX_MB * 2**20))
+registry.subscribe(lambda models: response_cache.invalidate(models.version))
+
+class SimilarBatchRequest(BaseModel):
+    product_ids: List[int]
+    top_k: int = Field(5, ge=1)
+    method: str = "hybrid"
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = True
+
+class UserBatchRequest(BaseModel):
+    user_ids: List[int]
+    top_k: int = Field(10, ge=1)
+    method: str = "collaborative"
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = Field(10, ge=1)
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = True
+    mode: str = CB_SEARCH_MODE
+
+def check_batch_size(n_items: int):
+    if n_items > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+@router.post("/similar/batch")
+async def get_similar_products_batch(request: SimilarBatchRequest):
+    """
+    Similar products for many products in one call, computed with one vectorised
+    lookup or FAISS search per model; results are returned in input order
+    """
+    if request.method not in SIMILAR_METHODS:
+        raise HTTPException(status_code=400, detail="Invalid method")
+    check_batch_size(len(request.product_ids))
+    search_filter = SearchFilter(request.category, request.min_price, request.max_price, request.in_stock)
+    if search_filter != SearchFilter() and request.method != "content":
+        raise HTTPException(status_code=400, detail="Filters are only supported with method=content")
+    
+    models = registry.current
+    batch_results = await run_in_executor(
+        compute_similar_products_batch, models, request.product_ids, request.top_k, request.method, search_filter
+    )
+    
+    return {
+        "results": [
+            {"product_id": product_id, "recommendations": recommendations}
+            for product_id, recommendations in zip(request.product_ids, batch_results)
+        ],
+        "method": request.method
+    }
+
+@router.post("/user/batch")
+async def get_user_recommendations_batch(request: UserBatchRequest):
+    """
+    Personalized recommendations for many users in one call, scored with one
+    matrix product; results are returned in input order
+    """
+    if request.method not in USER_METHODS:
+        raise HTTPException(status_code=400, detail="Invalid method")
+    check_batch_size(len(request.user_ids))
+    
+    models = registry.current
+    batch_results = await run_in_executor(
+        compute_user_recommendations_batch, models, request.user_ids, request.top_k, request.method
+    )
+    
+    return {
+        "results": [
+            {"user_id": user_id, "recommendations": recommendations}
+            for user_id, recommendations in zip(request.user_ids, batch_results)
+        ],
+        "method": request.method
+    }
+
+@router.post("/search/batch")
+async def semantic_search_batch(request: SearchBatchRequest):
+    """
+    Search for many queries in one call: one encoder batch and one FAISS search
+    over the stacked query embeddings; results are returned in input order
+    """
+    if request.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail="Invalid mode")
+    check_batch_size(len(request.queries))
+    search_filter = SearchFilter(request.category, request.min_price, request.max_price, request.in_stock)
+    
+    cb_model = registry.current.cb
+    try:
+        batch_results = await run_in_executor(
+            cb_model.search_products_batch, request.queries, request.top_k, search_filter, request.mode
+        )
+    except EncoderDisabledError:
+        raise HTTPException(status_code=503, detail="Semantic search is not available on this instance")
+    
+    return {
+        "results": [
+            {"query": query, "results": results}
+            for query, results in zip(request.queries, batch_results)
+        ],
+        "mode": request.mode
+    }
+
 @router.get("/similar/{product_id}")
 async def get_similar_products(
     product_id: int,
-    top_k: int = 5,
-    method: str = "hybrid",  # "collaborative", "content", or "hybrid"
-    db: Session = Depends(get_db)
+    top_k: int = Query(5, ge=1),
+    method: str = "hybrid",  # "collaborative", "als", "content", or "hybrid"
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = True
 ):
     """
     Get products similar to the given product
+    Filters (category, price range, in_stock) are applied inside the content-based search
     """
-    # Check if models need training
-    if cf_model.needs_retraining():
-        logger.info("Models need retraining, training now...")
-        cf_model.fit(db)
-        cb_model.fit(db)
-    
-    if method == "collaborative":
-        recommendations = cf_model.get_similar_products(product_id, top_k)
-    elif method == "content":
-        recommendations = cb_model.get_similar_products(product_id, top_k)
-    elif method == "hybrid":
-        # Combine both methods
-        cf_recs = cf_model.get_similar_products(product_id, top_k * 2)
-        cb_recs = cb_model.get_similar_products(product_id, top_k * 2)
-        
-        # Merge and re-rank
-        combined = {}
-        for rec in cf_recs:
-            pid = rec["product_id"]
-            combined[pid] = combined.get(pid, 0) + rec.get("similarity_score", 0) * 0.6
-        
-        for rec in cb_recs:
-            pid = rec["product_id"]
-            combined[pid] = combined.get(pid, 0) + rec.get("similarity_score", 0) * 0.4
-        
-        # Sort by combined score
-        recommendations = [
-            {"product_id": pid, "score": score}
-            for pid, score in sorted(combined.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        ]
-    else:
+    if method not in SIMILAR_METHODS:
         raise HTTPException(status_code=400, detail="Invalid method")
+    search_filter = SearchFilter(category, min_price, max_price, in_stock)
+    if search_filter != SearchFilter() and method != "content":
+        raise HTTPException(status_code=400, detail="Filters are only supported with method=content")
+    
+    # One consistent snapshot of the models for the whole request
+    models = registry.current
+    key = ("similar", product_id, top_k, method, search_filter)
+    recommendations = response_cache.get(models.version, key)
+    if recommendations is None:
+        recommendations = await run_in_executor(
+            compute_similar_products, models, product_id, top_k, method, search_filter
+        )
+        response_cache.put(models.version, key, recommendations)
     
     return {
         "product_id": product_id,
@@ -108,59 +302,110 @@ async def get_similar_products(
 @router.get("/user/{user_id}")
 async def get_user_recommendations(
     user_id: int,
-    top_k: int = 10,
-    db: Session = Depends(get_db)
+    top_k: int = Query(10, ge=1),
+    method: str = "collaborative"  # "collaborative" or "als"
 ):
     """
     Get personalized recommendations for a user
     """
-    # Check if model needs training
-    if cf_model.needs_retraining():
-        logger.info("Model needs retraining, training now...")
-        cf_model.fit(db)
+    if method not in USER_METHODS:
+        raise HTTPException(status_code=400, detail="Invalid method")
     
-    recommendations = cf_model.get_user_recommendations(user_id, top_k)
+    models = registry.current
+    key = ("user", user_id, top_k, method)
+    recommendations = response_cache.get(models.version, key)
+    if recommendations is None:
+        recommendations = await run_in_executor(compute_user_recommendations, models, user_id, top_k, method)
+        response_cache.put(models.version, key, recommendations)
     
     return {
         "user_id": user_id,
-        "recommendations": recommendations
+        "recommendations": recommendations,
+        "method": method
     }
 
 @router.get("/search")
 async def semantic_search(
     query: str,
-    top_k: int = 10,
-    db: Session = Depends(get_db)
+    top_k: int = Query(10, ge=1),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = True,
+    mode: str = CB_SEARCH_MODE  # "vector", "lexical" or "hybrid"
 ):
     """
-    Semantic search for products
+    Search for products, optionally filtered by category, price range and stock
+    (filters are applied inside the FAISS search, so a full top_k comes back when enough products match)
+    mode=vector is semantic search, lexical is BM25 (SKUs, model numbers, brands),
+    hybrid fuses both by reciprocal rank
     Example: "affordable wireless headphones"
     """
-    # Ensure content-based model is trained
-    if cb_model.index is None:
-        cb_model.fit(db)
-    
-    results = cb_model.search_products(query, top_k)
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail="Invalid mode")
+    search_filter = SearchFilter(category, min_price, max_price, in_stock)
+    try:
+        results = await search_batcher.submit((registry.current.cb, query, top_k, search_filter, mode))
+    except EncoderDisabledError:
+        raise HTTPException(status_code=503, detail="Semantic search is not available on this instance")
     
     return {
         "query": query,
-        "results": results
+        "results": results,
+        "mode": mode
     }
 
 @router.get("/status")
 async def get_status():
     """Get model status"""
+    models = registry.current
+    cf_model, als_model, cb_model, hybrid_table = models.cf, models.als, models.cb, models.hybrid
+    
     return {
         "collaborative_filtering": {
-            "trained": cf_model.item_similarity_matrix is not None,
+            "trained": cf_model.neighbour_ids is not None,
+            "num_neighbours": cf_model.n_neighbours,
             "num_products": len(cf_model.product_ids),
             "num_users": len(cf_model.user_ids),
             "last_trained": cf_model.last_trained.isoformat() if cf_model.last_trained else None,
+            "watermark": cf_model.watermark.isoformat() if cf_model.watermark else None,
+            "artifact_version": cf_model.artifact_version,
             "needs_retraining": cf_model.needs_retraining()
         },
+        "matrix_factorization": {
+            "trained": als_model.item_factors is not None,
+            "num_products": len(als_model.product_ids),
+            "num_users": len(als_model.user_ids),
+            "factors": als_model.factors,
+            "artifact_version": als_model.artifact_version,
+            "last_trained": als_model.last_trained.isoformat() if als_model.last_trained else None
+        },
+        "hybrid": {
+            "trained": hybrid_table.neighbour_ids is not None,
+            "num_products": len(hybrid_table.product_ids),
+            "neighbours": hybrid_table.width,
+            "weights": {"collaborative": hybrid_table.cf_weight, "content": hybrid_table.cb_weight},
+            "artifact_version": hybrid_table.artifact_version,
+            "last_trained": hybrid_table.last_trained.isoformat() if hybrid_table.last_trained else None
+        },
         "content_based": {
             "trained": cb_model.index is not None,
-            "num_products": len(cb_model.product_ids)
+            "num_products": len(cb_model.product_ids),
+            "artifact_version": cb_model.artifact_version,
+            "embedding_dtype": cb_model.embedding_dtype,
+            "index": ann_index.search_params(cb_model.index) if cb_model.index is not None else None,
+            "lexical_index": cb_model.lexical.stats() if cb_model.lexical is not None else None,
+            "last_fit": cb_model.fit_stats,
+            "search_batching": search_batcher.stats(),
+            "encoder": cb_model.encoder.status()
         },
-        "is_training": is_training
+        "response_cache": response_cache.stats(),
+        "serving": {"role": SERVING_ROLE, **watcher.status()},
+        "startup": readiness.status(),
+        "model_version": models.version,
+        "published_at": models.published_at.isoformat() if models.published_at else None,
+        "is_training": scheduler.is_training,
+        "last_training_run": scheduler.last_run.isoformat() if scheduler.last_run else None,
+        "last_training_duration_seconds": scheduler.last_duration,
+        "last_training_error": scheduler.last_error
     }
\ No newline at end of file
@@ -0,0 +1,330 @@
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.config import (
+    MODEL_ARTIFACTS_DIR, CF_ARTIFACTS_DIR, ALS_ARTIFACTS_DIR, CB_ARTIFACTS_DIR, HYBRID_ARTIFACTS_DIR,
+    TRAINING_INTERVAL_HOURS, TRAINING_RETRY_SECONDS, TRAINING_SNAPSHOT_DIR, MODEL_SET_POLL_SECONDS
+)
+from app.database import SessionLocal
+from app.models.collaborative_filtering import CollaborativeFilteringModel
+from app.models.content_based import ContentBasedModel
+from app.models.hybrid import HybridNeighbours
+from app.models.matrix_factorization import ImplicitALSModel
+from app.models.registry import ModelRegistry, registry
+from app.utils.artifacts import read_model_set, write_model_set
+from app.utils.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+def load_saved_models(model_registry: ModelRegistry = registry, model_set: Optional[Dict] = None):
+    """
+    Load saved artifacts into new models and publish them: the generations of the
+    given model set, else of the last published one, else the latest of each model
+    """
+    if model_set is None:
+        model_set = read_model_set(MODEL_ARTIFACTS_DIR)
+    versions = model_set["generations"] if model_set else {}
+    cf = CollaborativeFilteringModel()
+    als = ImplicitALSModel()
+    cb = ContentBasedModel()
+    hybrid = HybridNeighbours()
+    
+    # Loads are I/O and FAISS deserialization, which release the GIL; run them side by side
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-load") as pool:
+        loads = [
+            pool.submit(cf.load, CF_ARTIFACTS_DIR, version=versions.get("collaborative")),
+            pool.submit(als.load, ALS_ARTIFACTS_DIR, version=versions.get("als")),
+            pool.submit(cb.load, CB_ARTIFACTS_DIR, version=versions.get("content")),
+            pool.submit(hybrid.load, HYBRID_ARTIFACTS_DIR, version=versions.get("hybrid")),
+        ]
+    cf_loaded, als_loaded, cb_loaded, hybrid_loaded = [load.result() for load in loads]
+    
+    model_registry.publish(
+        cf=cf if cf_loaded else None,
+        als=als if als_loaded else None,
+        cb=cb if cb_loaded else None,
+        hybrid=hybrid if hybrid_loaded else None
+    )
+
+class TrainingScheduler:
+    """
+    Trains models on a background thread, periodically and on demand.
+    Each run uses its own database session, builds new model instances
+    and publishes them to the registry in one swap, so serving never
+    blocks on training.
+    """
+    
+    def __init__(
+        self,
+        model_registry: ModelRegistry = registry,
+        interval_hours: float = TRAINING_INTERVAL_HOURS,
+        session_factory=SessionLocal,
+        snapshot_dir: str = TRAINING_SNAPSHOT_DIR,
+        retry_seconds: float = TRAINING_RETRY_SECONDS
+    ):
+        self.registry = model_registry
+        self.interval = timedelta(hours=interval_hours)
+        self.retry = timedelta(seconds=retry_seconds)
+        self.session_factory = session_factory
+        self.snapshot_dir = snapshot_dir  # train from the latest snapshot here instead of the database
+        self.is_training = False
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_success = None  # end of the last run that published (or found nothing to publish)
+        self.failures = 0  # consecutive failed runs
+        self._requested = None  # None, "full" or "incremental"
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+    
+    def start(self):
+        """
+        Start the scheduler thread; trains immediately if no CF model is loaded,
+        or no content model although this instance can encode
+        """
+        if self._thread is not None:
+            return
+        current = self.registry.current
+        if current.cf.last_trained is None or (current.cb.index is None and current.cb.encoder.enabled):
+            self._requested = "full"
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="model-training", daemon=True)
+        self._thread.start()
+        logger.info(f"Training scheduler started (interval {self.interval})")
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the scheduler thread after the current run finishes"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def trigger(self, incremental: bool = False) -> bool:
+        """
+        Request a training run. Returns False if a run is already
+        in progress or queued, in which case nothing new is scheduled.
+        """
+        with self._condition:
+            if self.is_training or self._requested is not None:
+                return False
+            self._requested = "incremental" if incremental else "full"
+            self._condition.notify()
+        return True
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no run is in progress or queued; returns False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self.is_training and self._requested is None, timeout)
+    
+    def wait_trained(self, timeout: Optional[float] = None) -> bool:
+        """Block until a run has succeeded (or the scheduler stopped); returns False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.last_success is not None or self._stopped, timeout)
+    
+    def _next_periodic_run(self) -> datetime:
+        if self.failures > 0:
+            # Retry a failed run with exponential backoff, bounded by the interval
+            backoff = min(self.retry * 2 ** (self.failures - 1), self.interval)
+            return self.last_run + backoff
+        reference = self.last_run or self.registry.current.cf.last_trained or datetime.utcnow()
+        return reference + self.interval
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and self._requested is None:
+                    wait_seconds = (self._next_periodic_run() - datetime.utcnow()).total_seconds()
+                    if wait_seconds <= 0:
+                        self._requested = "full"
+                        break
+                    self._condition.wait(timeout=wait_seconds)
+                if self._stopped:
+                    return
+                mode = self._requested
+                self._requested = None
+                self.is_training = True
+            
+            try:
+                self.run_once(incremental=mode == "incremental")
+            finally:
+                with self._condition:
+                    self.is_training = False
+                    self._condition.notify_all()
+    
+    def run_once(self, incremental: bool = False):
+        """Train a new model set off to the side and publish it"""
+        logger.info(f"Starting {'incremental' if incremental else 'full'} model training...")
+        started = time.perf_counter()
+        current = self.registry.current
+        db = None
+        
+        try:
+            # A snapshot is reopened every run so newer exports are picked up
+            db = Snapshot.open(self.snapshot_dir) if self.snapshot_dir else self.session_factory()
+            
+            # Collaborative filtering; incremental runs copy the live model and fold in new orders
+            delta = None
+            if incremental:
+                cf = copy.copy(current.cf)
+                delta = cf.partial_fit(db)
+                if delta is not None and len(delta.products) == 0:
+                    cf = current.cf
+            else:
+                cf = CollaborativeFilteringModel()
+                cf.fit(db)
+            
+            # Matrix factorization on the same interaction matrix; incremental runs fold
+            # the changed users and products into a copy of the live model
+            if cf is current.cf:
+                als = current.als
+            elif delta is not None and current.als.item_factors is not None:
+                als = copy.copy(current.als)
+                als.partial_fit_matrix(cf.user_item_matrix, cf.product_ids, cf.user_ids, delta.users, delta.products)
+            else:
+                als = ImplicitALSModel()
+                if cf.user_item_matrix is not None:
+                    als.fit_matrix(cf.user_item_matrix, cf.product_ids, cf.user_ids)
+            
+            # Content-based (shares the lazily loaded encoder), re-encoding only
+            # new or changed products; pods without an encoder keep serving
+            # the embeddings they loaded
+            cb = ContentBasedModel()
+            if cb.encoder.enabled:
+                cb.fit(db, previous=current.cb)
+            if cb.index is None or cb.same_content(current.cb):
+                cb = current.cb
+            
+            # Hybrid neighbour table over the models being published; with the same content
+            # neighbours only the rows of products whose CF neighbours changed are rebuilt
+            if cf is current.cf and cb is current.cb:
+                hybrid = current.hybrid
+            else:
+                hybrid = HybridNeighbours()
+                if delta is not None and (cb is current.cb or cb.same_neighbours(current.cb)):
+                    hybrid.update(cf, cb, previous=current.hybrid, changed_product_ids=delta.neighbour_products)
+                else:
+                    hybrid.fit(cf, cb)
+            
+            if cf is current.cf and cb is current.cb:
+                logger.info("No new orders or product changes, nothing to publish")
+            else:
+                # Only new models are saved; unchanged ones keep their generation
+                if cf is not current.cf:
+                    cf.save(CF_ARTIFACTS_DIR)
+                if als is not current.als:
+                    als.save(ALS_ARTIFACTS_DIR)
+                if cb is not current.cb:
+                    cb.save(CB_ARTIFACTS_DIR)
+                if hybrid is not current.hybrid and hybrid.neighbour_ids is not None:
+                    hybrid.save(HYBRID_ARTIFACTS_DIR)
+                
+                self.registry.publish(cf=cf, als=als, cb=cb, hybrid=hybrid)
+                # Serving workers in other processes follow this file
+                write_model_set(MODEL_ARTIFACTS_DIR, {
+                    "collaborative": cf.artifact_version,
+                    "als": als.artifact_version,
+                    "content": cb.artifact_version,
+                    "hybrid": hybrid.artifact_version,
+                })
+            self.last_error = None
+            self.failures = 0
+            self.last_success = datetime.utcnow()
+            logger.info(f"Model training completed in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            self.last_error = str(e)
+            self.failures += 1
+            logger.exception(f"Error training models ({self.failures} failed runs in a row): {e}")
+        finally:
+            if db is not None:
+                db.close()
+            self.last_run = datetime.utcnow()
+            self.last_duration = time.perf_counter() - started
+
+class ModelSetWatcher:
+    """
+    Keeps a serving-only worker process on the model set published by the trainer:
+    polls the MODEL_SET file and loads (memory-maps) the listed generations when it
+    changes. Every worker maps the same files, so model memory is shared through the
+    page cache instead of multiplied by the number of workers.
+    """
+    
+    def __init__(
+        self,
+        model_registry: ModelRegistry = registry,
+        artifacts_dir: str = MODEL_ARTIFACTS_DIR,
+        poll_seconds: float = MODEL_SET_POLL_SECONDS
+    ):
+        self.registry = model_registry
+        self.artifacts_dir = artifacts_dir
+        self.poll_seconds = poll_seconds
+        self.version = None  # model set version currently served
+        self.last_error = None
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def check(self) -> bool:
+        """Load the published model set if it changed; returns True if a new set was published"""
+        model_set = read_model_set(self.artifacts_dir)
+        if model_set is None or model_set["version"] == self.version:
+            return False
+        try:
+            load_saved_models(self.registry, model_set)
+        except Exception as e:
+            # A generation can be pruned between reading the file and loading it; retry on the next poll
+            self.last_error = str(e)
+            logger.exception(f"Error loading model set {model_set['version']}: {e}")
+            return False
+        self.version = model_set["version"]
+        self.last_error = None
+        logger.info(f"Serving model set {self.version}")
+        return True
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="model-set-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.artifacts_dir} for published model sets (every {self.poll_seconds}s)")
+    
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stopped.wait(self.poll_seconds):
+            self.check()
+    
+    def status(self) -> Dict:
+        return {"model_set_version": self.version, "last_error": self.last_error}
+
+# Global scheduler and watcher
+scheduler = TrainingScheduler()
+watcher = ModelSetWatcher()
+
+def main():
+    """
+    Headless trainer for multi-process serving: trains on schedule and publishes
+    model sets for uvicorn workers started with SERVING_ROLE=worker
+    """
+    logging.basicConfig(level=logging.INFO)
+    load_saved_models()
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop(timeout=5)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+FAISS index factory for the content-based model.
+
+Supported index types (all use L2 distance and are labelled with product ids):
+
+    flat      exact brute-force scan (IndexIDMap2 over IndexFlatL2)
+    ivf_flat  inverted lists over k-means cells, full vectors (IndexIVFFlat)
+    ivf_pq    inverted lists with product-quantized vectors (IndexIVFPQ)
+    hnsw      navigable small-world graph (IndexIDMap2 over IndexHNSWFlat)
+
+flat, ivf_flat and hnsw store full float32 vectors by default; with float16 or
+int8 storage they use the matching FAISS scalar quantizer (QT_fp16, or QT_8bit
+with per-dimension ranges). ivf_pq always stores PQ codes.
+
+Search-time parameters (nprobe, efSearch) are applied after build and after
+load, so they can be tuned without retraining.
+"""
+import logging
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Vector storage -> FAISS scalar quantizer type (float32 keeps the plain flat storage)
+SCALAR_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# k-means wants roughly this many training points per centroid; IVF quantizers
+# are trained on a sample of TRAINING_POINTS_PER_CENTROID per centroid (or code)
+MIN_POINTS_PER_CENTROID = 39
+TRAINING_POINTS_PER_CENTROID = 64
+
+# Training vectors for scalar quantizer ranges
+SQ_TRAINING_SAMPLE = 65536
+
+# Read flag that memory-maps flat vector storage (flat and scalar-quantizer codes, HNSW
+# vectors) as IO_FLAG_MMAP maps IVF inverted lists; 0 on FAISS releases without it
+IO_FLAG_MMAP_FLAT = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+# File header of every IVF index type (the other types are written wrapped in IndexIDMap2)
+IVF_FOURCC_PREFIX = b"Iw"
+
+def default_nlist(n_vectors: int) -> int:
+    """Number of IVF cells for n vectors: 4 * sqrt(n), capped by the training set size"""
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+def effective_index_type(index_type: str, n_vectors: int, pq_nbits: int = 8) -> str:
+    """
+    Index type build_index builds for n_vectors when asked for index_type: catalogs
+    too small to train the requested quantizer fall back to ivf_flat, then flat
+    """
+    if index_type == "ivf_pq" and n_vectors < MIN_POINTS_PER_CENTROID * (1 << pq_nbits):
+        index_type = "ivf_flat"
+    if index_type in ("ivf_flat", "ivf_pq") and n_vectors < MIN_POINTS_PER_CENTROID:
+        index_type = "flat"
+    return index_type
+
+def build_index(
+    embeddings: np.ndarray,
+    ids: np.ndarray,
+    index_type: str = "flat",
+    nlist: int = 0,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 80,
+    storage: str = "float32",
+    chunk_size: int = 0
+):
+    """
+    Build and fill an index of the given type over embeddings labelled with ids,
+    storing vectors as float32, float16 or int8 (not applicable to ivf_pq).
+    Quantizers are trained on a sample of the embeddings; catalogs too small to
+    train the requested quantizer fall back to a simpler type.
+    embeddings may be memory-mapped: with chunk_size > 0 vectors are read and
+    added chunk_size rows at a time, so only one chunk is copied to the heap.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    n_vectors, dimension = embeddings.shape
+    
+    built_type = effective_index_type(index_type, n_vectors, pq_nbits)
+    if built_type != index_type:
+        logger.warning(f"{n_vectors} vectors are too few to train {index_type}, using {built_type}")
+        index_type = built_type
+    
+    qtype = SCALAR_QUANTIZERS.get(storage)
+    if index_type == "flat":
+        if qtype is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        else:
+            sq = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+            sq.train(training_sample(embeddings, SQ_TRAINING_SAMPLE))
+            index = faiss.IndexIDMap2(sq)
+    elif index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, hnsw_m) if qtype is None else faiss.IndexHNSWSQ(dimension, qtype, hnsw_m)
+        hnsw.hnsw.efConstruction = ef_construction
+        if qtype is not None:
+            hnsw.train(training_sample(embeddings, SQ_TRAINING_SAMPLE))
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        nlist = min(nlist, n_vectors) if nlist > 0 else default_nlist(n_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat" and qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        elif index_type == "ivf_flat":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss.METRIC_L2)
+        else:
+            if dimension % pq_m != 0:
+                raise ValueError(f"PQ sub-quantizers ({pq_m}) must divide the embedding dimension ({dimension})")
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+        sample_size = TRAINING_POINTS_PER_CENTROID * max(nlist, 1 << pq_nbits if index_type == "ivf_pq" else 0)
+        index.train(training_sample(embeddings, max(sample_size, SQ_TRAINING_SAMPLE)))
+    
+    # IVF indexes store ids in their inverted lists, the others go through IndexIDMap2
+    step = chunk_size if chunk_size > 0 else max(n_vectors, 1)
+    for start in range(0, n_vectors, step):
+        chunk = np.ascontiguousarray(embeddings[start:start + step], dtype=np.float32)
+        index.add_with_ids(chunk, ids[start:start + step])
+    return index
+
+def training_sample(embeddings: np.ndarray, max_vectors: int, seed: int = 0) -> np.ndarray:
+    """float32 copy of at most max_vectors rows of embeddings, sampled without replacement in row order"""
+    if len(embeddings) <= max_vectors:
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(seed).choice(len(embeddings), size=max_vectors, replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+
+def index_type_of(index) -> str:
+    """Index type name of a built or loaded index"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def index_storage_of(index) -> str:
+    """Vector storage of a built or loaded index: float32, float16, int8 or pq"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = inner.sq.qtype
+        return next(storage for storage, value in SCALAR_QUANTIZERS.items() if value == qtype)
+    return "float32"
+
+def read_index(path: str, mmap: bool = True):
+    """
+    Read an index from path; with mmap, read-only and memory-mapped as far as FAISS
+    supports it: IVF inverted lists always, flat vector storage (flat, scalar quantizer
+    and HNSW vectors) when the installed release has IO_FLAG_MMAP_IFC. HNSW graph links
+    and id labels are always read onto the heap.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    # The two mapping flags cannot be combined: IVF lists need a file reader, flat storage a mapped one
+    with open(path, "rb") as f:
+        ivf = f.read(len(IVF_FOURCC_PREFIX)) == IVF_FOURCC_PREFIX
+    mmap_flag = faiss.IO_FLAG_MMAP if ivf or not IO_FLAG_MMAP_FLAT else IO_FLAG_MMAP_FLAT
+    return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+def flat_storage_mapped(index) -> bool:
+    """Whether the flat vector storage of a flat or HNSW index is memory-mapped from disk"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    # Mapped codes are a non-owning view (releases with IO_FLAG_MMAP_IFC); older ones always own them
+    codes = getattr(inner, "codes", None)
+    return codes is not None and hasattr(codes, "is_owned") and not codes.is_owned
+
+def supports_update(index) -> bool:
+    """
+    Whether a copy of the index can be updated in place by id: HNSW graphs cannot
+    drop nodes, and IVF inverted lists or flat storage memory-mapped from disk
+    cannot be cloned into an updatable copy
+    """
+    index_type = index_type_of(index)
+    if index_type == "hnsw":
+        return False
+    if index_type in ("ivf_flat", "ivf_pq"):
+        invlists = faiss.downcast_InvertedLists(faiss.extract_index_ivf(index).invlists)
+        return isinstance(invlists, faiss.ArrayInvertedLists)
+    return not flat_storage_mapped(index)
+
+def configure_search(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply search-time parameters to the index types they affect"""
+    index_type = index_type_of(index)
+    if index_type in ("ivf_flat", "ivf_pq") and nprobe:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    elif index_type == "hnsw" and ef_search:
+        faiss.downcast_index(index.index).hnsw.efSearch = ef_search
+    return index
+
+def search_params(index) -> dict:
+    """Type and tuning parameters of an index, for status reporting"""
+    index_type = index_type_of(index)
+    params = {"type": index_type, "storage": index_storage_of(index), "ntotal": int(index.ntotal)}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        params.update(nlist=int(ivf.nlist), nprobe=int(ivf.nprobe))
+    elif index_type == "hnsw":
+        params.update(ef_search=int(faiss.downcast_index(index.index).hnsw.efSearch))
+    return params
+
+def id_bitmap(ids: np.ndarray) -> np.ndarray:
+    """Bitmap over id values (bit i set for every id i) for IDSelectorBitmap"""
+    ids = np.asarray(ids, dtype=np.int64)
+    bits = np.zeros(int(ids.max()) + 1 if len(ids) else 0, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits, bitorder="little")
+
+def search(index, queries: np.ndarray, k: int, bitmap: Optional[np.ndarray] = None):
+    """
+    index.search restricted to the ids set in bitmap (None searches everything).
+    The restriction is applied inside FAISS, so k results come back whenever k ids qualify.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if bitmap is None:
+        return index.search(queries, k)
+    
+    # The selector points into bitmap, which stays referenced until search returns
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    index_type = index_type_of(index)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = faiss.extract_index_ivf(index).nprobe
+    elif index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = faiss.downcast_index(index.index).hnsw.efSearch
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return index.search(queries, k, params=params)
@@ -0,0 +1,185 @@
+"""
+Versioned on-disk model artifacts.
+
+Each save writes a new generation directory under the model's artifact root:
+
+    <root>/<version>/manifest.json
+    <root>/<version>/<array name>.npy
+    <root>/<version>/<file name>   # other files, e.g. a FAISS index
+    <root>/LATEST              # name of the newest complete generation
+
+A training run that saves several models records the generations it
+published together in a model set file above the model roots:
+
+    <artifacts>/MODEL_SET      # {"version": ..., "generations": {model: version}}
+
+Serving workers in other processes poll it and load exactly that set.
+
+Arrays are raw .npy files so they can be opened with np.load(mmap_mode='r')
+and shared between worker processes through the page cache. A generation is
+written to a temporary directory and renamed into place before LATEST is
+switched, so readers never see a partially written generation. The manifest
+records a SHA-256 checksum of every file for optional verification.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 1
+LATEST_FILE = "LATEST"
+MODEL_SET_FILE = "MODEL_SET"
+MANIFEST_FILE = "manifest.json"
+
+def file_checksum(path: str) -> str:
+    """SHA-256 of a file, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_generation(
+    root: str,
+    arrays: Dict[str, np.ndarray],
+    metadata: Dict,
+    keep: int = 3,
+    files: Optional[Dict[str, Callable[[str], None]]] = None
+) -> str:
+    """
+    Write a new artifact generation and point LATEST at it. Returns its path.
+    files maps extra file names to writers called with the path to write to.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    tmp_path = os.path.join(root, f".tmp-{version}")
+    final_path = os.path.join(root, version)
+    
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+    for name, writer in (files or {}).items():
+        writer(os.path.join(tmp_path, name))
+    
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "arrays": {
+            name: {
+                "dtype": str(array.dtype),
+                "shape": list(array.shape),
+                "sha256": file_checksum(os.path.join(tmp_path, f"{name}.npy")),
+            }
+            for name, array in arrays.items()
+        },
+        "files": {
+            name: {"sha256": file_checksum(os.path.join(tmp_path, name))}
+            for name in (files or {})
+        },
+        "metadata": metadata,
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    
+    os.rename(tmp_path, final_path)
+    
+    # Atomically switch the LATEST pointer
+    latest_tmp = os.path.join(root, f".{LATEST_FILE}.tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    
+    prune_generations(root, keep=keep)
+    logger.info(f"Artifact generation {version} written to {root}")
+    return final_path
+
+def latest_generation(root: str) -> Optional[str]:
+    """Path of the newest complete generation under root, or None"""
+    latest_file = os.path.join(root, LATEST_FILE)
+    if not os.path.exists(latest_file):
+        return None
+    with open(latest_file) as f:
+        version = f.read().strip()
+    path = os.path.join(root, version)
+    return path if os.path.isdir(path) else None
+
+def find_generation(root: str, version: Optional[str] = None) -> Optional[str]:
+    """Path of the given generation under root (the newest when version is None), or None if it is missing"""
+    if version is None:
+        return latest_generation(root)
+    path = os.path.join(root, version)
+    return path if os.path.isdir(path) else None
+
+def write_model_set(artifacts_dir: str, generations: Dict[str, Optional[str]]) -> Dict:
+    """
+    Atomically record the generations published together (model name -> version,
+    None for models that were not saved) and return the written model set
+    """
+    model_set = {
+        "version": datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"),
+        "published_at": datetime.utcnow().isoformat(),
+        "generations": generations,
+    }
+    os.makedirs(artifacts_dir, exist_ok=True)
+    tmp_path = os.path.join(artifacts_dir, f".{MODEL_SET_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(model_set, f, indent=2)
+    os.replace(tmp_path, os.path.join(artifacts_dir, MODEL_SET_FILE))
+    return model_set
+
+def read_model_set(artifacts_dir: str) -> Optional[Dict]:
+    """The last model set written under artifacts_dir, or None"""
+    path = os.path.join(artifacts_dir, MODEL_SET_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """Manifest of a generation, or None if it is missing or has an unknown format"""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        logger.warning(f"Unsupported artifact format {manifest.get('format_version')} in {path}")
+        return None
+    return manifest
+
+def load_arrays(path: str, manifest: Dict, mmap_mode: Optional[str] = "r") -> Dict[str, np.ndarray]:
+    """Open every array listed in the manifest, memory-mapped by default"""
+    return {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in manifest["arrays"]
+    }
+
+def verify_generation(path: str, manifest: Dict) -> bool:
+    """Check every file of a generation against the checksums in its manifest"""
+    expected = {f"{name}.npy": entry.get("sha256") for name, entry in manifest["arrays"].items()}
+    expected.update((name, entry.get("sha256")) for name, entry in manifest.get("files", {}).items())
+    for name, checksum in expected.items():
+        if checksum is not None and file_checksum(os.path.join(path, name)) != checksum:
+            logger.error(f"Checksum mismatch for {name} in {path}")
+            return False
+    return True
+
+def prune_generations(root: str, keep: int = 3):
+    """
+    Remove all but the newest `keep` generations.
+    Workers that still map files of a removed generation keep their pages until they reload.
+    """
+    versions = sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isdir(os.path.join(root, name))
+    )
+    for version in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
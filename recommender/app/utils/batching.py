@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Callable, Dict, List
+
+from app.utils.executor import run_in_executor
+
+class MicroBatcher:
+    """
+    Collects items submitted by concurrent requests for up to max_wait_ms (or until
+    max_batch_size items are waiting), runs process_batch once for all of them on
+    the worker pool and resolves each request with its own result.
+    
+    process_batch takes a list of items and returns a list of results in the same
+    order. A result that is an exception is raised to that item's request only, so
+    process_batch can isolate failures (e.g. per group of similar items); an
+    exception raised by process_batch itself fails every request of the batch.
+    A max_batch_size of 1 disables batching.
+    """
+    
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int, max_wait_ms: float):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._pending = []  # (item, future) waiting for the next batch
+        self._timer = None
+        self._running = set()  # batch tasks, referenced until they finish
+    
+    async def submit(self, item: Any) -> Any:
+        """Queue an item for the next batch and wait for its result"""
+        if self.max_batch_size <= 1:
+            self._record(1)
+            result = (await run_in_executor(self.process_batch, [item]))[0]
+            if isinstance(result, Exception):
+                raise result
+            return result
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._record(len(batch))
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+    
+    async def _run(self, batch):
+        try:
+            results = await run_in_executor(self.process_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            # Requests whose client went away have been cancelled meanwhile
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+    
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else None,
+            "largest_batch": self.largest_batch,
+        }
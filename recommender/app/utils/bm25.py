@@ -0,0 +1,136 @@
+"""
+In-memory BM25 index over product texts, the lexical half of hybrid search.
+
+Postings are stored per term as compact CSR arrays: indptr (int64, one entry
+per term plus one), rows (int32 product rows) and weights (float32 BM25 term
+weights, with idf and document length normalization applied at build time),
+so a query only gathers and sums the postings of its terms.
+
+Tokens are Unicode-normalized, lower-cased runs of letters and digits.
+Compound tokens such as SKUs and model numbers ("WH-1000XM4") are indexed
+as their parts and also as one joined token ("wh1000xm4").
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.topk import top_k_indices
+
+# BM25 term frequency saturation and document length normalization
+K1 = 1.2
+B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+SEPARATOR_PATTERN = re.compile(r"[-_./]")
+
+def tokenize(text: str) -> List[str]:
+    """Lexical tokens of a text or query"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        parts = SEPARATOR_PATTERN.split(match)
+        tokens.extend(parts)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+    return tokens
+
+class BM25Index:
+    """Read-only BM25 index; rows are positions in the product arrays of the owning model"""
+    
+    def __init__(self, terms: List[str], indptr: np.ndarray, rows: np.ndarray, weights: np.ndarray, n_docs: int):
+        self.terms = terms
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.n_docs = n_docs
+    
+    def search(self, query: str, k: int, mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows of the k best matching documents, restricted to rows where mask is set
+        Returns: (rows, scores) sorted by descending BM25 score
+        """
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        
+        rows = np.concatenate([self.rows[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        if mask is not None:
+            keep = mask[rows]
+            rows, weights = rows[keep], weights[keep]
+        
+        # Sum the weights of each document over the query terms
+        matched, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        top = top_k_indices(scores, k)
+        return matched[top], scores[top]
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Posting arrays for saving, keyed by artifact array name"""
+        return {"bm25_indptr": self.indptr, "bm25_rows": self.rows, "bm25_weights": self.weights}
+    
+    @classmethod
+    def from_arrays(cls, terms: List[str], arrays: Dict[str, np.ndarray], n_docs: int) -> "BM25Index":
+        return cls(terms, arrays["bm25_indptr"], arrays["bm25_rows"], arrays["bm25_weights"], n_docs)
+    
+    def stats(self) -> Dict:
+        return {
+            "documents": self.n_docs,
+            "terms": len(self.terms),
+            "postings": len(self.rows),
+            "bytes": int(self.indptr.nbytes + self.rows.nbytes + self.weights.nbytes),
+        }
+
+class BM25Builder:
+    """Accumulates documents in row order, chunk by chunk, and builds a BM25Index"""
+    
+    def __init__(self, k1: float = K1, b: float = B):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.n_docs = 0
+        self._term_chunks = []
+        self._row_chunks = []
+        self._tf_chunks = []
+        self._length_chunks = []
+    
+    def add(self, texts: List[str]):
+        """Append the next documents (rows continue from the previous call)"""
+        term_ids, rows, tfs, lengths = [], [], [], []
+        for row, text in enumerate(texts, start=self.n_docs):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                rows.append(row)
+                tfs.append(count)
+        self.n_docs += len(texts)
+        self._term_chunks.append(np.array(term_ids, dtype=np.int32))
+        self._row_chunks.append(np.array(rows, dtype=np.int32))
+        self._tf_chunks.append(np.array(tfs, dtype=np.float32))
+        self._length_chunks.append(np.array(lengths, dtype=np.float32))
+    
+    def build(self) -> BM25Index:
+        term_ids = np.concatenate(self._term_chunks) if self._term_chunks else np.empty(0, dtype=np.int32)
+        rows = np.concatenate(self._row_chunks) if self._row_chunks else np.empty(0, dtype=np.int32)
+        tfs = np.concatenate(self._tf_chunks) if self._tf_chunks else np.empty(0, dtype=np.float32)
+        lengths = np.concatenate(self._length_chunks) if self._length_chunks else np.empty(0, dtype=np.float32)
+        self._term_chunks, self._row_chunks, self._tf_chunks, self._length_chunks = [], [], [], []
+        
+        # Group postings by term; the stable sort keeps rows ascending within a term
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, rows, tfs = term_ids[order], rows[order], tfs[order]
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=indptr[1:])
+        
+        idf = np.log1p((self.n_docs - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        average_length = max(float(lengths.mean()), 1.0) if len(lengths) else 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+        weights = (idf[term_ids] * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+        
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return BM25Index(terms, indptr, rows, weights, self.n_docs)
@@ -0,0 +1,158 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+def value_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count and total bytes,
+    with an optional time-to-live. Keeps hit/miss/eviction counters for status reporting.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int = 0,
+        ttl_seconds: float = 0,
+        sizeof: Callable[[Any], int] = value_nbytes
+    ):
+        self.max_entries = max_entries  # 0 disables the cache
+        self.max_bytes = max_bytes  # 0 means no memory limit
+        self.ttl_seconds = ttl_seconds  # 0 means entries never expire
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value for key (marking it recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Hashable, value: Any):
+        """Store value under key, evicting least recently used entries to stay within limits"""
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+def response_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached response (a list of flat dicts)"""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return value_nbytes(value)
+
+class VersionedCache:
+    """
+    LRU cache of responses computed from one model set version. Lookups and
+    stores carry the version they were computed from: invalidate (or the first
+    lookup with a newer version) drops every older entry, and stores from an
+    older version (a request that started before a publish) are ignored.
+    Empty results, e.g. for unknown product or user ids, are cached too and
+    counted separately as negative hits.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int = 0, ttl_seconds: float = 0):
+        self.entries = LRUCache(max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds, sizeof=response_nbytes)
+        self.version = None
+        self.invalidations = 0
+        self.negative_hits = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.entries.enabled
+    
+    def invalidate(self, version: int):
+        """Drop all entries once a newer model version is live"""
+        with self._lock:
+            if self.version is None or version > self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.version = version
+    
+    def get(self, version: int, key: Hashable) -> Optional[Any]:
+        """Response cached for key under this model version, or None"""
+        if not self.enabled:
+            return None
+        if version != self.version:
+            self.invalidate(version)
+            if version != self.version:
+                return None
+        value = self.entries.get(key)
+        if value is not None and len(value) == 0:
+            self.negative_hits += 1
+        return value
+    
+    def put(self, version: int, key: Hashable, value: Any):
+        if version == self.version:
+            self.entries.put(key, value)
+    
+    def stats(self) -> Dict:
+        return {
+            **self.entries.stats(),
+            "model_version": self.version,
+            "negative_hits": self.negative_hits,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,145 @@
+"""
+Streaming extraction of training data from the database.
+
+Queries run with stream_results, so PostgreSQL (psycopg2) serves rows through a
+server-side cursor in partitions of chunk_size instead of the driver buffering
+the whole result. Each partition is converted column by column into typed NumPy
+arrays that grow geometrically, so at most one partition of Python row objects
+is alive at a time and the result ends up as compact columns (e.g. the COO
+triplets of the interaction matrix) rather than millions of tuples.
+
+The training queries live here too, shared by the models and the snapshot
+exporter (app.utils.snapshot).
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import EXTRACT_CHUNK_SIZE
+
+# Columns of the interaction query: COO triplets (summed quantities) plus the order timestamp and id
+INTERACTION_DTYPES = {
+    "user_id": np.int64,
+    "product_id": np.int64,
+    "weight": np.float32,
+    "updated_at": np.dtype("datetime64[us]"),
+    "order_id": np.int64,
+}
+
+# Product catalog, read by the content-based model
+PRODUCTS_QUERY = text("""
+    SELECT id, name, description, category, price, stock
+    FROM products
+    ORDER BY id
+""")
+
+# Product view events (anonymous views have user_id -1)
+PRODUCT_VIEWS_QUERY = text("""
+    SELECT COALESCE(user_id, -1), product_id, viewed_at, session_id
+    FROM product_views
+    ORDER BY id
+""")
+
+def interactions_query(since: bool = False):
+    """
+    (user, product, quantity, order timestamp, order id) of completed orders, one row
+    per (order, product); with since=True only orders updated at or after the :since
+    parameter (inclusive, so orders sharing the watermark's timestamp are not skipped;
+    callers drop the orders they already have by id).
+    The timestamp falls back to created_at: orders placed before updated_at was added
+    have it NULL. It is NaT in the columns when both are NULL.
+    """
+    return text(f"""
+        SELECT
+            o.user_id,
+            ci.product_id,
+            SUM(ci.quantity) as interaction_strength,
+            COALESCE(o.updated_at, o.created_at),
+            o.id
+        FROM orders o
+        JOIN cart_items ci ON o.id = ci.order_id
+        WHERE o.status = 'completed'
+        {"AND COALESCE(o.updated_at, o.created_at) >= :since" if since else ""}
+        GROUP BY o.id, o.user_id, ci.product_id, o.updated_at, o.created_at
+    """)
+
+def latest_timestamp(timestamps: np.ndarray) -> Optional[datetime]:
+    """Newest of a datetime64 column, ignoring NaT; None if it has no timestamp"""
+    known = timestamps[~np.isnat(timestamps)]
+    return known.max().astype(datetime) if len(known) else None
+
+def stream_partitions(db_session, query, params: Optional[Dict] = None, chunk_size: int = EXTRACT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """
+    Execute a text() query through a server-side cursor
+    Yields: lists of at most chunk_size rows
+    """
+    result = db_session.execute(query.execution_options(stream_results=True), params or {})
+    try:
+        yield from result.partitions(chunk_size)
+    finally:
+        result.close()
+
+class ColumnBuffer:
+    """
+    Named typed columns filled chunk by chunk. Storage is preallocated for
+    `capacity` rows and doubles when full; arrays() trims it to the rows written.
+    """
+    
+    def __init__(self, dtypes: Dict[str, np.dtype], capacity: int = 1024):
+        self.size = 0
+        self.columns = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in dtypes.items()}
+    
+    @property
+    def capacity(self) -> int:
+        return len(next(iter(self.columns.values())))
+    
+    def reserve(self, capacity: int):
+        """Grow every column to hold at least capacity rows"""
+        if capacity <= self.capacity:
+            return
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+    
+    def append(self, values: Dict[str, Sequence]):
+        """Append equally long sequences of values, one per column"""
+        n_rows = len(next(iter(values.values())))
+        end = self.size + n_rows
+        if end > self.capacity:
+            self.reserve(max(end, 2 * self.capacity))
+        for name, column in self.columns.items():
+            column[self.size:end] = np.asarray(values[name], dtype=column.dtype)
+        self.size = end
+    
+    def append_rows(self, rows: List[tuple]):
+        """Append row tuples whose leading fields are in column order"""
+        if rows:
+            # One field at a time (faster than transposing the rows with zip)
+            self.append({name: [row[field] for row in rows] for field, name in enumerate(self.columns)})
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The written rows of every column; the buffer gives up its storage"""
+        columns, self.columns = self.columns, {}
+        for column in columns.values():
+            # Shrinks the allocation in place; nothing else references these arrays
+            column.resize(self.size, refcheck=False)
+        return columns
+
+def read_columns(
+    db_session,
+    query,
+    dtypes: Dict[str, np.dtype],
+    params: Optional[Dict] = None,
+    chunk_size: int = EXTRACT_CHUNK_SIZE
+) -> Dict[str, np.ndarray]:
+    """
+    Stream a query into typed column arrays, one per selected column in order
+    Returns: {column name: array}
+    """
+    buffer = ColumnBuffer(dtypes, capacity=chunk_size)
+    for rows in stream_partitions(db_session, query, params, chunk_size):
+        buffer.append_rows(rows)
+    return buffer.arrays()
@@ -0,0 +1,34 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.config import EXECUTOR_WORKERS
+
+# Bounded pool for CPU-bound request work (NumPy scoring, FAISS search, encoding).
+# Threads rather than processes: the models are shared in memory and the heavy
+# sections release the GIL inside NumPy/BLAS, FAISS and PyTorch.
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool, created on first use"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="recommender-worker")
+        return _executor
+
+async def run_in_executor(func, *args, **kwargs):
+    """Run a blocking function on the bounded worker pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_executor(wait: bool = True):
+    """Stop the worker pool (called on application shutdown)"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,42 @@
+import numpy as np
+from typing import Optional
+
+class IdIndex:
+    """
+    Maps external ids (product / user ids) to row numbers in O(log n)
+    using a sorted int64 array and np.searchsorted.
+    Works on plain or memory-mapped arrays; ids do not need to be sorted.
+    """
+    
+    def __init__(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) > 1 and np.any(ids[1:] < ids[:-1]):
+            self.order = np.argsort(ids, kind="stable")
+            self.sorted_ids = ids[self.order]
+        else:
+            self.order = None
+            self.sorted_ids = ids
+    
+    def __len__(self) -> int:
+        return len(self.sorted_ids)
+    
+    def __contains__(self, item_id: int) -> bool:
+        return self.get(item_id) is not None
+    
+    def get(self, item_id: int) -> Optional[int]:
+        """Row number of a single id, or None if it is unknown"""
+        pos = int(np.searchsorted(self.sorted_ids, item_id))
+        if pos >= len(self.sorted_ids) or self.sorted_ids[pos] != item_id:
+            return None
+        return pos if self.order is None else int(self.order[pos])
+    
+    def lookup(self, item_ids) -> np.ndarray:
+        """Row numbers for an array of ids, -1 where the id is unknown"""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if len(self.sorted_ids) == 0:
+            return np.full(item_ids.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_ids, item_ids)
+        pos = np.minimum(pos, len(self.sorted_ids) - 1)
+        found = self.sorted_ids[pos] == item_ids
+        rows = pos if self.order is None else self.order[pos]
+        return np.where(found, rows, -1)
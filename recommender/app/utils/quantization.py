@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Optional, Tuple
+
+# Storage dtypes for embeddings: float32 as produced by the encoder, float16, or int8 codes
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 scalar quantization: each dimension's [min, max] range is
+    split into 256 steps, so x ~= offset + (code + 128) * scale.
+    Values outside the trained range are clipped.
+    """
+    
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+    
+    @classmethod
+    def train(cls, embeddings: np.ndarray) -> "ScalarQuantizer":
+        """Per-dimension ranges of a float32 [n, dimension] array"""
+        low = embeddings.min(axis=0)
+        high = embeddings.max(axis=0)
+        scale = (high - low) / 255
+        scale[scale == 0] = 1.0
+        return cls(low, scale)
+    
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        codes = np.rint((embeddings - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+    
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + (codes.astype(np.float32) + 128) * self.scale
+
+def compress(
+    embeddings: np.ndarray,
+    dtype: str,
+    quantizer: Optional[ScalarQuantizer] = None
+) -> Tuple[np.ndarray, Optional[ScalarQuantizer]]:
+    """
+    Convert float32 embeddings to a storage dtype
+    Returns: (stored array, quantizer for int8 storage or None); int8 trains a quantizer unless one is given
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype {dtype!r}, expected one of {EMBEDDING_DTYPES}")
+    if dtype == "int8":
+        quantizer = quantizer or ScalarQuantizer.train(embeddings)
+        return quantizer.encode(embeddings), quantizer
+    return embeddings.astype(dtype, copy=False), None
+
+def decompress(stored: np.ndarray, quantizer: Optional[ScalarQuantizer] = None) -> np.ndarray:
+    """float32 embeddings from a stored (possibly memory-mapped) array"""
+    if quantizer is not None:
+        return quantizer.decode(stored)
+    return np.asarray(stored, dtype=np.float32)
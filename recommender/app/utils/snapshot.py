@@ -0,0 +1,211 @@
+"""
+Columnar training snapshots.
+
+An export reads everything training needs from the database once: the
+interaction triplets of completed orders, product view events and the product
+catalog. It writes them as a generation with the same layout, manifest and
+LATEST pointer as the model artifacts (app.utils.artifacts):
+
+    <root>/<version>/manifest.json                # row counts, watermark, export time
+    <root>/<version>/interactions_<column>.npy    # user_id, product_id, weight, updated_at, order_id
+    <root>/<version>/views_<column>.npy           # user_id (-1 if anonymous), product_id, viewed_at
+    <root>/<version>/products_<column>.npy        # id, price, stock
+    <root>/<version>/<string column>_data.npy     # UTF-8 bytes of all values
+    <root>/<version>/<string column>_offsets.npy  # int64 start of every value, plus the end
+
+String columns (product name, description, category; view session id) are stored
+Arrow-style as one byte array plus offsets, so every file is a plain .npy that
+can be memory-mapped. A Snapshot can be passed to the models' fit in place of
+a database session, to retrain on another machine, replay identical data in
+benchmarks or keep heavy scans off the primary.
+
+Usage (from the recommender/ directory):
+    python -m app.utils.snapshot /data/snapshots            # export from DATABASE_URL
+    TRAINING_SNAPSHOT_DIR=/data/snapshots python -m app.training
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.config import EXTRACT_CHUNK_SIZE
+from app.utils.artifacts import find_generation, load_arrays, read_manifest, write_generation
+from app.utils.data_access import (
+    INTERACTION_DTYPES, PRODUCTS_QUERY, PRODUCT_VIEWS_QUERY,
+    ColumnBuffer, interactions_query, latest_timestamp, read_columns, stream_partitions
+)
+
+logger = logging.getLogger(__name__)
+
+# Marks a string column in a table layout
+STRING = None
+
+# Column layouts of the exported tables, in query column order
+PRODUCT_COLUMNS = {
+    "id": np.int64,
+    "name": STRING,
+    "description": STRING,
+    "category": STRING,
+    "price": np.float32,
+    "stock": np.int32,
+}
+VIEW_COLUMNS = {
+    "user_id": np.int64,
+    "product_id": np.int64,
+    "viewed_at": np.dtype("datetime64[us]"),
+    "session_id": STRING,
+}
+
+class StringColumnBuffer:
+    """UTF-8 strings appended chunk by chunk into one byte array plus offsets (None is stored as empty)"""
+    
+    def __init__(self):
+        self._data = []
+        self._lengths = []
+    
+    def append(self, values: List[Optional[str]]):
+        encoded = [value.encode("utf-8") if value else b"" for value in values]
+        self._data.append(b"".join(encoded))
+        self._lengths.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        offsets = np.zeros(sum(map(len, self._lengths)) + 1, dtype=np.int64)
+        if self._lengths:
+            np.cumsum(np.concatenate(self._lengths), out=offsets[1:])
+        data = np.frombuffer(b"".join(self._data), dtype=np.uint8)
+        self._data, self._lengths = [], []
+        return {"data": data, "offsets": offsets}
+
+def read_table(db_session, query, columns: Dict, chunk_size: int = EXTRACT_CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Stream a query into columnar arrays following a layout of name -> dtype (STRING for text)
+    Returns: {name: array} for typed columns, {name_data, name_offsets} for string columns
+    """
+    typed = {name: dtype for name, dtype in columns.items() if dtype is not STRING}
+    buffer = ColumnBuffer(typed, capacity=chunk_size)
+    strings = {name: StringColumnBuffer() for name, dtype in columns.items() if dtype is STRING}
+    fields = {name: field for field, name in enumerate(columns)}
+    for rows in stream_partitions(db_session, query, chunk_size=chunk_size):
+        buffer.append({name: [row[fields[name]] for row in rows] for name in typed})
+        for name, column in strings.items():
+            column.append([row[fields[name]] for row in rows])
+    arrays = buffer.arrays()
+    for name, column in strings.items():
+        for part, array in column.arrays().items():
+            arrays[f"{name}_{part}"] = array
+    return arrays
+
+def export_snapshot(db_session, root: str, chunk_size: int = EXTRACT_CHUNK_SIZE, keep: int = 3) -> str:
+    """
+    Export interactions, product views and products as a new snapshot generation under root
+    Returns: path of the generation
+    """
+    started = time.perf_counter()
+    tables = {
+        "interactions": read_columns(db_session, interactions_query(), INTERACTION_DTYPES, chunk_size=chunk_size),
+        "views": read_table(db_session, PRODUCT_VIEWS_QUERY, VIEW_COLUMNS, chunk_size),
+        "products": read_table(db_session, PRODUCTS_QUERY, PRODUCT_COLUMNS, chunk_size),
+    }
+    arrays = {f"{table}_{name}": array for table, columns in tables.items() for name, array in columns.items()}
+    
+    timestamps = tables["interactions"]["updated_at"]
+    watermark = latest_timestamp(timestamps)
+    metadata = {
+        "exported_at": datetime.utcnow().isoformat(),
+        "rows": {
+            "interactions": len(timestamps),
+            "views": len(tables["views"]["product_id"]),
+            "products": len(tables["products"]["id"]),
+        },
+        "watermark": str(np.datetime64(watermark, "us")) if watermark is not None else None,
+    }
+    generation = write_generation(root, arrays, metadata, keep=keep)
+    logger.info(f"Snapshot {metadata['rows']} exported to {generation} in {time.perf_counter() - started:.1f}s")
+    return generation
+
+class Snapshot:
+    """
+    Read-only, memory-mapped training snapshot. Accepted by the models' fit
+    (and partial_fit) wherever a database session is, and closed like one.
+    """
+    
+    def __init__(self, path: str, manifest: Dict, arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.version = manifest["version"]
+        self.metadata = manifest["metadata"]
+        self.arrays = arrays
+    
+    @classmethod
+    def open(cls, path: str, version: Optional[str] = None) -> "Snapshot":
+        """Open a snapshot generation directory, or the latest (or given) generation under a snapshot root"""
+        generation = path if read_manifest(path) is not None else find_generation(path, version)
+        manifest = read_manifest(generation) if generation else None
+        if manifest is None or "interactions_user_id" not in manifest["arrays"]:
+            raise FileNotFoundError(f"No training snapshot found in {path}")
+        if any(f"interactions_{name}" not in manifest["arrays"] for name in INTERACTION_DTYPES):
+            raise FileNotFoundError(f"Training snapshot {generation} predates the current interaction columns, re-export it")
+        return cls(generation, manifest, load_arrays(generation, manifest))
+    
+    def close(self):
+        self.arrays = {}
+    
+    def interactions(self, since: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """Interaction columns (as INTERACTION_DTYPES), optionally only orders updated at or after since; in-memory copies"""
+        columns = {name: self.arrays[f"interactions_{name}"] for name in INTERACTION_DTYPES}
+        if since is None:
+            return {name: np.array(column) for name, column in columns.items()}
+        keep = columns["updated_at"] >= np.datetime64(since, "us")
+        return {name: column[keep] for name, column in columns.items()}
+    
+    def strings(self, column: str, start: int, end: int) -> List[str]:
+        """Values start..end of a string column"""
+        offsets = self.arrays[f"{column}_offsets"][start:end + 1]
+        data = self.arrays[f"{column}_data"][offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        return [data[begin - base:stop - base].decode("utf-8") for begin, stop in zip(offsets[:-1], offsets[1:])]
+    
+    def product_partitions(self, chunk_size: int = EXTRACT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+        """
+        Products in id order, like the database product query
+        Yields: lists of at most chunk_size (id, name, description, category, price, stock)
+        """
+        ids = self.arrays["products_id"]
+        for start in range(0, len(ids), chunk_size):
+            end = min(start + chunk_size, len(ids))
+            names = self.strings("products_name", start, end)
+            descriptions = self.strings("products_description", start, end)
+            categories = self.strings("products_category", start, end)
+            yield [
+                (int(product_id), name, description or None, category or None, float(price), int(stock))
+                for product_id, name, description, category, price, stock in zip(
+                    ids[start:end], names, descriptions, categories,
+                    self.arrays["products_price"][start:end], self.arrays["products_stock"][start:end]
+                )
+            ]
+    
+    def product_views(self) -> Dict[str, np.ndarray]:
+        """View event columns (user_id, product_id, viewed_at); session ids via strings("views_session_id", ...)"""
+        return {name: self.arrays[f"views_{name}"] for name in ("user_id", "product_id", "viewed_at")}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Snapshot root directory; each export is a new generation under it")
+    parser.add_argument("--chunk-size", type=int, default=EXTRACT_CHUNK_SIZE, help="Rows per server-side cursor fetch")
+    parser.add_argument("--keep", type=int, default=3, help="Snapshot generations to keep")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    from app.database import SessionLocal
+    
+    session = SessionLocal()
+    try:
+        print(export_snapshot(session, os.path.abspath(args.root), args.chunk_size, args.keep))
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import numpy as np
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest scores, sorted by descending score.
+    Uses np.argpartition so only the selected k entries are fully sorted.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def top_k_indices_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    top_k_indices for every row of a 2-D score matrix
+    Returns: [n_rows, min(k, n_columns)] column indices, each row sorted by descending score
+    """
+    n_rows, n = scores.shape
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.intp)
+    
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(n), (n_rows, 1))
+    
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
@@ -0,0 +1,135 @@
+"""
+Benchmark of the FAISS index types available to the content-based model
+(CB_INDEX_TYPE): flat, ivf_flat, ivf_pq and hnsw.
+
+For each catalog size, synthetic clustered embeddings are indexed with every
+type and every search setting (nprobe for IVF, efSearch for HNSW). Reported:
+build time, index size, single-query QPS (one query per search call, as the
+API issues them) and recall@k against the exact flat index.
+
+Usage (from the recommender/ directory):
+    python -m benchmarks.bench_ann
+    python -m benchmarks.bench_ann --sizes 100000 --types flat hnsw --ef-search 32 64 128 --json ann.json
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.utils import ann_index
+
+def synthetic_embeddings(n_vectors, dimension, n_clusters, rng):
+    """Gaussian clusters, closer to sentence embeddings than uniform noise"""
+    centers = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    embeddings = np.empty((n_vectors, dimension), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, n_vectors, chunk):
+        end = min(start + chunk, n_vectors)
+        assignment = rng.integers(0, n_clusters, size=end - start)
+        embeddings[start:end] = centers[assignment] + 0.5 * rng.standard_normal((end - start, dimension), dtype=np.float32)
+    return embeddings
+
+def measure_search(index, queries, top_k):
+    """Single-query QPS and the labels returned for every query"""
+    labels = np.empty((len(queries), top_k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, labels[i:i + 1] = index.search(queries[i:i + 1], top_k)
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed, labels
+
+def recall_at_k(labels, truth):
+    hits = sum(len(np.intersect1d(found, expected)) for found, expected in zip(labels, truth))
+    return hits / truth.size
+
+def run(sizes, types, dimension, n_queries, top_k, build_params, nprobes, ef_searches, seed=42):
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    for n_vectors in sizes:
+        embeddings = synthetic_embeddings(n_vectors, dimension, max(16, n_vectors // 1000), rng)
+        ids = np.arange(n_vectors, dtype=np.int64)
+        # Queries are perturbed catalog vectors, like "more like this" lookups
+        queries = embeddings[rng.choice(n_vectors, size=n_queries, replace=False)]
+        queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+        
+        exact = ann_index.build_index(embeddings, ids, "flat")
+        _, truth = exact.search(queries, top_k)
+        del exact
+        
+        for index_type in types:
+            start = time.perf_counter()
+            index = ann_index.build_index(embeddings, ids, index_type, **build_params)
+            build_seconds = time.perf_counter() - start
+            size_mb = len(faiss.serialize_index(index)) / 2**20
+            
+            built_type = ann_index.index_type_of(index)
+            if built_type in ("ivf_flat", "ivf_pq"):
+                settings = [{"nprobe": nprobe} for nprobe in nprobes]
+            elif built_type == "hnsw":
+                settings = [{"ef_search": ef_search} for ef_search in ef_searches]
+            else:
+                settings = [{}]
+            
+            for setting in settings:
+                ann_index.configure_search(index, **setting)
+                qps, labels = measure_search(index, queries, top_k)
+                results.append({
+                    "n_vectors": n_vectors,
+                    "dimension": dimension,
+                    **ann_index.search_params(index),
+                    "build_seconds": build_seconds,
+                    "index_mb": size_mb,
+                    "qps": qps,
+                    f"recall@{top_k}": recall_at_k(labels, truth),
+                })
+                label = " ".join(f"{key}={value}" for key, value in setting.items())
+                print(
+                    f"n={n_vectors:>9,}  {built_type:<8} {label:<14} build={build_seconds:>7.1f}s  "
+                    f"size={size_mb:>8.1f}MB  qps={qps:>8.0f}  recall@{top_k}={results[-1][f'recall@{top_k}']:.3f}"
+                )
+            del index
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--types", nargs="+", default=list(ann_index.INDEX_TYPES), choices=ann_index.INDEX_TYPES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF cells (0 = 4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=80)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--threads", type=int, default=0, help="FAISS OpenMP threads (0 keeps the default)")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    
+    build_params = {
+        "nlist": args.nlist,
+        "pq_m": args.pq_m,
+        "pq_nbits": args.pq_nbits,
+        "hnsw_m": args.hnsw_m,
+        "ef_construction": args.ef_construction,
+    }
+    results = run(
+        args.sizes, args.types, args.dimension, args.queries, args.top_k,
+        build_params, args.nprobe, args.ef_search
+    )
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of compressed embedding storage for the content-based model (CB_EMBEDDING_DTYPE).
+
+For each storage dtype (float32, float16, int8) the model's two vector copies
+are built over synthetic clustered embeddings: the stored embedding array and
+the FAISS index with the matching scalar quantizer. Reported: bytes held by
+both, single-query QPS and recall@k against exact float32 search, with queries
+taken from the stored (compressed) embeddings as get_similar_products does.
+
+Usage (from the recommender/ directory):
+    python -m benchmarks.bench_embedding_storage
+    python -m benchmarks.bench_embedding_storage --sizes 100000 --types flat hnsw --json storage.json
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.utils import ann_index
+from app.utils.quantization import EMBEDDING_DTYPES, compress, decompress
+from benchmarks.bench_ann import measure_search, recall_at_k, synthetic_embeddings
+
+def run(sizes, types, dtypes, dimension, n_queries, top_k, seed=42):
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    for n_vectors in sizes:
+        embeddings = synthetic_embeddings(n_vectors, dimension, max(16, n_vectors // 1000), rng)
+        ids = np.arange(n_vectors, dtype=np.int64)
+        query_rows = rng.choice(n_vectors, size=n_queries, replace=False)
+        
+        exact = ann_index.build_index(embeddings, ids, "flat")
+        _, truth = exact.search(embeddings[query_rows], top_k)
+        del exact
+        
+        for index_type in types:
+            for dtype in dtypes:
+                start = time.perf_counter()
+                stored, quantizer = compress(embeddings, dtype)
+                index = ann_index.build_index(embeddings, ids, index_type, storage=dtype)
+                build_seconds = time.perf_counter() - start
+                
+                embeddings_mb = stored.nbytes / 2**20
+                index_mb = len(faiss.serialize_index(index)) / 2**20
+                queries = decompress(stored[query_rows], quantizer)
+                qps, labels = measure_search(index, queries, top_k)
+                recall = recall_at_k(labels, truth)
+                results.append({
+                    "n_vectors": n_vectors,
+                    "dimension": dimension,
+                    "index_type": index_type,
+                    "dtype": dtype,
+                    "build_seconds": build_seconds,
+                    "embeddings_mb": embeddings_mb,
+                    "index_mb": index_mb,
+                    "total_mb": embeddings_mb + index_mb,
+                    "qps": qps,
+                    f"recall@{top_k}": recall,
+                })
+                print(
+                    f"n={n_vectors:>9,}  {index_type:<8} {dtype:<7}  embeddings={embeddings_mb:>8.1f}MB  "
+                    f"index={index_mb:>8.1f}MB  total={embeddings_mb + index_mb:>8.1f}MB  "
+                    f"qps={qps:>7.0f}  recall@{top_k}={recall:.3f}"
+                )
+                del stored, index
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--types", nargs="+", default=["flat"], choices=["flat", "ivf_flat", "hnsw"])
+    parser.add_argument("--dtypes", nargs="+", default=list(EMBEDDING_DTYPES), choices=EMBEDDING_DTYPES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = run(args.sizes, args.types, args.dtypes, args.dimension, args.queries, args.top_k)
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
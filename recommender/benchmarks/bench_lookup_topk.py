@@ -0,0 +1,101 @@
+"""
+Micro-benchmark for the per-request hot path of the recommender models:
+id -> row lookup followed by top-k selection over a score vector.
+
+"before" is the original list.index() + full np.argsort,
+"after" is IdIndex (searchsorted) + argpartition-based top_k_indices.
+
+Usage (from the recommender/ directory):
+    python -m benchmarks.bench_lookup_topk
+    python -m benchmarks.bench_lookup_topk --sizes 10000 100000 --queries 500 --json out.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.utils.id_index import IdIndex
+from app.utils.topk import top_k_indices
+
+def percentiles(samples):
+    samples_us = np.asarray(samples) * 1e6
+    return {
+        "p50_us": float(np.percentile(samples_us, 50)),
+        "p99_us": float(np.percentile(samples_us, 99)),
+    }
+
+def bench_before(id_list, scores, queries, top_k):
+    """Returns: (timings, looked up rows, top-k of the last query)"""
+    samples, rows = [], []
+    for item_id in queries:
+        start = time.perf_counter()
+        idx = id_list.index(item_id)
+        top = np.argsort(scores)[::-1][:top_k]
+        samples.append(time.perf_counter() - start)
+        rows.append(idx)
+    return samples, rows, top
+
+def bench_after(id_index, scores, queries, top_k):
+    """Returns: (timings, looked up rows, top-k of the last query)"""
+    samples, rows = [], []
+    for item_id in queries:
+        start = time.perf_counter()
+        idx = id_index.get(item_id)
+        top = top_k_indices(scores, top_k)
+        samples.append(time.perf_counter() - start)
+        rows.append(idx)
+    return samples, rows, top
+
+def run(sizes, n_queries, top_k, seed=42):
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    for n_items in sizes:
+        # Sparse, sorted ids like database primary keys with gaps
+        ids = np.sort(rng.choice(n_items * 4, size=n_items, replace=False)).astype(np.int64)
+        scores = rng.random(n_items, dtype=np.float32)
+        queries = rng.choice(ids, size=n_queries)
+        
+        id_list = ids.tolist()
+        id_index = IdIndex(ids)
+        
+        before_samples, before_rows, before_top = bench_before(id_list, scores, queries, top_k)
+        after_samples, after_rows, after_top = bench_after(id_index, scores, queries, top_k)
+        # Both paths must agree: same rows, same top-k scores (ties may be ordered differently)
+        assert before_rows == after_rows, "IdIndex rows differ from list.index()"
+        assert np.array_equal(scores[before_top], scores[after_top]), "top_k_indices differs from argsort"
+        before = percentiles(before_samples)
+        after = percentiles(after_samples)
+        results.append({
+            "n_items": n_items,
+            "top_k": top_k,
+            "queries": n_queries,
+            "before": before,
+            "after": after,
+            "speedup_p50": before["p50_us"] / after["p50_us"],
+        })
+        print(
+            f"n={n_items:>9,}  before p50={before['p50_us']:>10.1f}us p99={before['p99_us']:>10.1f}us  "
+            f"after p50={after['p50_us']:>8.1f}us p99={after['p99_us']:>8.1f}us  "
+            f"speedup x{results[-1]['speedup_p50']:.1f}"
+        )
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = run(args.sizes, args.queries, args.top_k)
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
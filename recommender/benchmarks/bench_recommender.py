@@ -0,0 +1,281 @@
+"""
+End-to-end benchmark suite of the recommender over synthetic data at scale.
+
+For each scale a SQLite store with power-law product popularity and user
+activity is generated (or reused from --data-dir; see benchmarks.synthetic).
+The suite times training of every model (collaborative fit, ALS fit,
+content-based fit with a hashing stub encoder, hybrid neighbour table), then
+publishes the models and measures in-process request latency of every
+endpoint and method through the FastAPI app: /similar for each method, /user
+for each method, /search for each mode and the three batch endpoints.
+Requested ids follow the purchase popularity skew; search queries are unique.
+The response cache is off unless --cache is given. With --snapshot the
+dataset is exported once as a columnar training snapshot (app.utils.snapshot)
+and the models are fitted from it instead of from SQLite.
+
+Results are written as JSON tagged with the git commit, so runs can be
+compared across commits; --baseline prints the ratios against an earlier run.
+
+Usage (from the recommender/ directory):
+    python -m benchmarks.bench_recommender --scales small
+    python -m benchmarks.bench_recommender --scales small medium --json after.json --baseline before.json
+    python -m benchmarks.bench_recommender --products 50000 --users 80000 --interactions 2000000
+    python -m benchmarks.bench_recommender --scales medium --snapshot
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import (
+    SCALES, dataset_path, generate_dataset, read_dataset_info, sample_request_ids, search_queries
+)
+
+SIMILAR_METHODS = ("collaborative", "als", "content", "hybrid")
+USER_METHODS = ("collaborative", "als")
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def max_rss_mb():
+    """Peak resident memory of this process so far (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def summary(samples, items_per_request=1):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "requests": len(samples),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "items_per_second": float(items_per_request * len(samples) / (samples_ms.sum() / 1000)),
+    }
+
+def timed_requests(send, requests, warm_up=5):
+    """Latencies of send(request) for every request, after a few untimed ones"""
+    for request in requests[:warm_up]:
+        send(request)
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        response = send(request)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return latencies
+
+def fit_models(session_factory, dimension, chunk_size, work_dir):
+    """Train every model on the dataset; returns (models, per-model timings)"""
+    from app.models.collaborative_filtering import CollaborativeFilteringModel
+    from app.models.content_based import ContentBasedModel
+    from app.models.hybrid import HybridNeighbours
+    from app.models.matrix_factorization import ImplicitALSModel
+    from benchmarks.stub_encoder import StubEncoder
+    
+    cf = CollaborativeFilteringModel()
+    als = ImplicitALSModel()
+    cb = ContentBasedModel(encoder=StubEncoder(dimension))
+    hybrid = HybridNeighbours()
+    fits = [
+        ("collaborative", lambda session: cf.fit(session)),
+        ("als", lambda session: als.fit(session)),
+        ("content", lambda session: cb.fit(session, chunk_size=chunk_size, processes=0, work_dir=work_dir)),
+        ("hybrid", lambda session: hybrid.fit(cf, cb)),
+    ]
+    timings = {}
+    for name, fit in fits:
+        session = session_factory()
+        try:
+            start = time.perf_counter()
+            fit(session)
+            timings[name] = {"seconds": time.perf_counter() - start, "max_rss_mb": max_rss_mb()}
+        finally:
+            session.close()
+        print(f"  fit {name:<14} {timings[name]['seconds']:>8.2f}s  (peak RSS {timings[name]['max_rss_mb']:.0f}MB)")
+    return (cf, als, cb, hybrid), timings
+
+def measure_endpoints(client, ids, queries, n_requests, batch_size, top_k):
+    """Latency of every endpoint and method; returns {label: summary}"""
+    product_ids, user_ids = ids["product_ids"][:n_requests], ids["user_ids"][:n_requests]
+    n_batches = max(5, n_requests // 10)
+    batches = [
+        (ids["product_ids"][i:i + batch_size], ids["user_ids"][i:i + batch_size], queries[i:i + batch_size])
+        for i in range(0, n_batches * batch_size, batch_size)
+    ]
+    cases = []
+    for method in SIMILAR_METHODS:
+        cases.append((f"similar:{method}", 1, product_ids, lambda pid, method=method: client.get(
+            f"/recommendations/similar/{pid}", params={"method": method, "top_k": top_k})))
+    for method in USER_METHODS:
+        cases.append((f"user:{method}", 1, user_ids, lambda uid, method=method: client.get(
+            f"/recommendations/user/{uid}", params={"method": method, "top_k": top_k})))
+    for mode in SEARCH_MODES:
+        cases.append((f"search:{mode}", 1, queries[-n_requests:], lambda query, mode=mode: client.get(
+            "/recommendations/search", params={"query": query, "mode": mode, "top_k": top_k})))
+    for method in SIMILAR_METHODS:
+        cases.append((f"similar_batch:{method}", batch_size, batches, lambda batch, method=method: client.post(
+            "/recommendations/similar/batch", json={"product_ids": batch[0], "method": method, "top_k": top_k})))
+    for method in USER_METHODS:
+        cases.append((f"user_batch:{method}", batch_size, batches, lambda batch, method=method: client.post(
+            "/recommendations/user/batch", json={"user_ids": batch[1], "method": method, "top_k": top_k})))
+    for mode in SEARCH_MODES:
+        cases.append((f"search_batch:{mode}", batch_size, batches, lambda batch, mode=mode: client.post(
+            "/recommendations/search/batch", json={"queries": batch[2], "mode": mode, "top_k": top_k})))
+    
+    results = {}
+    for label, items, requests, send in cases:
+        results[label] = summary(timed_requests(send, requests), items)
+        stats = results[label]
+        print(
+            f"  {label:<28} n={stats['requests']:>5}  p50={stats['p50_ms']:>8.2f}ms  "
+            f"p95={stats['p95_ms']:>8.2f}ms  p99={stats['p99_ms']:>8.2f}ms"
+        )
+    return results
+
+def run_scale(name, sizes, args):
+    path = dataset_path(
+        args.data_dir, sizes["products"], sizes["users"], sizes["interactions"],
+        args.product_exponent, args.user_exponent, args.seed
+    )
+    if args.regenerate and os.path.exists(path):
+        os.remove(path)
+        shutil.rmtree(f"{path}.snapshot", ignore_errors=True)
+    if os.path.exists(path):
+        dataset = read_dataset_info(path)
+        print(f"{name}: reusing {path}")
+    else:
+        print(f"{name}: generating {sizes['products']:,} products, {sizes['interactions']:,} interactions into {path}")
+        dataset = generate_dataset(
+            path, sizes["products"], sizes["users"], sizes["interactions"],
+            product_exponent=args.product_exponent, user_exponent=args.user_exponent, seed=args.seed
+        )
+        print(f"  generated in {dataset['generate_seconds']:.1f}s")
+    
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.main import app
+    from app.models.registry import registry
+    from app.utils.snapshot import Snapshot, export_snapshot
+    
+    engine = create_engine(f"sqlite:///{path}")
+    source = sessionmaker(bind=engine)
+    snapshot = None
+    if args.snapshot:
+        snapshot_root = f"{path}.snapshot"
+        try:
+            Snapshot.open(snapshot_root).close()
+            print(f"  reusing snapshot {snapshot_root}")
+        except FileNotFoundError:
+            session = source()
+            start = time.perf_counter()
+            try:
+                export_snapshot(session, snapshot_root, keep=1)
+            finally:
+                session.close()
+            snapshot = {"export_seconds": time.perf_counter() - start}
+            print(f"  snapshot exported in {snapshot['export_seconds']:.2f}s")
+        source = lambda: Snapshot.open(snapshot_root)
+    with tempfile.TemporaryDirectory() as work_dir:
+        models, fit = fit_models(source, args.dimension, args.chunk_size, work_dir)
+    engine.dispose()
+    cf, als, cb, hybrid = models
+    registry.publish(cf=cf, als=als, cb=cb, hybrid=hybrid)
+    
+    ids = sample_request_ids(path, max(args.requests, args.batch_size * max(5, args.requests // 10)), seed=args.seed)
+    queries = search_queries(len(ids["product_ids"]) + args.requests, seed=args.seed)
+    # Not used as a context manager: the app's startup (artifact loading, scheduler) must not run
+    client = TestClient(app)
+    requests = measure_endpoints(client, ids, queries, args.requests, args.batch_size, args.top_k)
+    
+    return {
+        "scale": name,
+        "dataset": dataset,
+        "source": "snapshot" if args.snapshot else "sqlite",
+        "snapshot": snapshot,
+        "fit": fit,
+        "requests": requests,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+def print_comparison(result, baseline):
+    """Ratios of fit time and p50 latency against a baseline run (<1 is faster)"""
+    baseline_runs = {run["scale"]: run for run in baseline["runs"]}
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for run in result["runs"]:
+        base = baseline_runs.get(run["scale"])
+        if base is None:
+            continue
+        print(f"{run['scale']}:")
+        for name, stats in run["fit"].items():
+            if name in base["fit"]:
+                print(f"  fit {name:<24} x{stats['seconds'] / base['fit'][name]['seconds']:.2f}")
+        for label, stats in run["requests"].items():
+            if label in base["requests"]:
+                print(f"  p50 {label:<24} x{stats['p50_ms'] / base['requests'][label]['p50_ms']:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["small"], choices=list(SCALES))
+    parser.add_argument("--products", type=int, help="Custom scale: number of products (with --users and --interactions)")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--interactions", type=int)
+    parser.add_argument("--product-exponent", type=float, default=1.0, help="Zipf exponent of product popularity")
+    parser.add_argument("--user-exponent", type=float, default=0.8, help="Zipf exponent of user activity")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(), help="Where generated datasets are kept for reuse")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild datasets even if present")
+    parser.add_argument("--dimension", type=int, default=384, help="Stub encoder embedding dimension")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Content-based fit chunk size")
+    parser.add_argument("--requests", type=int, default=500, help="Timed requests per endpoint and method")
+    parser.add_argument("--batch-size", type=int, default=100, help="Items per batch endpoint call")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--snapshot", action="store_true", help="Fit from a columnar snapshot of the dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Show the service's INFO logs")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON result of a previous run to compare against")
+    args = parser.parse_args()
+    
+    # Configure the service before it is imported: no database of its own, no encoder download
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ["CB_WARM_UP_ENCODER"] = "false"
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    
+    scales = {name: SCALES[name] for name in args.scales}
+    if args.products:
+        scales = {"custom": {"products": args.products, "users": args.users or args.products, "interactions": args.interactions or 10 * args.products}}
+    
+    result = {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("json", "baseline", "verbose")},
+        "runs": [run_scale(name, sizes, args) for name, sizes in scales.items()],
+    }
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(result, json.load(f))
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
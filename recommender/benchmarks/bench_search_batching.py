@@ -0,0 +1,129 @@
+"""
+Benchmark of micro-batched semantic search (CB_SEARCH_BATCH_SIZE / CB_SEARCH_BATCH_WAIT_MS).
+
+Runs the /search code path in-process against a content model over synthetic
+product embeddings, using the real encoder: N concurrent asyncio clients each
+send queries back to back for a fixed duration, once with batching disabled
+(batch size 1, one encode and one FAISS search per request) and once batched.
+Every query is distinct and the query embedding cache is disabled unless
+--cache is given, so each request pays for encoding.
+
+Usage (from the recommender/ directory):
+    python -m benchmarks.bench_search_batching
+    python -m benchmarks.bench_search_batching --clients 1 16 64 --duration 10 --json batching.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+# The router imports app.database, which creates its engine on import; this benchmark uses no database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.config import CB_SEARCH_BATCH_SIZE, CB_SEARCH_BATCH_WAIT_MS
+from app.models.content_based import ContentBasedModel, SearchFilter
+from app.models.encoder import get_encoder
+from app.routers.recommendations import search_batch
+from app.utils.batching import MicroBatcher
+from app.utils.cache import LRUCache
+from app.utils.executor import shutdown_executor
+from app.utils.id_index import IdIndex
+
+WORDS = (
+    "wireless headphones affordable running shoes leather wallet kitchen knife set "
+    "gaming mouse desk lamp yoga mat coffee grinder water bottle backpack laptop stand "
+    "bluetooth speaker winter jacket cotton shirt board game phone case garden hose"
+).split()
+
+def synthetic_model(n_products, dimension, seed=42):
+    """Content model over random embeddings; only the query encoder is real"""
+    rng = np.random.default_rng(seed)
+    model = ContentBasedModel(index_type="flat")
+    model.product_ids = np.arange(1, n_products + 1, dtype=np.int64)
+    model.product_index = IdIndex(model.product_ids)
+    model.category_codes = np.full(n_products, -1, dtype=np.int16)
+    model.prices = np.zeros(n_products, dtype=np.float32)
+    model.in_stock = np.ones(n_products, dtype=bool)
+    model.embeddings = rng.standard_normal((n_products, dimension)).astype(np.float32)
+    model.dimension = dimension
+    model.index = model.build_index(model.embeddings, model.product_ids)
+    return model
+
+async def run_clients(batcher, model, n_clients, duration, top_k, seed):
+    rng = np.random.default_rng(seed)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    
+    async def client(client_id):
+        sent = 0
+        while time.perf_counter() < deadline:
+            words = rng.choice(WORDS, size=3)
+            query = f"{' '.join(words)} {client_id}-{sent}"
+            start = time.perf_counter()
+            await batcher.submit((model, query, top_k, SearchFilter(), "vector"))
+            latencies.append(time.perf_counter() - start)
+            sent += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(n_clients)))
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "qps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_batch_size": batcher.stats()["mean_batch_size"],
+    }
+
+def run(clients, duration, n_products, top_k, batch_size, wait_ms, use_cache):
+    encoder = get_encoder()
+    if not use_cache:
+        encoder.query_cache = LRUCache(0)
+    encoder.warm_up()
+    dimension = encoder.encode(["dimension"], convert_to_numpy=True).shape[1]
+    model = synthetic_model(n_products, dimension)
+    
+    results = []
+    for n_clients in clients:
+        row = {"clients": n_clients}
+        for mode, size in (("unbatched", 1), ("batched", batch_size)):
+            batcher = MicroBatcher(search_batch, max_batch_size=size, max_wait_ms=wait_ms)
+            row[mode] = asyncio.run(run_clients(batcher, model, n_clients, duration, top_k, seed=n_clients))
+        row["speedup_qps"] = row["batched"]["qps"] / row["unbatched"]["qps"]
+        results.append(row)
+        print(
+            f"clients={n_clients:>3}  unbatched {row['unbatched']['qps']:>7.1f} qps p99={row['unbatched']['p99_ms']:>7.1f}ms  "
+            f"batched {row['batched']['qps']:>7.1f} qps p99={row['batched']['p99_ms']:>7.1f}ms "
+            f"(mean batch {row['batched']['mean_batch_size']:.1f})  x{row['speedup_qps']:.2f}"
+        )
+    
+    shutdown_executor()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per client count and mode")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=max(CB_SEARCH_BATCH_SIZE, 2))
+    parser.add_argument("--wait-ms", type=float, default=CB_SEARCH_BATCH_WAIT_MS)
+    parser.add_argument("--cache", action="store_true", help="Keep the query embedding cache enabled")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = run(
+        args.clients, args.duration, args.products, args.top_k,
+        args.batch_size, args.wait_ms, args.cache
+    )
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
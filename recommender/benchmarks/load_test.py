@@ -0,0 +1,143 @@
+"""
+Concurrent load test for a running recommender service.
+
+Fires a mix of /similar (all methods), /user and /search requests from N
+concurrent clients and reports throughput and per-endpoint tail latency.
+Run it once against the old build and once against the new one, then pass
+the first result as --baseline to print the difference.
+
+Requires httpx (pip install -r requirements-dev.txt). Usage (from the recommender/ directory):
+    python -m benchmarks.load_test --base-url http://localhost:8002 --json before.json
+    python -m benchmarks.load_test --base-url http://localhost:8002 --json after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+SEARCH_QUERIES = [
+    "wireless headphones",
+    "affordable laptop for students",
+    "running shoes",
+    "kitchen knife set",
+    "gift for a programmer",
+    "bluetooth speaker waterproof",
+]
+
+def build_request(rng: random.Random, product_ids, user_ids):
+    """Pick an (endpoint label, path, params) tuple from the request mix"""
+    kind = rng.choices(["similar", "user", "search"], weights=[5, 3, 2])[0]
+    if kind == "similar":
+        method = rng.choice(["collaborative", "als", "content", "hybrid"])
+        return f"similar:{method}", f"/recommendations/similar/{rng.choice(product_ids)}", {"method": method}
+    if kind == "user":
+        method = rng.choice(["collaborative", "als"])
+        return f"user:{method}", f"/recommendations/user/{rng.choice(user_ids)}", {"method": method}
+    return "search", "/recommendations/search", {"query": rng.choice(SEARCH_QUERIES)}
+
+async def client_loop(client, rng, product_ids, user_ids, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        label, path, params = build_request(rng, product_ids, user_ids)
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            response.raise_for_status()
+            latencies[label].append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors[label] += 1
+
+async def run(base_url, concurrency, duration, product_ids, user_ids, seed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            client_loop(client, random.Random(seed + i), product_ids, user_ids, deadline, latencies, errors)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+    
+    all_latencies = [value for values in latencies.values() for value in values]
+    
+    def summary(samples):
+        samples_ms = np.asarray(samples) * 1000
+        return {
+            "requests": len(samples),
+            "p50_ms": float(np.percentile(samples_ms, 50)),
+            "p95_ms": float(np.percentile(samples_ms, 95)),
+            "p99_ms": float(np.percentile(samples_ms, 99)),
+        }
+    
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "throughput_rps": len(all_latencies) / elapsed,
+        "errors": dict(errors),
+        "overall": summary(all_latencies) if all_latencies else None,
+        "endpoints": {label: summary(samples) for label, samples in sorted(latencies.items())},
+    }
+
+def parse_ids(spec):
+    """'1-100' or '1,5,9' -> list of ints"""
+    if "-" in spec:
+        low, high = spec.split("-")
+        return list(range(int(low), int(high) + 1))
+    return [int(value) for value in spec.split(",")]
+
+def print_report(result, baseline=None):
+    print(f"throughput: {result['throughput_rps']:.1f} req/s over {result['duration_s']:.1f}s "
+          f"at concurrency {result['concurrency']}")
+    if baseline:
+        print(f"  baseline: {baseline['throughput_rps']:.1f} req/s "
+              f"(x{result['throughput_rps'] / baseline['throughput_rps']:.2f})")
+    rows = [("overall", result["overall"])] + list(result["endpoints"].items())
+    for label, stats in rows:
+        if stats is None:
+            continue
+        line = (f"{label:<22} n={stats['requests']:>6}  p50={stats['p50_ms']:>8.1f}ms  "
+                f"p95={stats['p95_ms']:>8.1f}ms  p99={stats['p99_ms']:>8.1f}ms")
+        base = baseline and (baseline["overall"] if label == "overall" else baseline["endpoints"].get(label))
+        if base:
+            line += f"   (baseline p99={base['p99_ms']:.1f}ms)"
+        print(line)
+    if result["errors"]:
+        print(f"errors: {result['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8002")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--product-ids", default="1-100")
+    parser.add_argument("--user-ids", default="1-50")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON result of a previous run to compare against")
+    args = parser.parse_args()
+    
+    result = asyncio.run(run(
+        args.base_url, args.concurrency, args.duration,
+        parse_ids(args.product_ids), parse_ids(args.user_ids), args.seed
+    ))
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
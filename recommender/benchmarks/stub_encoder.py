@@ -0,0 +1,46 @@
+"""
+Stand-in for the sentence transformer in benchmarks: deterministic feature-hashed
+bag-of-words embeddings, so content-based training and search run without
+downloading a model or loading PyTorch. Similarity is lexical only; use it to
+time the pipeline, not to judge result quality.
+"""
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.models.encoder import LazyEncoder
+from app.utils.bm25 import tokenize
+
+class HashingTransformer:
+    """
+    Deterministic stand-in for a SentenceTransformer: signed feature hashing of
+    the lexical tokens into `dimension` buckets, L2-normalized
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                bucket = zlib.crc32(token.encode())
+                rows.append(row)
+                columns.append(bucket % self.dimension)
+                signs.append(1.0 if bucket & (1 << 31) else -1.0)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(embeddings, (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)), np.array(signs, dtype=np.float32))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+class StubEncoder(LazyEncoder):
+    """LazyEncoder backed by HashingTransformer: no model download, no PyTorch"""
+    
+    def __init__(self, dimension: int = 384):
+        super().__init__(model_name=f"stub-hashing-{dimension}", enabled=True)
+        self._model = HashingTransformer(dimension)
+        self.state = "loaded"
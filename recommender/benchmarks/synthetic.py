@@ -0,0 +1,220 @@
+"""
+Synthetic recommender data at scale for the benchmarks.
+
+generate_dataset writes a SQLite database with the tables the recommender reads
+(products, orders, cart_items; product_views exists but stays empty). Product popularity and user activity follow
+power laws (Zipf over a random permutation of the ids), so a few products and
+users account for most interactions, like a real store. Catalog texts mix
+common words, categories and SKU-like codes so lexical and semantic search have
+something to match.
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Named dataset sizes: products, users and cart items (interactions)
+SCALES = {
+    "small": {"products": 10_000, "users": 20_000, "interactions": 100_000},
+    "medium": {"products": 100_000, "users": 200_000, "interactions": 1_000_000},
+    "large": {"products": 1_000_000, "users": 1_000_000, "interactions": 10_000_000},
+}
+
+CATEGORIES = [
+    "Electronics", "Books", "Home", "Kitchen", "Toys", "Sports", "Outdoors", "Beauty",
+    "Fashion", "Garden", "Office", "Automotive", "Music", "Games", "Health", "Pets",
+    "Baby", "Tools", "Grocery", "Jewelry",
+]
+WORDS = (
+    "wireless headphones affordable running shoes leather wallet kitchen knife set gaming mouse "
+    "desk lamp yoga mat coffee grinder water bottle backpack laptop stand bluetooth speaker winter "
+    "jacket cotton shirt board game phone case garden hose portable charger smart watch ceramic "
+    "mug travel pillow noise cancelling stainless steel organic premium compact ergonomic vintage "
+    "waterproof lightweight durable classic deluxe mini pro ultra eco"
+).split()
+SKU_PREFIXES = ["WH", "XR", "KT", "MX", "ZB", "QL", "PT", "VN"]
+
+DATASET_TABLES = """
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT, price FLOAT NOT NULL,
+    stock INTEGER, category TEXT, image_url TEXT, created_at TIMESTAMP, updated_at TIMESTAMP
+);
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY, user_id INTEGER, status TEXT, total_amount FLOAT,
+    created_at TIMESTAMP, updated_at TIMESTAMP
+);
+CREATE TABLE cart_items (
+    id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER, price_at_purchase FLOAT
+);
+CREATE TABLE product_views (
+    id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, viewed_at TIMESTAMP, session_id TEXT
+);
+CREATE TABLE dataset_info (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Rows per executemany call while writing
+WRITE_CHUNK = 200_000
+
+def power_law_sample(n_values: int, size: int, exponent: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    size draws from ids 1..n_values with P(rank r) proportional to r^-exponent;
+    ranks are assigned to ids in random order so popularity is unrelated to the id
+    """
+    weights = np.arange(1, n_values + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    ranks = np.minimum(np.searchsorted(cdf, rng.random(size)), n_values - 1)
+    return rng.permutation(n_values)[ranks].astype(np.int64) + 1
+
+def dataset_path(
+    directory: str,
+    n_products: int,
+    n_users: int,
+    n_interactions: int,
+    product_exponent: float,
+    user_exponent: float,
+    seed: int
+) -> str:
+    """File name of a generated dataset, unique per generation parameters so it can be reused"""
+    name = f"recommender-bench-{n_products}p-{n_users}u-{n_interactions}i-{product_exponent}a-{user_exponent}b-s{seed}.sqlite"
+    return os.path.join(directory, name)
+
+def generate_dataset(
+    path: str,
+    n_products: int,
+    n_users: int,
+    n_interactions: int,
+    product_exponent: float = 1.0,
+    user_exponent: float = 0.8,
+    seed: int = 42
+) -> Dict:
+    """
+    Write a synthetic store to a new SQLite database at path, creating its directory if needed
+    Returns: dataset description (sizes, exponents, generation time)
+    """
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.executescript(DATASET_TABLES)
+    
+    # Catalog
+    categories = np.array(CATEGORIES)[power_law_sample(len(CATEGORIES), n_products, 0.7, rng) - 1]
+    prices = np.round(rng.lognormal(3.0, 1.0, n_products), 2)
+    stock = np.where(rng.random(n_products) < 0.1, 0, rng.integers(1, 100, n_products))
+    name_words = rng.integers(0, len(WORDS), (n_products, 3))
+    description_words = rng.integers(0, len(WORDS), (n_products, 8))
+    sku_prefixes = rng.integers(0, len(SKU_PREFIXES), n_products)
+    for start in range(0, n_products, WRITE_CHUNK):
+        end = min(start + WRITE_CHUNK, n_products)
+        connection.executemany(
+            "INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, NULL, '2024-01-01 00:00:00', '2024-01-01 00:00:00')",
+            (
+                (
+                    i + 1,
+                    f"{' '.join(WORDS[w] for w in name_words[i])} {SKU_PREFIXES[sku_prefixes[i]]}-{i + 1}",
+                    " ".join(WORDS[w] for w in description_words[i]),
+                    float(prices[i]),
+                    int(stock[i]),
+                    str(categories[i]),
+                )
+                for i in range(start, end)
+            )
+        )
+    
+    # Orders of 1-4 items; users and products drawn from their power laws
+    order_sizes = rng.integers(1, 5, n_interactions)
+    n_orders = int(np.searchsorted(np.cumsum(order_sizes), n_interactions)) + 1
+    order_sizes = order_sizes[:n_orders]
+    order_sizes[-1] -= order_sizes.sum() - n_interactions
+    order_users = power_law_sample(n_users, n_orders, user_exponent, rng)
+    order_status = np.where(rng.random(n_orders) < 0.9, "completed", "cart")
+    order_seconds = rng.integers(0, 365 * 86400, n_orders)
+    order_times = (np.datetime64("2024-01-01T00:00:00") + order_seconds.astype("timedelta64[s]")).astype(str)
+    for start in range(0, n_orders, WRITE_CHUNK):
+        end = min(start + WRITE_CHUNK, n_orders)
+        connection.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, 0, ?, ?)",
+            (
+                (i + 1, int(order_users[i]), str(order_status[i]), order_times[i].replace("T", " "), order_times[i].replace("T", " "))
+                for i in range(start, end)
+            )
+        )
+    
+    item_orders = np.repeat(np.arange(1, n_orders + 1), order_sizes)
+    item_products = power_law_sample(n_products, n_interactions, product_exponent, rng)
+    item_quantities = 1 + rng.poisson(0.3, n_interactions)
+    for start in range(0, n_interactions, WRITE_CHUNK):
+        end = min(start + WRITE_CHUNK, n_interactions)
+        connection.executemany(
+            "INSERT INTO cart_items VALUES (?, ?, ?, ?, ?)",
+            (
+                (i + 1, int(item_orders[i]), int(item_products[i]), int(item_quantities[i]), float(prices[item_products[i] - 1]))
+                for i in range(start, end)
+            )
+        )
+    
+    info = {
+        "products": n_products,
+        "users": n_users,
+        "orders": n_orders,
+        "interactions": n_interactions,
+        "product_exponent": product_exponent,
+        "user_exponent": user_exponent,
+        "seed": seed,
+        "generate_seconds": time.perf_counter() - started,
+    }
+    connection.executemany("INSERT INTO dataset_info VALUES (?, ?)", [(key, json.dumps(value)) for key, value in info.items()])
+    connection.commit()
+    connection.close()
+    return info
+
+def read_dataset_info(path: str) -> Dict:
+    """Description stored by generate_dataset"""
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute("SELECT key, value FROM dataset_info").fetchall()
+    finally:
+        connection.close()
+    return {key: json.loads(value) for key, value in rows}
+
+def sample_request_ids(path: str, n: int, seed: int = 0) -> Dict[str, List[int]]:
+    """
+    n product and user ids to query, drawn from random purchases (cart items of
+    completed orders) so that request traffic follows the popularity skew of the
+    training data and every id is known to the models
+    """
+    rng = np.random.default_rng(seed)
+    connection = sqlite3.connect(path)
+    product_ids, user_ids = [], []
+    try:
+        n_items = connection.execute("SELECT MAX(id) FROM cart_items").fetchone()[0]
+        while len(product_ids) < n:
+            # Chunked to stay below SQLite's limit on bound parameters
+            rows = [int(i) for i in rng.integers(1, n_items + 1, 500)]
+            purchases = dict(
+                (item_id, (product_id, user_id))
+                for item_id, product_id, user_id in connection.execute(
+                    f"""
+                    SELECT ci.id, ci.product_id, o.user_id
+                    FROM cart_items ci JOIN orders o ON o.id = ci.order_id
+                    WHERE o.status = 'completed' AND ci.id IN ({",".join("?" * len(rows))})
+                    """,
+                    rows
+                )
+            )
+            for row in rows:
+                if row in purchases:
+                    product_ids.append(purchases[row][0])
+                    user_ids.append(purchases[row][1])
+    finally:
+        connection.close()
+    return {"product_ids": product_ids[:n], "user_ids": user_ids[:n]}
+
+def search_queries(n: int, seed: int = 0) -> List[str]:
+    """Distinct free-text queries (a unique suffix keeps the query embedding cache cold)"""
+    rng = np.random.default_rng(seed)
+    return [f"{' '.join(rng.choice(WORDS, size=3))} {i}" for i in range(n)]
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+# app.config and app.database read the environment on import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("MODEL_ARTIFACTS_DIR", tempfile.mkdtemp(prefix="recommender-tests-"))
+os.environ.setdefault("CB_WARM_UP_ENCODER", "false")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.stub_encoder import StubEncoder
+from benchmarks.synthetic import generate_dataset
+
+def make_session_factory(path: str):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def store_db(tmp_path):
+    """Session factory over a small synthetic store (products, orders, cart items)"""
+    path = str(tmp_path / "store.sqlite")
+    generate_dataset(path, n_products=300, n_users=200, n_interactions=3000, seed=7)
+    return make_session_factory(path)
+
+@pytest.fixture
+def encoder():
+    """Deterministic hashing encoder; no sentence transformer download"""
+    return StubEncoder(dimension=64)
+
+@pytest.fixture
+def shared_encoder(monkeypatch):
+    """StubEncoder installed as the shared encoder models get by default (e.g. in training runs)"""
+    from app.config import CB_ENCODER_MODEL
+    from app.models import encoder as encoder_module
+    
+    stub = StubEncoder(dimension=64)
+    monkeypatch.setitem(encoder_module._encoders, CB_ENCODER_MODEL, stub)
+    return stub
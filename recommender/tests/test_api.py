@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.content_based import ContentBasedModel, SearchFilter
+from app.routers.recommendations import search_batch
+
+@pytest.fixture
+def client():
+    """Client without start-up (no model loading or training)"""
+    return TestClient(app)
+
+@pytest.mark.parametrize("path", [
+    "/recommendations/similar/1?top_k=0",
+    "/recommendations/user/1?top_k=0",
+    "/recommendations/search?query=shoes&top_k=-1",
+])
+def test_top_k_must_be_positive(client, path):
+    """Test that GET endpoints reject a top_k below 1"""
+    assert client.get(path).status_code == 422
+
+@pytest.mark.parametrize("path, body", [
+    ("/recommendations/similar/batch", {"product_ids": [1], "top_k": 0}),
+    ("/recommendations/user/batch", {"user_ids": [1], "top_k": 0}),
+    ("/recommendations/search/batch", {"queries": ["shoes"], "top_k": 0}),
+])
+def test_batch_top_k_must_be_positive(client, path, body):
+    """Test that batch endpoints reject a top_k below 1"""
+    assert client.post(path, json=body).status_code == 422
+
+def test_search_batch_isolates_failing_groups(store_db, encoder, tmp_path):
+    """Test that a failing group of a search micro-batch does not fail the other groups"""
+    model = ContentBasedModel(encoder=encoder)
+    model.fit(store_db(), work_dir=str(tmp_path))
+    
+    items = [
+        (model, "premium", 3, SearchFilter(), "lexical"),
+        (model, "premium", 3, SearchFilter(), "semantic"),  # unknown mode: ValueError
+        (model, "premium", 2, SearchFilter(in_stock=False), "vector"),
+    ]
+    results = search_batch(items)
+    assert isinstance(results[1], ValueError) and len(results[0]) == 3
+    assert results[0] == model.search_products("premium", 3, mode="lexical")
+    assert results[2] == model.search_products("premium", 2, SearchFilter(in_stock=False), "vector")
@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+
+from app.models.collaborative_filtering import CollaborativeFilteringModel
+from app.utils.artifacts import (
+    LATEST_FILE, MANIFEST_FILE, find_generation, latest_generation, load_arrays,
+    read_manifest, read_model_set, verify_generation, write_generation, write_model_set
+)
+
+def test_generation_round_trip(tmp_path):
+    """Test that arrays, metadata and extra files come back from a generation, memory-mapped"""
+    root = str(tmp_path / "model")
+    arrays = {"ids": np.arange(5, dtype=np.int64), "scores": np.linspace(0, 1, 6, dtype=np.float32).reshape(2, 3)}
+    generation = write_generation(
+        root, arrays, {"k": 3}, files={"extra.json": lambda path: open(path, "w").write("{}")}
+    )
+    
+    assert latest_generation(root) == generation
+    assert os.path.exists(os.path.join(generation, "extra.json"))
+    manifest = read_manifest(generation)
+    assert manifest["metadata"] == {"k": 3}
+    assert manifest["arrays"]["scores"]["shape"] == [2, 3]
+    
+    loaded = load_arrays(generation, manifest)
+    for name, array in arrays.items():
+        assert isinstance(loaded[name], np.memmap)
+        np.testing.assert_array_equal(loaded[name], array)
+    assert not isinstance(load_arrays(generation, manifest, mmap_mode=None)["ids"], np.memmap)
+    assert verify_generation(generation, manifest)
+
+def test_latest_pointer_and_pruning(tmp_path):
+    """Test that LATEST follows the newest generation and old ones are pruned"""
+    root = str(tmp_path / "model")
+    generations = [write_generation(root, {"x": np.array([i])}, {}, keep=2) for i in range(4)]
+    
+    with open(os.path.join(root, LATEST_FILE)) as f:
+        assert f.read() == os.path.basename(generations[-1])
+    assert sorted(os.listdir(root)) == sorted([LATEST_FILE] + [os.path.basename(g) for g in generations[-2:]])
+    assert find_generation(root, os.path.basename(generations[-2])) == generations[-2]
+    assert find_generation(root, os.path.basename(generations[0])) is None
+    assert latest_generation(str(tmp_path / "missing")) is None
+
+def test_corrupt_and_unknown_generations(tmp_path):
+    """Test that checksum mismatches and unknown formats are detected"""
+    root = str(tmp_path / "model")
+    generation = write_generation(root, {"x": np.arange(10)}, {})
+    manifest = read_manifest(generation)
+    np.save(os.path.join(generation, "x.npy"), np.arange(1, 11))
+    assert not verify_generation(generation, manifest)
+    
+    manifest["format_version"] = 999
+    with open(os.path.join(generation, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    assert read_manifest(generation) is None
+
+def test_model_set_round_trip(tmp_path):
+    """Test that the MODEL_SET file records the generations published together"""
+    artifacts_dir = str(tmp_path)
+    assert read_model_set(artifacts_dir) is None
+    first = write_model_set(artifacts_dir, {"collaborative": "a", "content": None})
+    assert read_model_set(artifacts_dir) == first
+    second = write_model_set(artifacts_dir, {"collaborative": "b", "content": "c"})
+    assert read_model_set(artifacts_dir)["generations"] == {"collaborative": "b", "content": "c"}
+    assert second["version"] >= first["version"]
+
+def test_collaborative_model_save_and_load(store_db, tmp_path):
+    """Test that a loaded CF model serves the same results from memory-mapped arrays"""
+    root = str(tmp_path / "collaborative")
+    model = CollaborativeFilteringModel(n_neighbours=10)
+    model.fit(store_db())
+    generation = model.save(root)
+    
+    loaded = CollaborativeFilteringModel()
+    assert loaded.load(root)
+    assert loaded.artifact_version == os.path.basename(generation)
+    assert isinstance(loaded.neighbour_ids, np.memmap)
+    assert loaded.watermark == model.watermark and loaded.n_neighbours == 10
+    product_id, user_id = int(model.product_ids[0]), int(model.user_ids[0])
+    assert loaded.get_similar_products(product_id) == model.get_similar_products(product_id)
+    assert loaded.get_user_recommendations(user_id) == model.get_user_recommendations(user_id)
+    
+    assert not CollaborativeFilteringModel().load(str(tmp_path / "empty"))
+    assert not CollaborativeFilteringModel().load(root, version="missing")
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.utils.batching import MicroBatcher
+
+def run_concurrently(batcher: MicroBatcher, items):
+    """Submit every item from its own task; returns results (or exceptions) in item order"""
+    async def main():
+        return await asyncio.gather(*[batcher.submit(item) for item in items], return_exceptions=True)
+    return asyncio.run(main())
+
+def test_full_batches_flush_without_waiting():
+    """Test that max_batch_size items are processed together without waiting for the timer"""
+    batches = []
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+    
+    batcher = MicroBatcher(process, max_batch_size=3, max_wait_ms=60_000)
+    assert run_concurrently(batcher, [1, 2, 3]) == [2, 4, 6]
+    assert batches == [[1, 2, 3]]
+
+def test_partial_batches_flush_after_max_wait():
+    """Test that fewer items than max_batch_size are processed once max_wait_ms has passed"""
+    batches = []
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+    
+    batcher = MicroBatcher(process, max_batch_size=100, max_wait_ms=10)
+    assert run_concurrently(batcher, [1, 2, 3, 4, 5]) == [2, 4, 6, 8, 10]
+    assert batches == [[1, 2, 3, 4, 5]]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["largest_batch"] == 5
+
+def test_exception_results_fail_only_their_items():
+    """Test that an exception returned for one item is raised to that request only"""
+    def process(items):
+        return [ValueError(f"bad {item}") if item < 0 else item for item in items]
+    
+    results = run_concurrently(MicroBatcher(process, max_batch_size=3, max_wait_ms=10), [1, -2, 3])
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], ValueError) and str(results[1]) == "bad -2"
+
+def test_raising_process_batch_fails_the_whole_batch():
+    """Test that an exception raised by process_batch reaches every request of the batch"""
+    def process(items):
+        raise RuntimeError("index unavailable")
+    
+    results = run_concurrently(MicroBatcher(process, max_batch_size=2, max_wait_ms=10), [1, 2])
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_unbatched_submit_raises_exception_results():
+    """Test that max_batch_size=1 processes each item on its own, raising returned exceptions"""
+    def process(items):
+        return [KeyError(item) if item == "missing" else item.upper() for item in items]
+    
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=10)
+    assert asyncio.run(batcher.submit("a")) == "A"
+    with pytest.raises(KeyError):
+        asyncio.run(batcher.submit("missing"))
+    assert batcher.stats()["batches"] == 2
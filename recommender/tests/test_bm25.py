@@ -0,0 +1,96 @@
+import asyncio
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.config import CB_RRF_K
+from app.models.content_based import ContentBasedModel, SearchFilter
+from app.models.encoder import EncoderDisabledError, LazyEncoder
+from app.routers.recommendations import search_batch
+from app.utils.batching import MicroBatcher
+from app.utils.bm25 import B, K1, BM25Builder, tokenize
+
+DOCS = [
+    "Sony WH-1000XM4 wireless headphones",
+    "wireless mouse",
+    "running shoes for trail running",
+    "leather wallet",
+    "wireless charger for phones and headphones",
+]
+
+def brute_force_bm25(docs, query):
+    """BM25 score of every document for a query, straight from the formula"""
+    tokenized = [tokenize(doc) for doc in docs]
+    average_length = np.mean([len(tokens) for tokens in tokenized])
+    scores = np.zeros(len(docs))
+    for term in set(tokenize(query)):
+        frequency = sum(term in tokens for tokens in tokenized)
+        if frequency == 0:
+            continue
+        idf = math.log1p((len(docs) - frequency + 0.5) / (frequency + 0.5))
+        for row, tokens in enumerate(tokenized):
+            tf = Counter(tokens)[term]
+            scores[row] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(tokens) / average_length))
+    return scores
+
+def test_tokenize_splits_and_joins_compound_tokens():
+    """Test that SKUs are indexed as their parts and as one joined token"""
+    assert tokenize("Sony WH-1000XM4, Ｗｉｒｅｌｅｓｓ!") == ["sony", "wh", "1000xm4", "wh1000xm4", "wireless"]
+
+@pytest.mark.parametrize("query", ["wireless headphones", "running", "wh1000xm4", "WH-1000XM4", "unknown words"])
+def test_bm25_matches_the_formula(query):
+    """Test that index scores and ranking match brute-force BM25, whatever the chunking"""
+    builder = BM25Builder()
+    builder.add(DOCS[:2])
+    builder.add(DOCS[2:])
+    index = builder.build()
+    
+    expected = brute_force_bm25(DOCS, query)
+    rows, scores = index.search(query, 10)
+    assert sorted(rows.tolist()) == np.nonzero(expected)[0].tolist()
+    np.testing.assert_allclose(scores, expected[rows], rtol=1e-5)
+    assert np.all(np.diff(scores) <= 0)
+
+def test_bm25_mask_and_k():
+    """Test that the mask excludes rows and k bounds the result"""
+    builder = BM25Builder()
+    builder.add(DOCS)
+    index = builder.build()
+    mask = np.ones(len(DOCS), dtype=bool)
+    mask[0] = False
+    rows, _ = index.search("wireless headphones", 1, mask)
+    assert rows.tolist() == [4]
+
+def test_reciprocal_rank_fusion():
+    """Test that hybrid results sum 1 / (k + rank) over the vector and lexical rankings"""
+    model = ContentBasedModel(encoder=LazyEncoder("unused", enabled=False))
+    model.product_ids = np.array([10, 20, 30, 40])
+    fused = model._fuse(np.array([30, 10]), np.array([0, 3]), top_k=3)
+    
+    expected = {
+        10: 1 / (CB_RRF_K + 2) + 1 / (CB_RRF_K + 1),
+        30: 1 / (CB_RRF_K + 1),
+        40: 1 / (CB_RRF_K + 2),
+    }
+    assert [result["product_id"] for result in fused] == [10, 30, 40]
+    for result in fused:
+        assert result["relevance_score"] == pytest.approx(expected[result["product_id"]])
+
+def test_lexical_search_batched_with_vector_search_without_encoder(store_db, encoder, tmp_path):
+    """Test that lexical queries keep working when batched with vector or hybrid queries on an instance without encoder"""
+    model = ContentBasedModel(encoder=encoder)
+    model.fit(store_db(), work_dir=str(tmp_path))
+    model.encoder = LazyEncoder("serving-only", enabled=False)
+    
+    async def main():
+        batcher = MicroBatcher(search_batch, max_batch_size=3, max_wait_ms=10)
+        return await asyncio.gather(*[
+            batcher.submit((model, "premium", 5, SearchFilter(), mode))
+            for mode in ("lexical", "vector", "hybrid")
+        ], return_exceptions=True)
+    
+    lexical, vector, hybrid = asyncio.run(main())
+    assert lexical == model.search_products("premium", 5, mode="lexical") and len(lexical) == 5
+    assert isinstance(vector, EncoderDisabledError) and isinstance(hybrid, EncoderDisabledError)
@@ -0,0 +1,101 @@
+import numpy as np
+
+from app.models.encoder import normalize_query
+from app.models.registry import ModelRegistry
+from app.utils.cache import LRUCache, VersionedCache
+from benchmarks.stub_encoder import StubEncoder
+
+def test_lru_evicts_least_recently_used():
+    """Test that the entry limit evicts the least recently used key"""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+def test_lru_byte_limit():
+    """Test that the byte limit evicts old entries and skips values larger than the limit"""
+    cache = LRUCache(100, max_bytes=1000)
+    cache.put("a", np.zeros(100, dtype=np.float32))
+    cache.put("b", np.zeros(100, dtype=np.float32))
+    cache.put("c", np.zeros(100, dtype=np.float32))
+    assert len(cache) == 2 and cache.get("a") is None and cache.bytes == 800
+    cache.put("huge", np.zeros(1000, dtype=np.float32))
+    assert cache.get("huge") is None and len(cache) == 2
+
+def test_lru_ttl(monkeypatch):
+    """Test that entries older than the TTL are dropped on lookup"""
+    now = [100.0]
+    monkeypatch.setattr("app.utils.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(10, ttl_seconds=5)
+    cache.put("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None and len(cache) == 0 and cache.bytes == 0
+
+def test_lru_disabled():
+    """Test that a zero-entry cache stores nothing"""
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert not cache.enabled and cache.get("a") is None and len(cache) == 0
+
+def test_query_embedding_cache():
+    """Test that normalized repeat queries skip the encoder and return the same read-only embeddings"""
+    encoder = StubEncoder(dimension=16)
+    calls = []
+    encode = encoder.encode
+    encoder.encode = lambda texts, **kwargs: calls.append(list(texts)) or encode(texts, **kwargs)
+    
+    first = encoder.encode_queries(["running  shoes", "kitchen knife"])
+    second = encoder.encode_queries(["running shoes", "ｒｕｎｎｉｎｇ shoes", "gift"])
+    assert normalize_query("ｒｕｎｎｉｎｇ  shoes ") == "running shoes"
+    assert sorted(map(sorted, calls)) == [["gift"], ["kitchen knife", "running shoes"]]
+    np.testing.assert_array_equal(second[0], first[0])
+    np.testing.assert_array_equal(second[1], first[0])
+    assert encoder.query_cache.stats()["hits"] == 1
+    assert not encoder.query_cache.get("gift").flags.writeable
+
+def test_versioned_cache_drops_older_versions():
+    """Test that a newer model version invalidates every entry and stale stores are ignored"""
+    cache = VersionedCache(10)
+    cache.put(1, "a", [1])  # nothing seen yet: not stored
+    assert cache.get(1, "a") is None
+    cache.put(1, "a", [1])
+    assert cache.get(1, "a") == [1]
+    
+    # A lookup with a newer version moves the cache to it
+    assert cache.get(2, "a") is None
+    cache.put(1, "b", [2])  # computed from the old model set
+    assert cache.get(2, "b") is None
+    cache.put(2, "b", [3])
+    assert cache.get(2, "b") == [3]
+    
+    # Explicit invalidation on publish; older versions never move it back
+    cache.invalidate(3)
+    cache.invalidate(2)
+    assert cache.version == 3 and len(cache.entries) == 0
+    assert cache.get(2, "b") is None and cache.version == 3
+    assert cache.stats()["invalidations"] == 2
+
+def test_versioned_cache_counts_negative_hits():
+    """Test that empty results are cached and counted as negative hits"""
+    cache = VersionedCache(10)
+    cache.invalidate(1)
+    cache.put(1, "unknown", [])
+    assert cache.get(1, "unknown") == []
+    assert cache.stats()["negative_hits"] == 1 and cache.stats()["hits"] == 1
+
+def test_response_cache_follows_published_model_sets():
+    """Test that publishing a model set invalidates cached responses of the previous one"""
+    registry = ModelRegistry()
+    cache = VersionedCache(10)
+    registry.subscribe(lambda models: cache.invalidate(models.version))
+    
+    version = registry.current.version
+    cache.get(version, "similar")
+    cache.put(version, "similar", [{"product_id": 1}])
+    registry.publish()
+    assert cache.version == version + 1 and cache.get(registry.current.version, "similar") is None
@@ -0,0 +1,219 @@
+from datetime import timedelta
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import text
+
+from app.models.collaborative_filtering import (
+    CollaborativeFilteringModel, in_order_bitmap, merge_ids, order_bitmap, top_k_per_row
+)
+
+def dense_cosine(matrix: sp.spmatrix) -> np.ndarray:
+    """Item-item cosine similarity of a users × items matrix, self-similarity zeroed"""
+    dense = matrix.toarray().astype(np.float64)
+    norms = np.linalg.norm(dense, axis=0)
+    normalized = dense / np.where(norms > 0, norms, 1)
+    similarity = normalized.T @ normalized
+    np.fill_diagonal(similarity, 0)
+    return similarity
+
+def add_orders(session_factory, orders, updated_at: str):
+    """Insert completed orders, each a (user_id, [(product_id, quantity), ...]) pair"""
+    session = session_factory()
+    order_id = session.execute(text("SELECT MAX(id) FROM orders")).scalar()
+    item_id = session.execute(text("SELECT MAX(id) FROM cart_items")).scalar()
+    for user_id, items in orders:
+        order_id += 1
+        session.execute(
+            text("INSERT INTO orders VALUES (:id, :user_id, 'completed', 0, :at, :at)"),
+            {"id": order_id, "user_id": user_id, "at": updated_at}
+        )
+        for product_id, quantity in items:
+            item_id += 1
+            session.execute(
+                text("INSERT INTO cart_items VALUES (:id, :order_id, :product_id, :quantity, 1.0)"),
+                {"id": item_id, "order_id": order_id, "product_id": product_id, "quantity": quantity}
+            )
+    session.commit()
+    session.close()
+
+def assert_same_model(updated: CollaborativeFilteringModel, fitted: CollaborativeFilteringModel):
+    """An incrementally updated model holds the same data and neighbour table as a full fit"""
+    np.testing.assert_array_equal(updated.product_ids, fitted.product_ids)
+    np.testing.assert_array_equal(updated.user_ids, fitted.user_ids)
+    assert abs(updated.user_item_matrix - fitted.user_item_matrix).max() < 1e-5
+    np.testing.assert_allclose(updated.item_norms, fitted.item_norms, rtol=1e-5)
+    np.testing.assert_allclose(updated.neighbour_scores, fitted.neighbour_scores, atol=1e-5)
+    # Every stored neighbour carries its true similarity (ties may be listed in another order)
+    similarity = dense_cosine(fitted.user_item_matrix)
+    rows, slots = np.nonzero(updated.neighbour_ids >= 0)
+    np.testing.assert_allclose(
+        similarity[rows, updated.neighbour_ids[rows, slots]], updated.neighbour_scores[rows, slots], atol=1e-5
+    )
+
+def test_top_k_per_row_sorts_truncates_and_pads():
+    """Test that rows keep their K best positive scores in descending order"""
+    block = sp.csr_matrix(np.array([
+        [0.0, 0.5, 0.9, 0.1, 0.7],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.3, -0.2, 0.0, 0.0, 0.0],
+    ], dtype=np.float32))
+    ids, scores = top_k_per_row(block, 3)
+    
+    assert ids.tolist() == [[2, 4, 1], [-1, -1, -1], [0, -1, -1]]
+    np.testing.assert_allclose(scores, [[0.9, 0.7, 0.5], [0, 0, 0], [0.3, 0, 0]])
+    assert ids.dtype == np.int32 and scores.dtype == np.float32
+
+def test_top_k_per_row_drops_diagonal():
+    """Test that each row's own item is never its neighbour"""
+    block = sp.csr_matrix(np.array([[1.0, 0.4, 0.2], [0.4, 1.0, 0.6]], dtype=np.float32))
+    ids, _ = top_k_per_row(block, 2, row_items=np.array([0, 1]))
+    assert ids.tolist() == [[1, 2], [2, 0]]
+
+def test_top_k_per_row_breaks_ties_by_column():
+    """Test that equal scores are ordered by column index"""
+    block = sp.csr_matrix(np.array([[0.5, 0.0, 0.5, 0.5]], dtype=np.float32))
+    ids, _ = top_k_per_row(block, 2)
+    assert ids.tolist() == [[0, 2]]
+
+def test_fit_matches_dense_cosine(store_db):
+    """Test that the blocked top-K table holds the best neighbours of the full similarity matrix"""
+    model = CollaborativeFilteringModel(n_neighbours=10, block_size=64)
+    model.fit(store_db())
+    
+    similarity = dense_cosine(model.user_item_matrix)
+    expected = -np.sort(-similarity, axis=1)[:, :10]
+    expected[expected < 0] = 0
+    np.testing.assert_allclose(model.neighbour_scores, expected, atol=1e-5)
+    
+    # Stored ids point at columns with the stored score
+    rows, slots = np.nonzero(model.neighbour_ids >= 0)
+    np.testing.assert_allclose(
+        similarity[rows, model.neighbour_ids[rows, slots]], model.neighbour_scores[rows, slots], atol=1e-5
+    )
+
+def test_user_recommendations_score_purchased_neighbours(store_db):
+    """Test that user scores sum neighbour similarities weighted by purchase strength"""
+    model = CollaborativeFilteringModel(n_neighbours=20)
+    model.fit(store_db())
+    
+    user_row = int(np.argmax(np.diff(model.user_item_matrix.indptr)))
+    user_id = int(model.user_ids[user_row])
+    purchases = model.user_item_matrix[user_row].toarray().ravel()
+    
+    table = np.zeros((len(model.product_ids), len(model.product_ids)))
+    rows, slots = np.nonzero(model.neighbour_ids >= 0)
+    table[rows, model.neighbour_ids[rows, slots]] = model.neighbour_scores[rows, slots]
+    expected = purchases @ table
+    expected[purchases > 0] = 0
+    
+    recommendations = model.get_user_recommendations(user_id, top_k=5)
+    assert len(recommendations) == 5
+    for rec in recommendations:
+        column = int(np.searchsorted(model.product_ids, rec["product_id"]))
+        assert purchases[column] == 0
+        assert abs(rec["recommendation_score"] - expected[column]) < 1e-4
+    assert recommendations[0]["recommendation_score"] >= np.sort(expected)[-1] - 1e-4
+
+def test_unknown_ids_return_empty(store_db):
+    """Test that unknown products and users get no recommendations"""
+    model = CollaborativeFilteringModel()
+    model.fit(store_db())
+    assert model.get_similar_products(10**9) == []
+    assert model.get_user_recommendations(10**9) == []
+
+def test_merge_ids():
+    """Test that unseen ids are merged in sorted order with the mapping of moved rows"""
+    current = np.array([2, 5, 9])
+    assert merge_ids(current, np.array([5, 9]))[1] is None
+    merged, remap = merge_ids(current, np.array([10, 12, 5]))
+    assert merged.tolist() == [2, 5, 9, 10, 12] and remap is None
+    merged, remap = merge_ids(current, np.array([1, 7]))
+    assert merged.tolist() == [1, 2, 5, 7, 9]
+    assert remap.tolist() == [1, 2, 4]
+
+def test_order_bitmap():
+    """Test that order bitmaps grow and report the ids set in them"""
+    bitmap = order_bitmap(np.array([1, 8, 20]))
+    grown = order_bitmap(np.array([3, 100]), bitmap)
+    assert in_order_bitmap(bitmap, np.array([1, 8, 20, 3, 100])).tolist() == [True, True, True, False, False]
+    assert in_order_bitmap(grown, np.array([1, 8, 20, 3, 100, 99, 10**6])).tolist() == [
+        True, True, True, True, True, False, False
+    ]
+
+def test_partial_fit_matches_fit(store_db):
+    """Test that folding new orders into a trained model gives the model a full fit would"""
+    updated = CollaborativeFilteringModel(n_neighbours=8, block_size=64)
+    updated.fit(store_db())
+    
+    rng = np.random.default_rng(3)
+    orders = [
+        # Known and new users buying known and new products
+        (int(rng.integers(1, 230)), [(int(p), int(rng.integers(1, 4))) for p in rng.integers(1, 320, size=3)])
+        for _ in range(60)
+    ]
+    add_orders(store_db, orders, "2025-06-01 12:00:00")
+    updated.partial_fit(store_db())
+    
+    fitted = CollaborativeFilteringModel(n_neighbours=8, block_size=64)
+    fitted.fit(store_db())
+    assert updated.watermark == fitted.watermark
+    assert_same_model(updated, fitted)
+
+def test_partial_fit_folds_every_order_once(store_db):
+    """Test orders at the watermark, committed late, and re-updated after being folded in"""
+    updated = CollaborativeFilteringModel(n_neighbours=8)
+    updated.fit(store_db())
+    watermark = updated.watermark
+    
+    # Same timestamp as the watermark, and a late commit with an older one
+    add_orders(store_db, [(3, [(10, 2), (11, 1)])], watermark.strftime("%Y-%m-%d %H:%M:%S"))
+    add_orders(store_db, [(4, [(10, 1), (12, 1)])], (watermark - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S"))
+    updated.partial_fit(store_db())
+    
+    # A later write to an order folded in moves its updated_at past the watermark
+    session = store_db()
+    session.execute(text("UPDATE orders SET updated_at = '2030-01-01 00:00:00' WHERE id = (SELECT MAX(id) FROM orders)"))
+    session.commit()
+    session.close()
+    updated.partial_fit(store_db())
+    
+    fitted = CollaborativeFilteringModel(n_neighbours=8)
+    fitted.fit(store_db())
+    assert_same_model(updated, fitted)
+
+def test_user_recommendations_batch_matches_single(store_db):
+    """Test that batch recommendations equal single-user ones (up to the order of tied scores)"""
+    model = CollaborativeFilteringModel(n_neighbours=10)
+    model.fit(store_db())
+    user_ids = [int(user_id) for user_id in model.user_ids[::3]] + [10**9]
+    
+    batch = model.get_user_recommendations_batch(user_ids, top_k=8)
+    assert batch[-1] == []
+    for user_id, batch_recs in zip(user_ids, batch):
+        single = model.get_user_recommendations(user_id, top_k=8)
+        batch_scores = [rec["recommendation_score"] for rec in batch_recs]
+        np.testing.assert_allclose(batch_scores, [rec["recommendation_score"] for rec in single], rtol=1e-5)
+        if batch_scores:
+            # Products above the last (possibly tied) score are the same
+            cutoff = batch_scores[-1] + 1e-5
+            assert {rec["product_id"] for rec in batch_recs if rec["recommendation_score"] > cutoff} == {
+                rec["product_id"] for rec in single if rec["recommendation_score"] > cutoff
+            }
+
+def test_orders_without_updated_at(store_db):
+    """Test that orders with a NULL updated_at fall back to created_at and never poison the watermark or weights"""
+    session = store_db()
+    session.execute(text("UPDATE orders SET updated_at = NULL WHERE id <= 20"))
+    session.execute(text("UPDATE orders SET updated_at = NULL, created_at = NULL WHERE id = 21"))
+    session.commit()
+    session.close()
+    
+    model = CollaborativeFilteringModel(n_neighbours=8, decay_half_life_days=30)
+    model.fit(store_db())
+    assert model.watermark is not None
+    assert np.isfinite(model.user_item_matrix.data).all() and np.isfinite(model.item_norms).all()
+    
+    add_orders(store_db, [(3, [(10, 2), (11, 1)])], "2030-01-01 00:00:00")
+    delta = model.partial_fit(store_db())
+    assert delta is not None and delta.users.tolist() == [3]
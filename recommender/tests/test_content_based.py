@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.models.content_based import ContentBasedModel, SearchFilter
+from app.utils import ann_index
+from benchmarks.stub_encoder import StubEncoder
+
+def test_refit_reuses_embeddings_of_unchanged_products(store_db, encoder, tmp_path):
+    """Test that a refit over the same catalog encodes nothing and shares the previous index"""
+    first = ContentBasedModel(encoder=encoder)
+    first.fit(store_db(), work_dir=str(tmp_path))
+    second = ContentBasedModel(encoder=encoder)
+    second.fit(store_db(), previous=first, work_dir=str(tmp_path))
+    
+    assert second.fit_stats["encoded"] == 0 and second.fit_stats["reused"] == len(first.product_ids)
+    assert second.index is first.index and second.same_content(first)
+
+def test_refit_reuses_an_index_built_as_a_simpler_type(store_db, encoder, tmp_path, monkeypatch):
+    """Test that an index a small catalog built as a fallback type is reused and updated like the configured one"""
+    assert ann_index.effective_index_type("ivf_pq", 300) == "ivf_flat"
+    assert ann_index.effective_index_type("ivf_flat", 20) == "flat"
+    assert ann_index.effective_index_type("ivf_pq", 20_000) == "ivf_pq"
+    
+    first = ContentBasedModel(encoder=encoder, index_type="ivf_pq")
+    first.fit(store_db(), work_dir=str(tmp_path))
+    assert ann_index.index_type_of(first.index) == "ivf_flat"
+    second = ContentBasedModel(encoder=encoder, index_type="ivf_pq")
+    second.fit(store_db(), previous=first, work_dir=str(tmp_path))
+    assert second.index is first.index and second.same_content(first)
+    
+    session = store_db()
+    session.execute(text("UPDATE products SET name = 'vintage ceramic mug' WHERE id = 1"))
+    session.commit()
+    session.close()
+    third = ContentBasedModel(encoder=encoder, index_type="ivf_pq")
+    # One changed product updates a copy of the index instead of rebuilding it
+    monkeypatch.setattr(third, "build_index", lambda *args: pytest.fail("index rebuilt"))
+    third.fit(store_db(), previous=second, work_dir=str(tmp_path))
+    assert third.fit_stats["encoded"] == 1
+    assert third.search_products("vintage ceramic mug", 1, SearchFilter(in_stock=False))[0]["product_id"] == 1
+
+def test_refit_with_another_encoder_encodes_everything(store_db, encoder, tmp_path):
+    """Test that embeddings are only reused when they come from the same encoder and dimension"""
+    first = ContentBasedModel(encoder=encoder)
+    first.fit(store_db(), work_dir=str(tmp_path))
+    
+    renamed = StubEncoder(dimension=64)
+    renamed.model_name = "another-encoder"
+    resized = StubEncoder(dimension=32)
+    resized.model_name = encoder.model_name
+    for other in (renamed, resized):
+        model = ContentBasedModel(encoder=other)
+        model.fit(store_db(), previous=first, work_dir=str(tmp_path))
+        assert model.fit_stats["reused"] == 0 and model.fit_stats["encoded"] == len(first.product_ids)
+        assert model.encoder_model == other.model_name and model.embeddings.shape[1] == other.dimension
+
+def test_load_refuses_artifacts_of_another_encoder(store_db, encoder, tmp_path):
+    """Test that saved embeddings are only served with the encoder that produced them"""
+    model = ContentBasedModel(encoder=encoder)
+    model.fit(store_db(), work_dir=str(tmp_path))
+    model.save(str(tmp_path / "content"))
+    
+    loaded = ContentBasedModel(encoder=encoder)
+    assert loaded.load(str(tmp_path / "content"))
+    assert loaded.encoder_model == encoder.model_name
+    np.testing.assert_array_equal(loaded.product_ids, model.product_ids)
+    
+    assert not ContentBasedModel(encoder=StubEncoder(dimension=32)).load(str(tmp_path / "content"))
+    resized = StubEncoder(dimension=32)
+    resized.model_name = encoder.model_name
+    refused = ContentBasedModel(encoder=resized)
+    assert not refused.load(str(tmp_path / "content")) and refused.index is None
+
+@pytest.mark.parametrize("index_type, embedding_dtype", [
+    ("flat", "float32"), ("flat", "float16"), ("ivf_flat", "float32"), ("hnsw", "float32")
+])
+def test_refit_from_a_loaded_model(store_db, encoder, tmp_path, index_type, embedding_dtype):
+    """Test that a model loaded memory-mapped searches like the saved one and can be the previous model of a refit"""
+    model = ContentBasedModel(encoder=encoder, index_type=index_type, embedding_dtype=embedding_dtype)
+    model.fit(store_db(), work_dir=str(tmp_path))
+    model.save(str(tmp_path / "content"))
+    loaded = ContentBasedModel(encoder=encoder, index_type=index_type, embedding_dtype=embedding_dtype)
+    assert loaded.load(str(tmp_path / "content"))
+    assert ann_index.index_type_of(loaded.index) == ann_index.index_type_of(model.index)
+    assert loaded.search_products("premium compact", 5) == model.search_products("premium compact", 5)
+    
+    session = store_db()
+    session.execute(text("UPDATE products SET name = 'vintage ceramic mug' WHERE id = 1"))
+    session.commit()
+    session.close()
+    refit = ContentBasedModel(encoder=encoder, index_type=index_type, embedding_dtype=embedding_dtype)
+    refit.fit(store_db(), previous=loaded, work_dir=str(tmp_path))
+    assert refit.fit_stats["encoded"] == 1
+    assert refit.search_products("vintage ceramic mug", 1, SearchFilter(in_stock=False))[0]["product_id"] == 1
@@ -0,0 +1,58 @@
+import numpy as np
+from sqlalchemy import text
+
+from app.utils.data_access import INTERACTION_DTYPES, ColumnBuffer, interactions_query, read_columns
+
+def test_column_buffer_grows_and_keeps_rows():
+    """Test that appends past the capacity double the storage and keep earlier rows"""
+    buffer = ColumnBuffer({"id": np.int64, "score": np.float32}, capacity=2)
+    buffer.append({"id": [1, 2], "score": [0.5, 1.5]})
+    assert buffer.capacity == 2
+    buffer.append({"id": [3], "score": [2.5]})
+    assert buffer.capacity == 4
+    buffer.append({"id": [4, 5, 6, 7, 8, 9], "score": [0.0] * 6})
+    assert buffer.capacity == 9 and buffer.size == 9
+    
+    arrays = buffer.arrays()
+    assert arrays["id"].tolist() == [1, 2, 3, 4, 5, 6, 7, 8, 9]
+    assert arrays["score"][:3].tolist() == [0.5, 1.5, 2.5]
+
+def test_column_buffer_append_rows_and_arrays():
+    """Test that row tuples fill the columns in order and arrays() trims to typed columns"""
+    buffer = ColumnBuffer({"user_id": np.int64, "weight": np.float32, "at": np.dtype("datetime64[us]")}, capacity=16)
+    buffer.append_rows([])
+    buffer.append_rows([(7, 2, "2025-06-01 12:00:00", "extra"), (8, 1.5, "2025-06-02 00:00:00", "extra")])
+    arrays = buffer.arrays()
+    
+    assert list(arrays) == ["user_id", "weight", "at"]
+    assert [len(column) for column in arrays.values()] == [2, 2, 2]
+    assert arrays["user_id"].dtype == np.int64 and arrays["weight"].dtype == np.float32
+    assert arrays["weight"].tolist() == [2.0, 1.5]
+    assert arrays["at"][1] == np.datetime64("2025-06-02T00:00:00")
+    assert buffer.columns == {}
+
+def test_column_buffer_empty():
+    """Test that a buffer nothing was written to gives empty typed columns"""
+    arrays = ColumnBuffer({"id": np.int64}, capacity=0).arrays()
+    assert arrays["id"].shape == (0,) and arrays["id"].dtype == np.int64
+
+def test_read_columns_matches_fetchall(store_db):
+    """Test that streaming in small partitions reads the same rows as fetching them all"""
+    session = store_db()
+    rows = session.execute(interactions_query()).fetchall()
+    columns = read_columns(session, interactions_query(), INTERACTION_DTYPES, chunk_size=100)
+    session.close()
+    
+    assert len(rows) > 100
+    assert columns["user_id"].tolist() == [row[0] for row in rows]
+    assert columns["product_id"].tolist() == [row[1] for row in rows]
+    np.testing.assert_allclose(columns["weight"], [row[2] for row in rows])
+    assert columns["order_id"].tolist() == [row[4] for row in rows]
+    assert columns["updated_at"].dtype == INTERACTION_DTYPES["updated_at"]
+
+def test_read_columns_empty_result(store_db):
+    """Test that a query without rows gives empty columns"""
+    session = store_db()
+    columns = read_columns(session, text("SELECT id FROM products WHERE id < 0"), {"id": np.int64})
+    session.close()
+    assert columns["id"].shape == (0,)
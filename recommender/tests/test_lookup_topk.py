@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.utils.id_index import IdIndex
+from app.utils.topk import top_k_indices, top_k_indices_rows
+
+@pytest.mark.parametrize("ids", [[3, 8, 15, 42], [42, 3, 15, 8]])
+def test_id_index_maps_ids_to_rows(ids):
+    """Test lookups on sorted and unsorted id arrays"""
+    index = IdIndex(np.array(ids))
+    for row, item_id in enumerate(ids):
+        assert index.get(item_id) == row
+        assert item_id in index
+    assert index.get(7) is None
+    assert index.get(100) is None
+    assert 0 not in index
+    
+    rows = index.lookup([15, 7, 42, 100, 3])
+    assert rows.tolist() == [ids.index(15), -1, ids.index(42), -1, ids.index(3)]
+
+def test_id_index_empty():
+    """Test that an empty index finds nothing"""
+    index = IdIndex(np.empty(0, dtype=np.int64))
+    assert len(index) == 0
+    assert index.get(1) is None
+    assert index.lookup([1, 2]).tolist() == [-1, -1]
+
+def test_id_index_on_memory_mapped_ids(tmp_path):
+    """Test that memory-mapped id arrays are used as they are"""
+    path = str(tmp_path / "ids.npy")
+    np.save(path, np.arange(0, 1000, 5, dtype=np.int64))
+    index = IdIndex(np.load(path, mmap_mode="r"))
+    assert index.get(995) == 199
+    assert index.lookup([0, 3, 500]).tolist() == [0, -1, 100]
+
+def test_top_k_indices_matches_full_sort():
+    """Test that argpartition top-k returns the k best indices in descending order"""
+    scores = np.random.default_rng(0).random(1000)
+    expected = np.argsort(-scores)[:10]
+    assert top_k_indices(scores, 10).tolist() == expected.tolist()
+    assert top_k_indices(scores, 5000).tolist() == np.argsort(-scores).tolist()
+    assert len(top_k_indices(scores, 0)) == 0
+    assert len(top_k_indices(np.empty(0), 3)) == 0
+
+def test_top_k_indices_rows_matches_full_sort():
+    """Test the per-row variant against a full sort of every row"""
+    scores = np.random.default_rng(1).random((20, 50))
+    np.testing.assert_array_equal(top_k_indices_rows(scores, 7), np.argsort(-scores, axis=1)[:, :7])
+    assert top_k_indices_rows(scores, 80).shape == (20, 50)
+    assert top_k_indices_rows(scores, 0).shape == (20, 0)
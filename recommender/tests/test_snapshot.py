@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.models.collaborative_filtering import CollaborativeFilteringModel
+from app.models.content_based import ContentBasedModel
+from app.utils.data_access import INTERACTION_DTYPES, PRODUCTS_QUERY, interactions_query, read_columns
+from app.utils.snapshot import Snapshot, StringColumnBuffer, export_snapshot
+
+@pytest.fixture
+def snapshot_db(store_db):
+    """Store with view events, a product without description or category and a non-ASCII name"""
+    session = store_db()
+    session.execute(text(
+        "INSERT INTO product_views (user_id, product_id, viewed_at, session_id) VALUES "
+        "(NULL, 3, '2024-05-01 10:00:00', 'sess-ü'), (7, 4, '2024-05-02 10:00:00', NULL)"
+    ))
+    session.execute(text("UPDATE products SET description = NULL, category = NULL WHERE id = 5"))
+    session.execute(text("UPDATE products SET name = 'Kopfhörer WH-1000XM4 — ü' WHERE id = 6"))
+    session.commit()
+    session.close()
+    return store_db
+
+def test_string_column_buffer():
+    """Test that strings of several chunks are stored as UTF-8 bytes plus offsets, None as empty"""
+    buffer = StringColumnBuffer()
+    buffer.append(["ab", None])
+    buffer.append(["ü"])
+    arrays = buffer.arrays()
+    assert arrays["offsets"].tolist() == [0, 2, 2, 4]
+    assert arrays["data"].tobytes() == "abü".encode("utf-8")
+    assert StringColumnBuffer().arrays()["offsets"].tolist() == [0]
+
+def test_snapshot_round_trip(snapshot_db, tmp_path):
+    """Test that a snapshot gives back the interactions, views and products of the database"""
+    session = snapshot_db()
+    generation = export_snapshot(session, str(tmp_path), chunk_size=97)
+    interactions = read_columns(session, interactions_query(), INTERACTION_DTYPES)
+    products = [tuple(row) for row in session.execute(PRODUCTS_QUERY)]
+    session.close()
+    
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot.path == generation
+    assert snapshot.metadata["rows"] == {"interactions": len(interactions["user_id"]), "views": 2, "products": 300}
+    assert snapshot.metadata["watermark"] == str(interactions["updated_at"].max())
+    for name, column in snapshot.interactions().items():
+        np.testing.assert_array_equal(column, interactions[name])
+    
+    views = snapshot.product_views()
+    assert views["user_id"].tolist() == [-1, 7] and views["product_id"].tolist() == [3, 4]
+    assert snapshot.strings("views_session_id", 0, 2) == ["sess-ü", ""]
+    
+    rows = [row for partition in snapshot.product_partitions(50) for row in partition]
+    assert len(rows) == len(products)
+    for row, expected in zip(rows, products):
+        assert row[:4] == expected[:4] and row[5] == expected[5]
+        assert abs(row[4] - expected[4]) < 1e-3
+    assert rows[4][2:4] == (None, None) and rows[5][1] == "Kopfhörer WH-1000XM4 — ü"
+
+def test_snapshot_interactions_since(snapshot_db, tmp_path):
+    """Test that interactions since a time keep the orders updated at or after it"""
+    session = snapshot_db()
+    export_snapshot(session, str(tmp_path))
+    session.close()
+    snapshot = Snapshot.open(str(tmp_path))
+    
+    updated_at = snapshot.interactions()["updated_at"]
+    since = np.sort(updated_at)[len(updated_at) // 2]
+    recent = snapshot.interactions(since=since.astype(datetime))
+    assert len(recent["user_id"]) == int((updated_at >= since).sum())
+    assert (recent["updated_at"] >= since).all()
+
+def test_models_fit_from_a_snapshot_like_from_the_database(snapshot_db, encoder, tmp_path):
+    """Test that the collaborative and content models trained on a snapshot equal those trained on the database"""
+    session = snapshot_db()
+    export_snapshot(session, str(tmp_path / "snapshots"))
+    session.close()
+    
+    from_db = CollaborativeFilteringModel(n_neighbours=10)
+    from_db.fit(snapshot_db())
+    from_snapshot = CollaborativeFilteringModel(n_neighbours=10)
+    from_snapshot.fit(Snapshot.open(str(tmp_path / "snapshots")))
+    np.testing.assert_array_equal(from_snapshot.neighbour_ids, from_db.neighbour_ids)
+    np.testing.assert_allclose(from_snapshot.neighbour_scores, from_db.neighbour_scores)
+    assert from_snapshot.watermark == from_db.watermark
+    # Nothing newer than the snapshot to fold in
+    delta = from_snapshot.partial_fit(Snapshot.open(str(tmp_path / "snapshots")))
+    assert delta is not None and len(delta.users) == 0
+    
+    cb_db = ContentBasedModel(encoder=encoder)
+    cb_db.fit(snapshot_db(), work_dir=str(tmp_path))
+    cb_snapshot = ContentBasedModel(encoder=encoder)
+    cb_snapshot.fit(Snapshot.open(str(tmp_path / "snapshots")), work_dir=str(tmp_path))
+    for name in ("product_ids", "text_hashes", "in_stock", "category_codes", "prices"):
+        np.testing.assert_array_equal(getattr(cb_snapshot, name), getattr(cb_db, name))
+    assert cb_snapshot.categories == cb_db.categories
+    np.testing.assert_array_equal(np.asarray(cb_snapshot.embeddings), np.asarray(cb_db.embeddings))
+    assert cb_snapshot.search_products("WH-1000XM4", mode="lexical")[0]["product_id"] == 6
+
+def test_open_without_a_snapshot(tmp_path):
+    """Test that opening a directory without an exported snapshot fails"""
+    with pytest.raises(FileNotFoundError):
+        Snapshot.open(str(tmp_path))
@@ -0,0 +1,95 @@
+import numpy as np
+
+from app.models.hybrid import HybridNeighbours
+from app.models.registry import ModelRegistry
+from app.training import TrainingScheduler
+from tests.test_collaborative_filtering import add_orders
+
+def make_scheduler(store_db) -> TrainingScheduler:
+    return TrainingScheduler(model_registry=ModelRegistry(), session_factory=store_db, snapshot_dir=None)
+
+def test_incremental_run_without_changes_publishes_nothing(store_db, shared_encoder):
+    """Test that an incremental run with no new orders or product changes keeps the live model set"""
+    scheduler = make_scheduler(store_db)
+    scheduler.run_once()
+    trained = scheduler.registry.current
+    assert trained.version == 1 and trained.hybrid.neighbour_ids is not None
+    
+    scheduler.run_once(incremental=True)
+    assert scheduler.last_error is None
+    assert scheduler.registry.current is trained
+
+def test_incremental_run_updates_only_changed_models(store_db, shared_encoder):
+    """Test that new orders fold into ALS and the hybrid table without refitting the rest"""
+    scheduler = make_scheduler(store_db)
+    scheduler.run_once()
+    trained = scheduler.registry.current
+    
+    add_orders(store_db, [(5, [(10, 2), (11, 1)]), (250, [(10, 1), (400, 1)])], "2030-01-01 00:00:00")
+    scheduler.run_once(incremental=True)
+    assert scheduler.last_error is None
+    updated = scheduler.registry.current
+    assert updated.version == trained.version + 1
+    assert updated.cf is not trained.cf and updated.cb is trained.cb
+    
+    # ALS: only the users and products of the new orders get new factors
+    als = updated.als
+    assert 250 in als.user_ids and 400 in als.product_ids
+    others = np.setdiff1d(trained.als.user_ids, [5, 250])
+    np.testing.assert_array_equal(
+        als.user_factors[als.user_index.lookup(others)],
+        trained.als.user_factors[trained.als.user_index.lookup(others)]
+    )
+    assert not np.array_equal(
+        als.user_factors[als.user_index.get(5)], trained.als.user_factors[trained.als.user_index.get(5)]
+    )
+    
+    # The partially rebuilt hybrid table equals one built from scratch
+    rebuilt = HybridNeighbours()
+    rebuilt.fit(updated.cf, updated.cb)
+    np.testing.assert_array_equal(updated.hybrid.product_ids, rebuilt.product_ids)
+    np.testing.assert_array_equal(updated.hybrid.neighbour_ids, rebuilt.neighbour_ids)
+    np.testing.assert_array_equal(updated.hybrid.neighbour_scores, rebuilt.neighbour_scores)
+
+def test_failed_runs_are_retried_with_backoff(store_db, shared_encoder):
+    """Test that failed runs are retried after a doubling delay, bounded by the interval"""
+    def unavailable():
+        raise ConnectionError("database unavailable")
+    
+    scheduler = TrainingScheduler(
+        model_registry=ModelRegistry(), session_factory=unavailable, snapshot_dir=None,
+        interval_hours=1, retry_seconds=1000
+    )
+    delays = []
+    for _ in range(4):
+        scheduler.run_once()
+        delays.append((scheduler._next_periodic_run() - scheduler.last_run).total_seconds())
+    assert delays == [1000, 2000, 3600, 3600]
+    assert scheduler.failures == 4 and "unavailable" in scheduler.last_error
+    assert not scheduler.wait_trained(timeout=0)
+    
+    scheduler.session_factory = store_db
+    scheduler.run_once()
+    assert scheduler.failures == 0 and scheduler.last_error is None
+    assert scheduler.wait_trained(timeout=0)
+    assert (scheduler._next_periodic_run() - scheduler.last_run).total_seconds() == 3600
+
+def test_first_run_is_retried_until_it_succeeds(store_db, shared_encoder):
+    """Test that the scheduler thread retries a failed first run and wait_trained returns once one succeeds"""
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database unavailable")
+        return store_db()
+    
+    scheduler = TrainingScheduler(
+        model_registry=ModelRegistry(), session_factory=flaky, snapshot_dir=None, retry_seconds=0.05
+    )
+    scheduler.start()
+    try:
+        assert scheduler.wait_trained(timeout=30)
+    finally:
+        scheduler.stop(timeout=30)
+    assert len(attempts) == 2
+    assert scheduler.registry.current.cf.last_trained is not None
@@ -1,6 +1,22 @@
-def get_data_from_db():
-    # I have the data stored in a database
-    # I must connect to the database and fetch the data
-    # I need the tools to do this
-    # how about using SQLAlchemy?
-    pass
\ No newline at end of file
+"""
+Offline access to the recommender's training data, for notebooks and one-off
+analysis. Rows are streamed from the configured database (DATABASE_URL) into
+typed NumPy arrays through app.utils.data_access, like training does.
+
+Usage (from the recommender/ directory):
+    from utils.data_preprocess import get_data_from_db
+    user_ids, product_ids, weights, order_ids, watermark = get_data_from_db()
+"""
+from app.database import SessionLocal
+from app.models.collaborative_filtering import CollaborativeFilteringModel
+
+def get_data_from_db(since=None):
+    """
+    Completed-order interactions as COO triplets, optionally only orders updated at or after `since`
+    Returns: (user_ids int64, product_ids int64, weights float32, order_ids int64, watermark)
+    """
+    session = SessionLocal()
+    try:
+        return CollaborativeFilteringModel().fetch_interactions(session, since=since)
+    finally:
+        session.close()